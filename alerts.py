@@ -0,0 +1,211 @@
+import argparse
+import os
+import sqlite3
+from datetime import datetime, timedelta
+from pathlib import Path
+import incidents
+import schemas
+
+# -----------------------------
+# Alert rules evaluated on write + local outbox
+# -----------------------------
+# Rules are registered per (table, key value) — e.g. ("diagnostics", "High") —
+# so a saved record only runs the rules that can match it. Alerts are written
+# to a SQLite outbox with a unique dedup key; a relay (mail/SMS, or the stand-in
+# `python alerts.py drain`) sends pending rows and marks them sent. The context
+# handed to the rules is lazy where it would cost a read (`counter`, `limits`,
+# `plant_wide` are functions), so a save pays only for what its rules look up.
+TOOL_LIFE_LIMIT = 0.9
+SPINDLE_HOURS_MIN = 500.0
+HIGH_REPEAT_COUNT = 3
+HIGH_REPEAT_WINDOW_H = 24
+# machine_id of alerts that concern the whole plant (shown for every machine)
+PLANT = "PLANT"
+
+# which column of a table selects the keyed rules
+KEY_FIELD = {"checklists": "phase", "diagnostics": "severity"}
+RULES = {}
+
+
+def rule(table, key=None):
+    def register(fn):
+        RULES.setdefault((table, key), []).append(fn)
+        return fn
+    return register
+
+
+def _alert(name, row, subject, severity, message):
+    return {"rule": name, "machine_id": str(row.get("machine_id", "")), "subject": subject,
+            "severity": severity, "message": message, "shift_date": str(row.get("shift_date", ""))}
+
+
+def _life_used(used_min, exp_min, used_cyc, exp_cyc):
+    ratios = [u / e for u, e in ((used_min, exp_min), (used_cyc, exp_cyc)) if u is not None and e]
+    return max(ratios) if ratios else None
+
+
+@rule("tools")
+def tool_end_of_life(row, ctx):
+    used = _life_used(*(schemas.number(row.get(c), None) for c in
+                        ("minutes_used_total", "expected_minutes", "cycles_used_total", "expected_cycles")))
+    if used is not None and used >= TOOL_LIFE_LIMIT:
+        yield _alert("tool_life", row, row.get("tool_id"), "Medium",
+                     f"Tool {row.get('tool_id')} on {row.get('machine_id')} at {used:.0%} of life. Plan replacement.")
+
+
+@rule("production")
+def accrued_tool_end_of_life(row, ctx):
+    # only the tools mounted on this job can have moved
+    for tool_id, *_ in ctx["assignments"].get((str(row.get("machine_id")), str(row.get("job_id"))), []):
+        key = (str(row.get("machine_id")), tool_id)
+        c = ctx["counter"](key)
+        limits = ctx["limits"]().get(key)
+        if not c or not limits:
+            continue
+        used = _life_used(schemas.number(c["minutes_total"], None), limits[0],
+                          schemas.number(c["cycles_total"], None), limits[1])
+        if used is not None and used >= TOOL_LIFE_LIMIT:
+            yield _alert("tool_life", row, tool_id, "Medium",
+                         f"Tool {tool_id} on {row.get('machine_id')} at {used:.0%} of life "
+                         f"after job {row.get('job_id')}. Plan replacement.")
+
+
+@rule("diagnostics")
+def spindle_rul_low(row, ctx):
+    left = schemas.number(row.get("spindle_hours_left"), None)
+    if left is not None and left < SPINDLE_HOURS_MIN:
+        yield _alert("spindle_rul", row, "spindle", "High",
+                     f"Spindle on {row.get('machine_id')} has ~{left:.0f} h estimated life left.")
+
+
+@rule("diagnostics", "High")
+def repeated_high_severity(row, ctx):
+    con, machine = ctx["con"], str(row.get("machine_id"))
+    ts = str(row.get("timestamp"))
+    try:
+        t = datetime.fromisoformat(ts)
+    except ValueError:
+        t = datetime.now()
+    con.execute("INSERT INTO events (rule, machine_id, ts) VALUES ('high_severity', ?, ?)", (machine, ts))
+    since = (t - timedelta(hours=HIGH_REPEAT_WINDOW_H)).isoformat(timespec="seconds")
+    (n,) = con.execute("SELECT COUNT(*) FROM events WHERE rule = 'high_severity' AND machine_id = ? AND ts > ?",
+                       (machine, since)).fetchone()
+    if n >= HIGH_REPEAT_COUNT:
+        yield _alert("repeated_high", row, "severity", "High",
+                     f"{n} High-severity diagnoses on {machine} in the last {HIGH_REPEAT_WINDOW_H} h "
+                     f"(latest: {row.get('matched_issue')}). Escalate to maintenance.")
+
+
+@rule("diagnostics")
+def plant_wide_incident(row, ctx):
+    issue = str(row.get("matched_issue"))
+    if issue not in ctx["plant_wide"]():
+        return
+    con, ts = ctx["con"], str(row.get("timestamp"))
+    try:
+        t = datetime.fromisoformat(ts)
+    except ValueError:
+        t = datetime.now()
+    con.execute("INSERT INTO events (rule, machine_id, ts) VALUES (?, ?, ?)",
+                (f"plant:{issue}", str(row.get("machine_id")), ts))
+    since = (t - timedelta(minutes=incidents.WINDOW_MIN)).isoformat(timespec="seconds")
+    (n,) = con.execute("SELECT COUNT(DISTINCT machine_id) FROM events WHERE rule = ? AND ts > ?",
+                       (f"plant:{issue}", since)).fetchone()
+    if n >= incidents.MIN_MACHINES:
+        yield _alert("plant_wide", dict(row, machine_id=PLANT), issue, "High",
+                     f"'{issue}' reported on {n} machines within {incidents.WINDOW_MIN} min — "
+                     f"likely a shared supply fault. Check the plant supply before machine-level repairs.")
+
+
+@rule("checklists", "before")
+def safety_check_failed(row, ctx):
+    if row.get("safety_ok") is False or str(row.get("safety_ok")) == "False":
+        yield _alert("safety_checklist", row, "safety_ok", "High",
+                     f"Safety devices not confirmed OK on {row.get('machine_id')} "
+                     f"(shift {row.get('shift')}, {row.get('operator')}). Do not run until checked.")
+
+
+@rule("checklists", "after")
+def abnormal_condition_reported(row, ctx):
+    if row.get("machine_condition") is False or str(row.get("machine_condition")) == "False":
+        yield _alert("machine_condition", row, "machine_condition", "Medium",
+                     f"Unusual noise/vibration/errors reported at shift end on {row.get('machine_id')}.")
+
+
+def connect(db_path: Path):
+    con = sqlite3.connect(db_path, timeout=30)
+    con.execute("PRAGMA journal_mode=WAL")
+    con.execute("CREATE TABLE IF NOT EXISTS outbox (id INTEGER PRIMARY KEY, dedup_key TEXT UNIQUE, "
+                "created_at TEXT, rule TEXT, machine_id TEXT, severity TEXT, message TEXT, sent_at TEXT)")
+    con.execute("CREATE INDEX IF NOT EXISTS outbox_pending ON outbox (sent_at)")
+    con.execute("CREATE TABLE IF NOT EXISTS events (rule TEXT, machine_id TEXT, ts TEXT)")
+    con.execute("CREATE INDEX IF NOT EXISTS events_lookup ON events (rule, machine_id, ts)")
+    return con
+
+
+def evaluate(db_path: Path, table: str, rows: list, ctx: dict):
+    """Write path hook: run the rules matching each row and queue new alerts. Returns the number queued."""
+    queued = 0
+    con = connect(db_path)
+    ctx = dict(ctx, con=con)
+    now = datetime.now().isoformat(timespec="seconds")
+    with con:
+        for row in rows:
+            fns = RULES.get((table, None), [])
+            if table in KEY_FIELD:
+                fns = fns + RULES.get((table, row.get(KEY_FIELD[table])), [])
+            for fn in fns:
+                for a in fn(row, ctx):
+                    # one alert per rule / machine / subject / shift day
+                    key = f"{a['rule']}|{a['machine_id']}|{a['subject']}|{a['shift_date']}"
+                    cur = con.execute(
+                        "INSERT OR IGNORE INTO outbox (dedup_key, created_at, rule, machine_id, severity, message) "
+                        "VALUES (?,?,?,?,?,?)", (key, now, a["rule"], a["machine_id"], a["severity"], a["message"]))
+                    queued += cur.rowcount
+    con.close()
+    return queued
+
+
+def pending(db_path: Path, machine_id=None, limit=20):
+    con = connect(db_path)
+    sql = "SELECT id, created_at, rule, machine_id, severity, message FROM outbox WHERE sent_at IS NULL"
+    args = []
+    if machine_id:
+        sql += " AND machine_id IN (?, ?)"
+        args += [machine_id, PLANT]
+    rows = con.execute(sql + " ORDER BY id DESC LIMIT ?", args + [limit]).fetchall()
+    con.close()
+    return [dict(zip(["id", "created_at", "rule", "machine_id", "severity", "message"], r)) for r in rows]
+
+
+def drain(db_path: Path, send, limit=100):
+    """Hand pending alerts to `send(alert_dict)`; mark each sent once send returns without raising."""
+    con = connect(db_path)
+    rows = con.execute("SELECT id, created_at, rule, machine_id, severity, message FROM outbox "
+                       "WHERE sent_at IS NULL ORDER BY id LIMIT ?", (limit,)).fetchall()
+    sent = 0
+    for r in rows:
+        send(dict(zip(["id", "created_at", "rule", "machine_id", "severity", "message"], r)))
+        with con:
+            con.execute("UPDATE outbox SET sent_at = ? WHERE id = ?", (datetime.now().isoformat(timespec="seconds"), r[0]))
+        sent += 1
+    con.close()
+    return sent
+
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description="Alert outbox: list pending alerts or drain them (relay stand-in).")
+    ap.add_argument("command", choices=["list", "drain"])
+    ap.add_argument("--data-dir", default=os.environ.get("VMC_DATA_DIR", "data"))
+    args = ap.parse_args(argv)
+    db = Path(args.data_dir) / "outbox.db"
+    if args.command == "list":
+        for a in pending(db, limit=1000):
+            print(f"[{a['severity']}] {a['created_at']} {a['machine_id']}: {a['message']}")
+    else:
+        n = drain(db, lambda a: print(f"SEND [{a['severity']}] {a['machine_id']}: {a['message']}"), limit=10_000)
+        print(f"{n} alert(s) sent")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,9 +1,29 @@
 
 import streamlit as st
+import altair as alt
+import numpy as np
 import pandas as pd
 from datetime import datetime, date
 from pathlib import Path
 import os
+import tempfile
+import search_index
+import rollup
+import storage
+import checklist_bits
+import tool_accrual
+import diagnosis
+import rul
+import machines
+import scheduler
+import forecast
+import alerts
+import bulk
+import dedup
+import kb
+import severity
+import incidents
+import export
 
 # --- Simple user login system ---
 USERS = {
@@ -54,238 +74,54 @@ st.set_page_config(page_title="VMC Predictive Maintenance Assistant", layout="wi
 st.title("🛠️ VMC Predictive Maintenance Assistant")
 st.caption("Shift checklists • Tool/Spindle life • Troubleshooting • Handover & Logbook")
 
-DATA_DIR = Path("data")
-DATA_DIR.mkdir(exist_ok=True)
+DATA_DIR = storage.DATA_DIR
+FILES = storage.FILES
+SEARCH_DB = storage.SEARCH_DB
+ROLLUP = storage.ROLLUP
 
-FILES = {
-    "checklists": DATA_DIR / "checklists.csv",
-    "production": DATA_DIR / "production.csv",
-    "tools": DATA_DIR / "tools.csv",
-    "diagnostics": DATA_DIR / "diagnostics.csv",
-    "handover": DATA_DIR / "handover.csv"
-}
+# Initialize storage (once per server process)
+storage.init_storage()
 
-# -----------------------------
-# Helpers
-# -----------------------------
-def init_csv(path: Path, cols: list):
-    if not path.exists():
-        pd.DataFrame(columns=cols).to_csv(path, index=False)
-
-def save_row(path: Path, row: dict):
-    df = pd.read_csv(path) if path.exists() else pd.DataFrame()
-    df = pd.concat([df, pd.DataFrame([row])], ignore_index=True)
-    # pandas writes utf-8 by default
-    df.to_csv(path, index=False)
-
-# Initialize storage
-init_csv(FILES["checklists"], [
-    "timestamp","shift_date","shift","operator","machine_id","phase",
-    # before
-    "power_ok","tooling_setup_ok","workpiece_setup_ok",
-    "coolant_ok","lubrication_ok","cleanliness_ok","safety_ok",
-    "home_positions_ok","program_ok","spindle_ok","air_ok",
-    # after
-    "tool_wear_check","dimension_check","coolant_topup","chip_cleaning",
-    "machine_condition","program_logs","shutdown_ok","faults_reported",
-    "notes"
-])
-
-init_csv(FILES["production"], [
-    "timestamp","shift_date","shift","operator","machine_id",
-    "job_id","material","parts_done","avg_cycle_time_min","scrap_count","notes"
-])
-
-init_csv(FILES["tools"], [
-    "timestamp","shift_date","shift","operator","machine_id",
-    "tool_id","tool_name","expected_minutes","minutes_used_today","minutes_used_total",
-    "expected_cycles","cycles_used_today","cycles_used_total","status","notes"
-])
-
-init_csv(FILES["diagnostics"], [
-    "timestamp","shift_date","shift","operator","machine_id",
-    "issue_text","matched_issue","severity","operator_can_fix","actions",
-    "tool_hours_left","spindle_hours_left","notes"
-])
-
-init_csv(FILES["handover"], [
-    "timestamp","shift_date","shift","operator","machine_id",
-    "prev_parts_done","prev_avg_cycle","prev_notes","incoming_notes"
-])
+@st.cache_resource
+def _prune_exports():
+    """Once per worker process: drop exports that sessions left behind."""
+    return export.prune(DATA_DIR / "exports")
 
-# -----------------------------
-# Knowledge Base (VMC issues → causes/steps/escalation)
-# -----------------------------
-KB = [
-    # (name, keywords, causes, op_steps, when_escalate, esc_steps)
-    ("tool wear / dull tool",
-     ["tool wear","worn tool","dull","burr","poor finish","blunt"],
-     ["Tool life reached","Incorrect speed/feed","Poor coolant direction","Hard material/scale"],
-     ["Pause cycle and inspect edge","Replace/resharpen tool and set offset",
-      "Reduce feed/speed by 10–20%","Aim coolant at cutting zone"],
-     "Frequent wear/breakage persists after corrections",
-     ["Check holder/collet clamping & balance","Measure spindle runout","Maintenance to check ATC alignment & spindle"]),
-    ("tool breakage",
-     ["tool break","broken tool","snap","fracture"],
-     ["Too aggressive DOC/feed","Interrupted cut/chatter","Wrong tool material/geometry"],
-     ["Stop machine; remove fragments","Load fresh tool, set offset",
-      "Reduce DOC/feed; add ramping/pecking","Increase coolant flow / through-tool if available"],
-     "Repeated breakage or damage to holder/spindle taper",
-     ["Inspect holder & taper surfaces","Check runout/balance","Maintenance spindle inspection"]),
-    ("chatter / vibration on cut",
-     ["chatter","vibration","buzz","machine shaking","resonance"],
-     ["Imbalanced tool / excessive overhang","Resonant spindle speed","Loose workholding/fixtures"],
-     ["Tighten workholding and fixtures","Clean tapers; re-seat tool",
-      "Change spindle speed ±10–20% to avoid resonance","Shorten tool overhang if possible"],
-     "Chatter persists across tools/speeds",
-     ["Maintenance to check spindle bearings/alignment","Dynamic balance test on tool/holder"]),
-    ("poor surface finish",
-     ["poor surface","rough finish","tool marks","lines on surface","finish bad"],
-     ["Dull tool","Chatter/looseness","Incorrect feed/speed","Coolant misdirection"],
-     ["Replace/inspect tool","Tighten clamps/fixtures",
-      "Adjust feed/speed per tool chart","Add finishing pass with lighter cut"],
-     "Finish poor after corrections",
-     ["Check spindle runout and axis backlash","Maintenance to tune servo/inspect ballscrews"]),
-    ("burr formation / edge not clean",
-     ["burr","sharp edges","edge not clean","ragged edge"],
-     ["Tool dullness","Incorrect chip load","Material smearing"],
-     ["Increase feed slightly for shearing","Use sharper tool/geometry","Add dedicated deburr pass"],
-     "Persistent burr despite parameter and tool changes",
-     ["Investigate material condition/heat treatment","Check runout and tool alignment"]),
-    ("spindle overheating",
-     ["overheat","hot spindle","thermal alarm","high temperature"],
-     ["Insufficient lubrication","Blocked coolant","Aggressive parameters","Bearing degradation"],
-     ["Reduce load (feed/DOC)","Verify coolant flow; clean filters/nozzles","Run cool-down for 5–10 minutes"],
-     "Temp remains high or alarm reappears",
-     ["Maintenance to inspect lube system & bearings","Check motor fan/heat exchanger"]),
-    ("spindle abnormal noise",
-     ["spindle noise","rattling","whine","grinding"],
-     ["Bearing wear","Unbalanced tool","Loose taper/holder"],
-     ["Stop and inspect tool/holder","Clean & re-seat taper surfaces","Test run at lower RPM; observe"],
-     "Noise persists with different tools/speeds",
-     ["Maintenance bearing condition check","Runout and vibration analysis"]),
-    ("axis backlash / position error",
-     ["backlash","position error","accuracy issue","servo alarm","repeatability issue"],
-     ["Loose couplings/ballscrew wear","Encoder fault","Servo tuning drift"],
-     ["Re-home machine; verify zeros","Check fixtures for looseness","Run test part at reduced feed"],
-     "Repeated errors or accuracy out of spec",
-     ["Maintenance to check encoders/couplings/ballscrew preload","Servo tuning & alignment check"]),
-    ("coolant flow issue / no coolant",
-     ["no coolant","coolant not flowing","coolant pump off","dry cutting","coolant low"],
-     ["Low tank level","Clogged filters/nozzles","Pump/valve failure"],
-     ["Refill tank; set correct concentration","Clean/replace filters; clear nozzles","Ensure pump on/valves open"],
-     "Pump will not start or flow not restored",
-     ["Maintenance to test pump motor/wiring","Inspect valves/seals"]),
-    ("coolant leakage",
-     ["coolant leak","coolant on floor","leaking hose","coolant dripping"],
-     ["Loose fittings","Cracked hose/pipe","Seal failure"],
-     ["Tighten fittings","Replace damaged hoses","Use drip tray and clean area"],
-     "Leak continues or source unknown",
-     ["Maintenance to pressure test lines","Replace seals/fittings as needed"]),
-    ("hydraulic pressure low / leak",
-     ["hydraulic leak","low pressure","clamp failure","unclamp issue"],
-     ["Low fluid level","Damaged seals/hoses","Pump/valve malfunction"],
-     ["Top up hydraulic oil","Avoid operation until pressure stable","Inspect for visible leaks"],
-     "Pressure unstable or significant leak",
-     ["Maintenance to replace seals/hoses","Test pump/valves"]),
-    ("ATC tool change stuck",
-     ["atc stuck","tool change error","magazine jam","gripper stuck","toolchanger jam"],
-     ["Sensor misread","Air pressure low","Mechanical jam"],
-     ["Reset ATC per SOP","Check air supply and pressure","Clear chips from carousel/arm","Lubricate moving parts"],
-     "Stuck repeatedly or alarms persist",
-     ["Maintenance to adjust sensors/actuators","Inspect gripper and alignment"]),
-    ("electrical trip / breaker",
-     ["power trip","breaker trip","short circuit","overload"],
-     ["Supply instability","Shorted cable/motor","Overcurrent from jam"],
-     ["Power cycle after 2 minutes","Inspect for burnt smell/visible damage","Run machine idle to observe"],
-     "Trips reoccur or visible damage present",
-     ["Electrician to test supply quality/insulation","Investigate motor windings"]),
-    ("voltage fluctuation / low voltage",
-     ["voltage drop","low voltage","flicker","brownout"],
-     ["Utility fluctuation","Undersized cabling","Loose terminals"],
-     ["Use stabilizer/UPS where applicable","Tighten terminals (qualified personnel)","Reduce non-essential loads"],
-     "Frequent fluctuations affecting machining",
-     ["Electrical team to analyze feeder and grounding"]),
-    ("program error / alarm",
-     ["program error","g-code error","macro error","alarm","nc alarm"],
-     ["Syntax error or wrong modal state","Wrong tool number/offset","Work offset mismatch"],
-     ["Simulate program; dry run","Verify tool/offset table","Re-post with correct post-processor"],
-     "Alarms persist with correct data",
-     ["Review controller diagnostics","Escalate to NC programmer/maintenance"]),
-    ("dimension out of tolerance",
-     ["dimension out","oversize","undersize","tolerance fail","size variation"],
-     ["Tool wear or runout","Thermal growth","Incorrect tool comp"],
-     ["Update tool wear comp","Perform thermal compensation/warm-up","Add finish pass with lighter DOC"],
-     "Variation remains high after actions",
-     ["Inspect spindle runout and axis backlash","Fixture/part stability review"]),
-    ("poor clamping / part movement",
-     ["part moved","clamp loose","fixture slip","jaw slip"],
-     ["Insufficient clamp force","Chip under clamp","Wrong jaws/soft jaws"],
-     ["Re-clamp; clean contact areas","Use torque wrench where applicable","Verify jaw selection and seating"],
-     "Repeated movement or marks on part",
-     ["Fixture redesign or maintenance check","Hydraulic/pneumatic clamping check"]),
-    ("chip evacuation issue",
-     ["chip jam","chips clogging","conveyor jam","chip build-up"],
-     ["Low coolant flow","Conveyor jam","Inadequate chip break"],
-     ["Increase coolant/chip flush","Clear conveyor guards; restart","Use chip-breaking cycle/program"],
-     "Persistent jamming or motor trips",
-     ["Maintenance to service conveyor","Review toolpath for chip control"]),
-    ("es top / interlock issues",
-     ["e-stop stuck","interlock fault","guard error","safety interlock"],
-     ["Damaged button/contact","Sensor misalignment","Wiring fault"],
-     ["Reset or twist-release per SOP","Inspect sensor alignment (door)","If unresolved, stop use and escalate"],
-     "Any uncertainty with safety devices",
-     ["Immediate maintenance escalation; lockout/tagout"]),
-    ("air pressure low",
-     ["air pressure low","pneumatic low","air leak","air failure"],
-     ["Compressor issue","Leak in lines","Regulator setting"],
-     ["Check compressor status","Listen for leaks; tighten fittings","Set regulator per spec"],
-     "Air cannot be maintained",
-     ["Maintenance to test valves/regulators","Leak test with soapy water"]),
-    ("spindle orientation error",
-     ["spindle orient error","orient alarm","orient fault"],
-     ["Encoder fault","Parameter drift","Drive issue"],
-     ["Power cycle; re-home","Check program/toolchange conditions","Reduce load and retry"],
-     "Error repeats frequently",
-     ["Maintenance to check encoder/drive parameters"]),
-    ("thermal growth affecting accuracy",
-     ["thermal growth","warmup not done","drift with time"],
-     ["No warm-up cycle","High continuous load","Ambient temp variation"],
-     ["Run spindle warm-up routine","Schedule cool-down intervals","Enable thermal comp if available"],
-     "Accuracy still drifts after warm-up",
-     ["Maintenance to verify compensation tables"]),
-    ("probe / measurement error",
-     ["probe not triggering","probe error","touch probe issue","probing alarm"],
-     ["Dirty stylus","Wrong calibration","Cable/battery issue"],
-     ["Clean/replace stylus tip","Recalibrate probe","Check battery/cable"],
-     "Probe unreliable across parts",
-     ["Maintenance to service probe system"]),
-    ("axis overtravel / soft limit",
-     ["overtravel","soft limit","limit alarm"],
-     ["Work offset wrong","Programmed move beyond limits","Tool length/fixture error"],
-     ["Check work offsets and tool length","Jog back within range","Adjust program/toolpath"],
-     "Repeat overtravels with correct data",
-     ["Maintenance to verify limit switches/parameters"]),
-    ("tool pick/place error (ATC)",
-     ["wrong tool picked","tool pocket mismatch","tool id error"],
-     ["Tool table mismatch","Pocket sensor fault","Magazine mapping error"],
-     ["Verify tool table vs program","Re-map pocket numbers","Clear chips in pockets"],
-     "Recurrent mismatch",
-     ["Maintenance to tune pocket sensors & mapping"]),
-]
+_prune_exports()
 
-# -----------------------------
-# RUL (Remaining Useful Life) Estimation
-# -----------------------------
-def estimate_rul(spindle_hours, tool_cycles, avg_temp_c, vibration_mm_s, coolant_ok, last_service_h):
-    BASE_TOOL_LIFE_CYCLES = 500.0
-    BASE_SPINDLE_LIFE_H = 8000.0
-    tool_factor = 1.0 + (0.2 if avg_temp_c>60 else 0) + (0.15 if vibration_mm_s>3 else 0) + (0.25 if not coolant_ok else 0)
-    spindle_factor = 1.0 + (0.15 if avg_temp_c>60 else 0) + (0.2 if vibration_mm_s>3 else 0) + (0.1 if last_service_h>1000 else 0)
-    tool_left_cycles = max(0.0, BASE_TOOL_LIFE_CYCLES - tool_cycles*tool_factor)
-    tool_left_hours = round(tool_left_cycles*0.25,1)  # assume avg 0.25 min per cycle
-    spindle_left_hours = round(max(0.0, BASE_SPINDLE_LIFE_H - spindle_hours*spindle_factor),1)
-    return tool_left_hours, spindle_left_hours, round(tool_factor,2), round(spindle_factor,2)
+def known_machines(current: str):
+    return set(storage.machine_registry()) | {current}
+
+def report_save(saved: bool, message: str):
+    if saved:
+        st.success(message)
+    else:
+        st.info(f"Identical record saved in the last {dedup.WINDOW_S // 60} minutes — not saved again.")
+
+def bulk_entry(table: str, context: dict):
+    """Grid + CSV upload with batch validation; valid rows are committed in one write."""
+    with st.expander("Bulk entry (grid or CSV upload)"):
+        st.caption("Columns: " + ", ".join(bulk.ENTRY_COLUMNS[table]) + ". Blank date/shift/operator use the sidebar.")
+        grid = st.data_editor(bulk.blank_grid(table, context["machine_id"]), num_rows="dynamic", key=f"grid_{table}")
+        upload = st.file_uploader("…or upload a CSV", type="csv", key=f"upload_{table}")
+        if st.button("Validate & Save Batch", key=f"bulk_save_{table}"):
+            batch = bulk.read_upload(upload) if upload is not None else grid
+            rows, rejected = bulk.validate(table, batch, known_machines(context["machine_id"]), context)
+            if upload is not None:
+                dupes, earlier = storage.import_rows(table, rows, dedup.file_digest(upload.getvalue()))
+                if earlier:
+                    st.warning(f"{upload.name} was already imported on {earlier} — nothing saved.")
+                    return
+            else:
+                dupes = storage.save_rows(table, rows)
+            if len(rows) > len(dupes):
+                st.success(f"{len(rows) - len(dupes)} row(s) saved.")
+            if dupes:
+                st.info(f"{len(dupes)} row(s) skipped: identical records were saved in the last "
+                        f"{dedup.WINDOW_S // 60} minutes.")
+            if not rejected.empty:
+                st.error(f"{len(rejected)} row(s) rejected — fix and resubmit:")
+                st.dataframe(rejected)
 
 # -----------------------------
 # Sidebar (Shift context)
@@ -295,41 +131,73 @@ with st.sidebar:
     shift_date = st.date_input("Shift Date", value=date.today())
     shift = st.selectbox("Shift", ["A","B","C"])
     operator = st.text_input("Operator Name")
-    machine_id = st.text_input("Machine ID", value="VMC-101")
+    registry = storage.machine_registry()
+    NEW_MACHINE = "➕ Other machine…"
+    machine_ids = sorted(registry) or ["VMC-101"]
+    # keyed, so the selection survives another worker adding a machine to the options
+    machine_id = st.selectbox("Machine ID", machine_ids + [NEW_MACHINE], key="machine_select",
+                              index=machine_ids.index("VMC-101") if "VMC-101" in machine_ids else 0)
+    if machine_id == NEW_MACHINE:
+        machine_id = st.text_input("New machine ID", key="machine_new").strip() or "VMC-101"
+    reg = registry.get(machine_id)
+    with st.expander("Machine registry" + (f" — {reg['model']}" if reg and reg["model"] else "")):
+        if reg:
+            st.caption(f"Spindle {machines.spindle_hours(reg, '—')} h · "
+                       f"{machines.hours_since_service(reg, '—')} h since service"
+                       f" · last service {reg['last_service_at'] or '—'}")
+        else:
+            st.caption("Not registered yet; the first production entry registers it.")
+        r_model = st.text_input("Model", value=reg["model"] if reg else "")
+        # left empty while unknown; saving an empty field keeps the hours unknown
+        since = machines.hours_since_service(reg)
+        r_installed = st.number_input("Spindle hours at registration", min_value=0.0, step=10.0, placeholder="unknown",
+                                      value=None if reg is None or pd.isna(reg["installed_spindle_h"])
+                                      else reg["installed_spindle_h"])
+        r_since = st.number_input("Spindle hours since last service", min_value=0.0, step=10.0, placeholder="unknown",
+                                  value=None if since is None else max(0.0, since))
+        if st.button("Save machine"):
+            storage.register_machine(machine_id, r_model.strip(), r_installed, r_since)
+            st.rerun()
+        if reg and st.button("Record spindle service"):
+            storage.record_service(machine_id)
+            st.rerun()
     st.markdown("---")
+    open_alerts = alerts.pending(storage.OUTBOX, machine_id)
+    with st.expander(f"🔔 Open alerts ({len(open_alerts)}{'+' if len(open_alerts) == 20 else ''})"):
+        if not open_alerts:
+            st.caption("No open alerts for this machine.")
+        for a in open_alerts:
+            (st.error if a["severity"] == "High" else st.warning)(f"{a['created_at']} — {a['message']}")
     st.caption("All data saved locally in ./data/*.csv (UTF-8).")
 
 # -----------------------------
-# Tabs
+# Sections: one render function each; only the selected one runs on a rerun
 # -----------------------------
-tabs = st.tabs([
-    "1) Handover Snapshot",
-    "2) Before Shift Checklist",
-    "3) Production Log",
-    "4) Troubleshooting Assistant",
-    "5) After Shift & Shutdown",
-    "6) Tools & Life Tracking",
-    "7) Logbook / Export"
-])
-
 # 1) Handover
-with tabs[0]:
+def render_handover():
     st.header("Handover Snapshot — Previous Shift")
-    prod_df = pd.read_csv(FILES["production"]) if FILES["production"].exists() else pd.DataFrame()
+    prod_df = storage.read_table("production")
     prev = prod_df[prod_df["machine_id"]==machine_id].tail(10)
     if prev.empty:
         st.info("No previous production entries for this machine.")
     else:
         st.dataframe(prev)
 
+    last_shift = rollup.previous_shift(ROLLUP, machine_id, shift_date, shift)
+    if last_shift:
+        st.caption(f"Previous shift summary: {last_shift['shift_date']} shift {last_shift['shift']}")
+        st.dataframe(pd.DataFrame([last_shift]).drop(columns=["cycle_min_total"]))
+
     st.subheader("Record Handover Notes")
     col1, col2 = st.columns(2)
-    prev_parts_done = col1.number_input("Previous shift parts done (from report)", min_value=0, step=1)
-    prev_avg_cycle = col2.number_input("Previous shift avg cycle (min)", min_value=0.0, step=0.1)
+    prev_parts_done = col1.number_input("Previous shift parts done (from report)", min_value=0, step=1,
+                                        value=int(last_shift["parts_done"]) if last_shift else 0)
+    prev_avg_cycle = col2.number_input("Previous shift avg cycle (min)", min_value=0.0, step=0.1,
+                                       value=float(last_shift["avg_cycle_time_min"]) if last_shift else 0.0)
     prev_notes = st.text_area("Previous shift notes / alarms (copy from log)")
     incoming_notes = st.text_area("Incoming operator notes / plan")
     if st.button("Save Handover Record"):
-        save_row(FILES["handover"], {
+        saved = storage.save_row("handover", {
             "timestamp": datetime.now().isoformat(timespec="seconds"),
             "shift_date": str(shift_date),
             "shift": shift,
@@ -340,10 +208,10 @@ with tabs[0]:
             "prev_notes": prev_notes,
             "incoming_notes": incoming_notes
         })
-        st.success("Handover saved.")
+        report_save(saved, "Handover saved.")
 
 # 2) Before Shift
-with tabs[1]:
+def render_before_shift():
     st.header("Before Shift Checklist")
     col1, col2 = st.columns(2)
     with col1:
@@ -361,7 +229,7 @@ with tabs[1]:
         air_ok = st.checkbox("Air pressure OK (if applicable)")
     notes_before = st.text_area("Notes / observations (before shift)")
     if st.button("Save Before-Shift Checklist"):
-        save_row(FILES["checklists"], {
+        saved = storage.save_row("checklists", {
             "timestamp": datetime.now().isoformat(timespec="seconds"),
             "shift_date": str(shift_date),"shift": shift,"operator": operator,"machine_id": machine_id,
             "phase": "before",
@@ -371,10 +239,10 @@ with tabs[1]:
             "tool_wear_check": None,"dimension_check": None,"coolant_topup": None,"chip_cleaning": None,
             "machine_condition": None,"program_logs": None,"shutdown_ok": None,"faults_reported": None,"notes": notes_before
         })
-        st.success("Before-shift checklist saved.")
+        report_save(saved, "Before-shift checklist saved.")
 
 # 3) Production
-with tabs[2]:
+def render_production():
     st.header("Production Log (Shift)")
     c1, c2, c3 = st.columns(3)
     job_id = c1.text_input("Job/WO ID")
@@ -384,69 +252,69 @@ with tabs[2]:
     scrap_count = st.number_input("Scrap/rework count", min_value=0, step=1)
     prod_notes = st.text_area("Notes (production)")
     if st.button("Save Production Entry"):
-        save_row(FILES["production"], {
+        saved = storage.save_row("production", {
             "timestamp": datetime.now().isoformat(timespec="seconds"),
             "shift_date": str(shift_date),"shift": shift,"operator": operator,"machine_id": machine_id,
             "job_id": job_id,"material": material,"parts_done": parts_done,
             "avg_cycle_time_min": avg_cycle_time_min,"scrap_count": scrap_count,"notes": prod_notes
         })
-        st.success("Production entry saved.")
+        report_save(saved, "Production entry saved.")
+    bulk_entry("production", {"shift_date": str(shift_date), "shift": shift, "operator": operator, "machine_id": machine_id})
     st.subheader("Recent production")
-    prod_df = pd.read_csv(FILES["production"]) if FILES["production"].exists() else pd.DataFrame()
+    prod_df = storage.read_table("production")
     st.dataframe(prod_df[prod_df["machine_id"]==machine_id].tail(20))
 
 # 4) Troubleshooting
-with tabs[3]:
+def render_troubleshooting():
     st.header("Troubleshooting Assistant")
     st.caption("Enter one or more issues separated by commas. The bot will process them one by one.")
+    kb_now = kb.current()
+    rules_now = severity.load()
+    cache = diagnosis.stats()
+    st.caption(f"Knowledge base: {len(kb_now.entries)} entries · version {kb_now.digest[:12]} · "
+               f"diagnosis cache {cache['hit_rate']:.0%} hits ({cache['hits']}/{cache['hits'] + cache['misses']}, "
+               f"{cache['size']} entries)")
+    for problem in (kb.reload_error, severity.reload_error):
+        if problem:
+            st.warning(problem)
     issues_text = st.text_area("Describe issues", placeholder="e.g., tool wear problem, chatter, coolant leak")
     st.subheader("Machine context for severity & RUL")
     c1,c2,c3 = st.columns(3)
-    spindle_hours = c1.number_input("Spindle hours (lifetime)", min_value=0.0, step=1.0, value=4200.0)
-    tool_cycles = c2.number_input("Tool cycles (lifetime)", min_value=0.0, step=10.0, value=1450.0)
+    reg = storage.machine_registry().get(machine_id)
+    spindle_hours = c1.number_input("Spindle hours (lifetime)", min_value=0.0, step=1.0,
+                                    value=machines.spindle_hours(reg, 4200.0),
+                                    help="Pre-filled from the machine registry's live counter.")
+    live_cycles = tool_accrual.max_cycles(storage.TOOL_COUNTERS, machine_id)
+    tool_cycles = c2.number_input("Tool cycles (lifetime)", min_value=0.0, step=10.0,
+                                  value=live_cycles if live_cycles is not None else 1450.0,
+                                  help="Pre-filled from the most-used tool's live counter when tools are mounted.")
     avg_temp_c = c3.number_input("Average temp (°C)", min_value=0.0, step=0.5, value=58.0)
     c4,c5 = st.columns(2)
     vibration_mm_s = c4.number_input("Vibration (mm/s)", min_value=0.0, step=0.1, value=4.3)
     coolant_ok_flag = c5.selectbox("Coolant condition", ["OK","Not OK"]) == "OK"
-    last_service_h = st.number_input("Hours since last service", min_value=0.0, step=10.0, value=1200.0)
-
-    def find_kb(issue):
-        t = issue.lower()
-        for name, keywords, causes, ops, esc_when, esc_steps in KB:
-            if any(kw in t for kw in keywords):
-                return name, causes, ops, esc_when, esc_steps
-        return ("general machining issue",
-                ["Unclear description; need more detail","Check basic parameters & clamping"],
-                ["Stop machine safely","Verify program, offsets, clamps, coolant","Retry at reduced feed"],
-                "If symptoms persist or safety risk present",
-                ["Escalate to maintenance","Document alarms and observed behavior"])
+    last_service_h = st.number_input("Hours since last service", min_value=0.0, step=10.0,
+                                     value=max(0.0, machines.hours_since_service(reg, 1200.0)))
 
     if st.button("Diagnose Issues"):
         if not issues_text.strip():
             st.warning("Enter at least one issue.")
         else:
-            txt = issues_text.lower()
-            for sep in [" and ", ";", "|", "/", "\\"]:
-                txt = txt.replace(sep, ",")
-            issues = [p.strip() for p in txt.split(",") if p.strip()]
-
-            tool_left_h, spindle_left_h, tf, sf = estimate_rul(spindle_hours, tool_cycles, avg_temp_c, vibration_mm_s, coolant_ok_flag, last_service_h)
+            issues = diagnosis.split_issues(issues_text)
+            entered = {"spindle_hours": spindle_hours, "tool_cycles": tool_cycles, "avg_temp_c": avg_temp_c,
+                       "vibration_mm_s": vibration_mm_s, "coolant_ok": coolant_ok_flag, "last_service_h": last_service_h}
 
             for i, issue in enumerate(issues, start=1):
-                name, causes, ops, esc_when, esc_steps = find_kb(issue)
-                # heuristic severity
-                severity = "Low"
-                if vibration_mm_s>4 or "overheat" in issue or "thermal" in issue:
-                    severity = "High"
-                elif avg_temp_c>55 or "leak" in issue:
-                    severity = "Medium"
-
-                operator_can_fix = not (name in ["axis backlash / position error","electrical trip / breaker","hydraulic pressure low / leak","ATC tool change stuck"] and severity!="Low")
+                d, machine_ctx = diagnosis.diagnose(issue, entered)
+                name, causes, ops, esc_steps = d["matched_issue"], d["causes"], d["ops"], d["esc_steps"]
+                sev_level, operator_can_fix = d["severity"], d["operator_can_fix"]
+                tool_left_h, spindle_left_h, tf, sf = (d["tool_hours_left"], d["spindle_hours_left"],
+                                                      d["tool_factor"], d["spindle_factor"])
+                context = {"issue_text": issue, "matched_issue": name, **machine_ctx}
 
                 st.markdown(f"### Issue {i}: {name}")
                 st.write(f"**Operator described:** _{issue}_")
                 st.write(f"**Possible causes:** {', '.join(causes)}")
-                st.write(f"**Severity:** {severity}")
+                st.write(f"**Severity:** {sev_level}")
                 st.write(f"**Estimated RUL:** Tool ≈ **{tool_left_h} h**, Spindle ≈ **{spindle_left_h} h** (factors: tool {tf}, spindle {sf})")
 
                 if operator_can_fix:
@@ -461,16 +329,34 @@ with tabs[3]:
                         st.write(f"- {step}")
                     actions = "; ".join(esc_steps)
 
-                save_row(FILES["diagnostics"], {
+                saved = storage.save_row("diagnostics", {
                     "timestamp": datetime.now().isoformat(timespec="seconds"),
                     "shift_date": str(shift_date),"shift": shift,"operator": operator,"machine_id": machine_id,
-                    "issue_text": issue,"matched_issue": name,"severity": severity,
+                    **context,"severity": sev_level,
                     "operator_can_fix": operator_can_fix,"actions": actions,
-                    "tool_hours_left": tool_left_h,"spindle_hours_left": spindle_left_h,"notes": ""
+                    "tool_hours_left": tool_left_h,"spindle_hours_left": spindle_left_h,"notes": "",
+                    "rules_version": d["rules_version"]
                 })
+                if not saved:
+                    st.caption("Identical diagnosis just saved — not saved again.")
+
+    with st.expander("Severity & escalation rules"):
+        st.caption(f"Rules version {rules_now['version']} — edit `rules/severity.json`, then re-score the history.")
+        st.json({k: v for k, v in rules_now.items() if k != "version"}, expanded=False)
+        r1, r2 = st.columns(2)
+        preview = r1.button("Preview re-score")
+        apply_rescore = r2.button("Re-score history")
+        if preview or apply_rescore:
+            diff, skipped, report = storage.rescore_diagnostics(apply=apply_rescore)
+            msg = f"{len(diff)} diagnosis row(s) {'changed' if apply_rescore else 'would change'}"
+            st.info(msg + (f"; {skipped} older row(s) have no recorded context and were left as is." if skipped else "."))
+            if not diff.empty:
+                st.dataframe(diff)
+                st.download_button("Download diff report (CSV)", diff.to_csv(index=False).encode("utf-8"),
+                                   file_name=report.name if report else "rescore_preview.csv", mime="text/csv")
 
 # 5) After Shift
-with tabs[4]:
+def render_after_shift():
     st.header("After Shift Checklist & Shutdown")
     c1,c2 = st.columns(2)
     with c1:
@@ -485,7 +371,7 @@ with tabs[4]:
         faults_reported = st.checkbox("Faults (if any) communicated to next shift/maintenance")
     notes_after = st.text_area("Notes / observations (after shift)")
     if st.button("Save After-Shift Checklist"):
-        save_row(FILES["checklists"], {
+        saved = storage.save_row("checklists", {
             "timestamp": datetime.now().isoformat(timespec="seconds"),
             "shift_date": str(shift_date),"shift": shift,"operator": operator,"machine_id": machine_id,
             "phase": "after",
@@ -496,10 +382,10 @@ with tabs[4]:
             "machine_condition": machine_condition,"program_logs": program_logs,"shutdown_ok": shutdown_ok,"faults_reported": faults_reported,
             "notes": notes_after
         })
-        st.success("After-shift checklist saved.")
+        report_save(saved, "After-shift checklist saved.")
 
 # 6) Tools
-with tabs[5]:
+def render_tools():
     st.header("Tools & Life Tracking")
     c1,c2,c3 = st.columns(3)
     tool_id = c1.text_input("Tool ID", placeholder="T05")
@@ -509,63 +395,134 @@ with tabs[5]:
     #minutes_today = c4.number_input("Minutes used (today)", min_value=0, step=5, value=0)
     #minutes_total = c5.number_input("Minutes used (total)", min_value=0, step=5, value=0)
     expected_cycles = c4.number_input("Expected life (cycles)", min_value=0, step=50, value=500)
+    # live counters (accrued from production entries) pre-fill the usage fields
+    live = tool_accrual.load_counters(storage.TOOL_COUNTERS).get((machine_id, tool_id))
+    if live:
+        st.caption(f"Live counters for {tool_id}: {live['cycles_total']} cycles, {live['minutes_total']} min "
+                   f"(updated {live['updated_at']})")
     c7,c8,c9 = st.columns(3)
-    cycles_today = c7.number_input("Cycles used (today)", min_value=0, step=1, value=0)
-    cycles_total = c8.number_input("Cycles used (total)", min_value=0, step=1, value=0)
+    cycles_today = c7.number_input("Cycles used (today)", min_value=0, step=1,
+                                   value=int(float(live["cycles_today"])) if live else 0)
+    cycles_total = c8.number_input("Cycles used (total)", min_value=0, step=1,
+                                   value=int(float(live["cycles_total"])) if live else 0)
     status = c9.selectbox("Status", ["OK","Monitor","Replace Soon","Replace Now"])
     t_notes = st.text_input("Notes (tool)")
     if st.button("Save/Update Tool"):
-        save_row(FILES["tools"], {
+        saved = storage.save_row("tools", {
             "timestamp": datetime.now().isoformat(timespec="seconds"),
             "shift_date": str(shift_date),"shift": shift,"operator": operator,"machine_id": machine_id,
             "tool_id": tool_id,"tool_name": tool_name,
-            #"expected_minutes": expected_minutes,"minutes_used_today": minutes_today,"minutes_used_total": minutes_total,
+            "expected_minutes": expected_minutes,
+            "minutes_used_today": live["minutes_today"] if live else None,
+            "minutes_used_total": live["minutes_total"] if live else None,
             "expected_cycles": expected_cycles,"cycles_used_today": cycles_today,"cycles_used_total": cycles_total,
             "status": status,"notes": t_notes
         })
-        st.success("Tool entry saved.")
+        report_save(saved, "Tool entry saved.")
+    if live and st.button("Tool replaced — reset live counters"):
+        storage.reset_tool_counters(machine_id, tool_id)
+        st.success(f"Counters for {tool_id} reset.")
+    bulk_entry("tools", {"shift_date": str(shift_date), "shift": shift, "operator": operator, "machine_id": machine_id})
+
+    with st.expander("Mount tools on a job (automatic life accrual from production)"):
+        st.caption("Each production entry for this machine and job adds parts × cycles per part and "
+                   "parts × cycle time × cutting share to every tool mounted on the job.")
+        a1, a2, a3, a4 = st.columns(4)
+        a_job = a1.text_input("Job/WO ID", key="assign_job")
+        a_per_part = a2.number_input("Cycles per part", min_value=0.0, step=1.0, value=1.0)
+        a_share = a3.number_input("Cutting share of cycle time", min_value=0.0, max_value=1.0, step=0.05, value=1.0)
+        if a4.button("Mount tool on job") and a_job.strip() and tool_id.strip():
+            storage.assign_tool(machine_id, a_job.strip(), tool_id.strip(), tool_name, a_per_part, a_share)
+            st.success(f"{tool_id} mounted on job {a_job}.")
+        assigned = tool_accrual.load_assignments(storage.TOOL_ASSIGNMENTS)
+        st.dataframe(assigned[assigned["machine_id"] == machine_id])
+
     st.subheader("Tools registry")
-    tool_df = pd.read_csv(FILES["tools"]) if FILES["tools"].exists() else pd.DataFrame()
-    if not tool_df.empty:
-        view = tool_df[tool_df["machine_id"]==machine_id].copy()
+    tool_df = storage.read_table("tools")
+    if not tool_df.empty or tool_accrual.load_counters(storage.TOOL_COUNTERS):
+        life = tool_accrual.live_registry(tool_df, storage.TOOL_COUNTERS, machine_id)
+        for r in life[life["life_used"] >= 0.9].itertuples():
+            st.warning(f"Tool {r.tool_id} nearing end of life ({r.minutes_used}/{r.expected_minutes} min, "
+                       f"{r.cycles_used}/{r.expected_cycles} cycles). Plan replacement.")
+        if not life.empty:
+            st.dataframe(life)
+        view = tool_df[tool_df["machine_id"]==machine_id]
         if not view.empty:
-            for _, r in view.iterrows():
-                try:
-                    exp_m = float(r.get("expected_minutes",0) or 0)
-                    used_m = float(r.get("minutes_used_total",0) or 0)
-                    if exp_m>0 and used_m/exp_m>=0.9:
-                        st.warning(f"Tool {r['tool_id']} nearing end of life ({used_m}/{exp_m} min). Plan replacement.")
-                except Exception:
-                    pass
+            st.caption("Logged tool entries")
             st.dataframe(view.tail(30))
-        else:
+        elif life.empty:
             st.info("No tools logged for this machine yet.")
     else:
         st.info("No tools data yet.")
 
 # 7) Logbook + Export
-with tabs[6]:
+def render_logbook():
     st.header("Logbook & Export")
-    st.subheader("Checklists")
-    if FILES["checklists"].exists():
-        st.dataframe(pd.read_csv(FILES["checklists"]).tail(100))
-    else:
-        st.info("No checklists yet.")
-    st.subheader("Production")
-    if FILES["production"].exists():
-        st.dataframe(pd.read_csv(FILES["production"]).tail(100))
-    else:
-        st.info("No production yet.")
-    st.subheader("Diagnostics")
-    if FILES["diagnostics"].exists():
-        st.dataframe(pd.read_csv(FILES["diagnostics"]).tail(100))
+    st.subheader("Search notes & issues")
+    q = st.text_input("Search text", placeholder="e.g., spindle noise")
+    s1, s2, s3 = st.columns(3)
+    q_machine = s1.text_input("Machine filter", value=machine_id)
+    q_start = s2.date_input("From", value=None)
+    q_end = s3.date_input("To", value=None)
+    if q.strip():
+        hits = search_index.search(SEARCH_DB, q, machine_id=q_machine.strip() or None, start=q_start, end=q_end)
+        if hits.empty:
+            st.info("No matches.")
+        else:
+            st.caption(f"{len(hits)} match(es), best first")
+            st.dataframe(hits.drop(columns=["rank"]))
+
+    st.subheader("Checklist compliance")
+    k1, k2, k3 = st.columns(3)
+    comp_by = k1.selectbox("Group by", ["machine_id", "operator", "shift"])
+    comp_start = k2.date_input("Compliance from", value=None)
+    comp_end = k3.date_input("Compliance to", value=None)
+    rates, ranked = checklist_bits.compliance(storage.read_checklist_bits(), comp_by, comp_start, comp_end)
+    if ranked.empty:
+        st.info("No checklists in this range.")
     else:
-        st.info("No diagnostics yet.")
-    st.subheader("Tools")
-    if FILES["tools"].exists():
-        st.dataframe(pd.read_csv(FILES["tools"]).tail(100))
+        st.caption("Most-skipped items (unticked share of applicable checks)")
+        st.dataframe(ranked.head(15))
+        with st.expander("Skip rate per item"):
+            st.dataframe(rates)
+
+    st.subheader("Plant-wide incidents")
+    st.caption("The same power / air-supply fault reported by several machines close together — "
+               "look for a shared root cause before repairing machines one by one.")
+    i1, i2 = st.columns(2)
+    inc_window = i1.number_input("Time window (min)", min_value=5, max_value=1440, step=5, value=incidents.WINDOW_MIN)
+    inc_machines = i2.number_input("Machines affected (at least)", min_value=2, step=1, value=incidents.MIN_MACHINES)
+    found = incidents.detect(storage.read_table("diagnostics"), kb.plant_wide(), inc_window, inc_machines)
+    if found.empty:
+        st.info("No plant-wide incidents in the diagnostics history.")
     else:
-        st.info("No tools yet.")
+        st.dataframe(found)
+
+    st.subheader("Records")
+    f1, f2, f3, f4 = st.columns(4)
+    rec_start = f1.date_input("Records from", value=None)
+    rec_end = f2.date_input("Records to", value=None)
+    rec_shifts = f3.multiselect("Shifts", ["A","B","C"])
+    rec_machine = f4.text_input("Machine (blank = all)", value="")
+    ranged = rec_start is not None or rec_end is not None
+    if not ranged:
+        st.caption("Latest 100 rows per table; pick a date range to see a specific day or shift.")
+    for table, label in [("checklists", "Checklists"), ("production", "Production"),
+                         ("diagnostics", "Diagnostics"), ("tools", "Tools")]:
+        st.subheader(label)
+        if ranged:
+            rec = storage.read_range(table, rec_machine.strip() or None, rec_start, rec_end, rec_shifts)
+        else:
+            rec = storage.read_table(table)
+            if rec_machine.strip():
+                rec = rec[rec["machine_id"] == rec_machine.strip()]
+            if rec_shifts:
+                rec = rec[rec["shift"].isin(rec_shifts)]
+            rec = rec.tail(100)
+        if not rec.empty:
+            st.dataframe(rec)
+        else:
+            st.info(f"No {label.lower()} {'in this range' if ranged else 'yet'}.")
 
     st.markdown("---")
     st.subheader("Generate Handover Report (Markdown download)")
@@ -574,41 +531,238 @@ with tabs[6]:
     buf.write(f"# VMC Handover Report\n")
     buf.write(f"- Date: {shift_date} | Shift: {shift} | Operator: {operator} | Machine: {machine_id}\n\n")
 
-    if FILES["checklists"].exists():
-        before = pd.read_csv(FILES["checklists"])
-        before = before[(before["machine_id"]==machine_id)&(before["phase"]=="before")].tail(1)
-        if not before.empty:
-            buf.write("## Before Shift Summary\n")
-            row = before.iloc[0].to_dict()
-            for k in ["power_ok","tooling_setup_ok","workpiece_setup_ok","coolant_ok","lubrication_ok","cleanliness_ok","safety_ok","home_positions_ok","program_ok","spindle_ok","air_ok"]:
-                buf.write(f"- {k}: {row.get(k)}\n")
-            buf.write(f"- Notes: {row.get('notes','')}\n\n")
-    if FILES["production"].exists():
-        p = pd.read_csv(FILES["production"])
-        p = p[p["machine_id"]==machine_id]
-        if not p.empty:
-            buf.write("## Production Summary (recent)\n")
-            last = p.tail(5)
-            for _, r in last.iterrows():
-                buf.write(f"- {r['timestamp']} — Job {r['job_id']}: {r['parts_done']} pcs @ {r['avg_cycle_time_min']} min; scrap {r['scrap_count']}\n")
-            buf.write("\n")
-    if FILES["diagnostics"].exists():
-        d = pd.read_csv(FILES["diagnostics"])
-        d = d[d["machine_id"]==machine_id].tail(5)
-        if not d.empty:
-            buf.write("## Diagnostics (recent)\n")
-            for _, r in d.iterrows():
-                buf.write(f"- {r['timestamp']} — {r['matched_issue']} (sev: {r['severity']}) actions: {r['actions']}\n")
-            buf.write("\n")
-    if FILES["tools"].exists():
-        t = pd.read_csv(FILES["tools"])
-        t = t[t["machine_id"]==machine_id].tail(5)
-        if not t.empty:
-            buf.write("## Tools (recent updates)\n")
-            for _, r in t.iterrows():
-                buf.write(f"- {r['timestamp']} — {r['tool_id']} {r['tool_name']} status: {r['status']} used {r['minutes_used_total']}/{r['expected_minutes']} min\n")
-            buf.write("\n")
+    # this shift's records only, read straight from the time index
+    shift_rows = {t: storage.read_range(t, machine_id, shift_date, shift_date, [shift])
+                  for t in ("checklists", "production", "diagnostics", "tools")}
+    before = shift_rows["checklists"]
+    before = before[before["phase"]=="before"].tail(1)
+    if not before.empty:
+        buf.write("## Before Shift Summary\n")
+        row = before.iloc[0].to_dict()
+        for k in ["power_ok","tooling_setup_ok","workpiece_setup_ok","coolant_ok","lubrication_ok","cleanliness_ok","safety_ok","home_positions_ok","program_ok","spindle_ok","air_ok"]:
+            buf.write(f"- {k}: {row.get(k)}\n")
+        buf.write(f"- Notes: {row.get('notes','')}\n\n")
+    p = shift_rows["production"]
+    if not p.empty:
+        buf.write("## Production Summary\n")
+        for _, r in p.iterrows():
+            buf.write(f"- {r['timestamp']} — Job {r['job_id']}: {r['parts_done']} pcs @ {r['avg_cycle_time_min']} min; scrap {r['scrap_count']}\n")
+        buf.write("\n")
+    d = shift_rows["diagnostics"]
+    if not d.empty:
+        buf.write("## Diagnostics\n")
+        for _, r in d.iterrows():
+            buf.write(f"- {r['timestamp']} — {r['matched_issue']} (sev: {r['severity']}) actions: {r['actions']}\n")
+        buf.write("\n")
+    t = shift_rows["tools"]
+    if not t.empty:
+        buf.write("## Tools (updates this shift)\n")
+        for _, r in t.iterrows():
+            buf.write(f"- {r['timestamp']} — {r['tool_id']} {r['tool_name']} status: {r['status']} used {r['minutes_used_total']}/{r['expected_minutes']} min\n")
+        buf.write("\n")
+    if all(df.empty for df in shift_rows.values()):
+        buf.write("_No records for this machine and shift._\n")
 
     st.download_button("Download Handover Report (.md)", buf.getvalue(), file_name=f"handover_{machine_id}_{shift}_{shift_date}.md")
 
+    st.markdown("---")
+    st.subheader("Full data export (audit)")
+    st.caption("Streams every matching record to a file under ./data/exports. Also available as `python export.py --help`.")
+    e1, e2 = st.columns(2)
+    exp_tables = e1.multiselect("Tables", export.TABLES, default=export.TABLES)
+    exp_format = e2.selectbox("Format", list(export.FORMATS))
+    e3, e4, e5 = st.columns(3)
+    exp_machines = e3.text_input("Machines (comma-separated, blank = all)")
+    exp_start = e4.date_input("Export from", value=None)
+    exp_end = e5.date_input("Export to", value=None)
+    if st.button("Prepare Export") and exp_tables:
+        (DATA_DIR / "exports").mkdir(exist_ok=True)
+        name = export.file_name(exp_format, exp_tables)
+        # one file per export, so sessions exporting at the same time don't overwrite each other
+        stem, ext = name.split(".", 1)
+        fd, out = tempfile.mkstemp(dir=DATA_DIR / "exports", prefix=f"{stem}_", suffix=f".{ext}")
+        os.close(fd)
+        previous = st.session_state.get("export_file")
+        if previous:
+            Path(previous[0]).unlink(missing_ok=True)
+        exp_machine_ids = [m.strip() for m in exp_machines.split(",") if m.strip()]
+        export.export(out, exp_format, DATA_DIR, exp_tables, exp_machine_ids, exp_start, exp_end)
+        st.session_state.export_file = (out, exp_format, name)
+    if st.session_state.get("export_file"):
+        out, fmt, name = st.session_state.export_file
+        if Path(out).exists() and Path(out).stat().st_size > export.UI_MAX_BYTES:
+            # the download button would hold the whole file in this worker's memory
+            st.info(f"{name} is {Path(out).stat().st_size / 2**20:,.0f} MB, too large to serve here: copy {out} "
+                    "from the server, or run `python export.py` there. It is deleted after a day.")
+        elif Path(out).exists():
+            with open(out, "rb") as fh:
+                st.download_button(f"Download {name}", fh, file_name=name, mime=export.FORMATS[fmt])
+
+# 8) Maintenance plan
+def render_maintenance_plan():
+    st.header("Fleet Maintenance Plan")
+    st.caption("Tool changes and spindle services for all machines, placed in the latest shift before each tool "
+               "or spindle runs out, grouped into as few stoppages as crew capacity allows.")
+    m1, m2, m3, m4 = st.columns(4)
+    plan_start = m1.date_input("Plan start", value=shift_date)
+    plan_days = m2.number_input("Horizon (days)", min_value=1, max_value=60, step=1, value=7)
+    run_h = m3.number_input("Run hours per shift", min_value=0.5, max_value=8.0, step=0.5, value=7.5)
+    crew_min = m4.number_input("Crew minutes per shift", min_value=30, step=30, value=480)
+    m5, m6, m7, m8 = st.columns(4)
+    tool_min = m5.number_input("Tool change (min)", min_value=1, step=5, value=15)
+    spindle_min = m6.number_input("Spindle service (min)", min_value=10, step=10, value=240)
+    overhead_min = m7.number_input("Stoppage overhead (min)", min_value=0, step=5, value=20)
+    plan_shifts = m8.multiselect("Working shifts", scheduler.SHIFTS, default=scheduler.SHIFTS)
+
+    life = tool_accrual.live_registry(storage.read_table("tools"), storage.TOOL_COUNTERS)
+    diag = storage.read_table("diagnostics")
+    spindle_left = machines.spindle_hours_left(storage.MACHINES, diag)
+    tasks = pd.concat([scheduler.tool_tasks(life), scheduler.spindle_tasks(spindle_left)], ignore_index=True)
+    if not plan_shifts:
+        st.warning("Select at least one working shift.")
+    else:
+        maint_plan, summary = scheduler.plan(tasks, plan_start, plan_days, run_h, crew_min, tool_min, spindle_min,
+                                             overhead_min, shifts=plan_shifts)
+        s1, s2, s3, s4 = st.columns(4)
+        s1.metric("Tasks in horizon", summary["tasks"])
+        s2.metric("Stoppages", summary["stoppages"])
+        s3.metric("Planned downtime (min)", int(summary["downtime_min"]))
+        s4.metric("Late / unscheduled", f"{summary['late']} / {summary['unscheduled']}")
+        if maint_plan.empty:
+            st.info("Nothing reaches end of life within the horizon.")
+        else:
+            st.dataframe(maint_plan)
+            st.download_button("Download plan (.csv)", maint_plan.to_csv(index=False),
+                               file_name=f"maintenance_plan_{plan_start}.csv", mime="text/csv")
+
+
+# 9) RUL what-if
+def _heatmap(values, x, y, x_title, y_title, title, max_cells=100):
+    """2-D slice (rows = y, columns = x) as an Altair heatmap, thinned to max_cells per axis for the browser."""
+    ys, xs = (np.unique(np.linspace(0, n - 1, min(n, max_cells)).round().astype(int)) for n in values.shape)
+    gx, gy = np.meshgrid(x[xs], y[ys])
+    dx, dy = (np.diff(a[idx]).min() / 2 if len(idx) > 1 else 0.5 for a, idx in ((x, xs), (y, ys)))
+    cells = pd.DataFrame({x_title: gx.ravel(), y_title: gy.ravel(), "hours left": values[np.ix_(ys, xs)].ravel()})
+    cells = cells.assign(x0=cells[x_title] - dx, x1=cells[x_title] + dx, y0=cells[y_title] - dy, y1=cells[y_title] + dy)
+    return alt.Chart(cells, title=title).mark_rect().encode(
+        x=alt.X("x0:Q", title=x_title), x2="x1", y=alt.Y("y0:Q", title=y_title), y2="y1",
+        color=alt.Color("hours left:Q", scale=alt.Scale(scheme="redyellowgreen")),
+        tooltip=[alt.Tooltip(f"{x_title}:Q", format=".2f"), alt.Tooltip(f"{y_title}:Q", format=".1f"),
+                 alt.Tooltip("hours left:Q", format=".0f")])
+
+
+@st.cache_data(max_entries=4, show_spinner=False)
+def _what_if_grid(spindle_hours, tool_cycles, t_range, v_range, s_range, n):
+    """Axes plus rul.what_if arrays for one machine context; reruns that only move the slice sliders reuse them."""
+    temps, vibs, services = np.linspace(*t_range, n), np.linspace(*v_range, n), np.linspace(*s_range, n)
+    return (temps, vibs, services) + rul.what_if(spindle_hours, tool_cycles, temps, vibs, services)
+
+
+def render_what_if():
+    st.header("RUL What-if Explorer")
+    st.caption(f"Remaining life for {machine_id} over grids of temperature, vibration, coolant state and service "
+               "interval (hours run between spindle services; RUL is taken at the end of the interval). "
+               "The whole grid is one NumPy evaluation of the RUL rule.")
+    reg = storage.machine_registry().get(machine_id)
+    last = storage.read_range("diagnostics", machine_id).dropna(subset=["avg_temp_c", "vibration_mm_s"]).tail(1)
+    live_cycles = tool_accrual.max_cycles(storage.TOOL_COUNTERS, machine_id)
+    w1, w2, w3, w4 = st.columns(4)
+    base_spindle = w1.number_input("Spindle hours now", min_value=0.0, step=10.0,
+                                   value=machines.spindle_hours(reg, 4200.0))
+    base_cycles = w2.number_input("Tool cycles now", min_value=0.0, step=10.0,
+                                  value=live_cycles if live_cycles is not None else 1450.0)
+    base_temp = w3.number_input("Temp now (°C)", min_value=0.0, step=0.5,
+                                value=float(last["avg_temp_c"].iloc[0]) if len(last) else 58.0)
+    base_vib = w4.number_input("Vibration now (mm/s)", min_value=0.0, step=0.1,
+                               value=float(last["vibration_mm_s"].iloc[0]) if len(last) else 4.3)
+    g1, g2, g3, g4 = st.columns(4)
+    t_lo, t_hi = g1.slider("Temperature range (°C)", 20.0, 100.0, (30.0, 80.0))
+    v_lo, v_hi = g2.slider("Vibration range (mm/s)", 0.0, 12.0, (0.0, 8.0))
+    s_lo, s_hi = g3.slider("Service interval range (h)", 100, 4000, (200, 2000), step=50)
+    n = g4.select_slider("Points per axis", [50, 100, 150, 200], value=200)
+
+    temps, vibs, services, tool_h, spindle_h = _what_if_grid(base_spindle, base_cycles, (t_lo, t_hi), (v_lo, v_hi),
+                                                             (s_lo, s_hi), n)
+    # compact arrays are cached (tool life does not vary with the service interval); full-shape views here
+    tool_h, spindle_h = (np.broadcast_to(a, (n, n, 2, n)) for a in (tool_h, spindle_h))
+    st.caption(f"{tool_h.size:,} grid points evaluated.")
+
+    f1, f2, f3 = st.columns(3)
+    at_service = f1.slider("Service every (h)", s_lo, s_hi, min(max(1000, s_lo), s_hi), step=50)
+    at_temp = f2.slider("At temperature (°C)", t_lo, t_hi, min(max(base_temp, t_lo), t_hi))
+    at_coolant = f3.selectbox("Coolant", ["OK", "Not OK"], key="whatif_coolant") == "OK"
+    si, ti = np.abs(services - at_service).argmin(), np.abs(temps - at_temp).argmin()
+    ci = 0 if at_coolant else 1
+    h1, h2 = st.columns(2)
+    h1.altair_chart(_heatmap(spindle_h[:, :, ci, si], vibs, temps, "vibration mm/s", "temperature °C",
+                             f"Spindle hours left, service every {at_service} h"))
+    h2.altair_chart(_heatmap(spindle_h[ti, :, ci, :].T, vibs, services, "vibration mm/s", "service interval h",
+                             f"Spindle hours left at {at_temp:.1f} °C"))
+    st.altair_chart(_heatmap(tool_h[:, :, ci, si], vibs, temps, "vibration mm/s", "temperature °C",
+                             f"Tool hours left, coolant {'OK' if at_coolant else 'not OK'}"))
+
+    st.subheader("Scenario vs now")
+    k1, k2, k3 = st.columns(3)
+    cap_vib = k1.number_input("Keep vibration at or under (mm/s)", min_value=0.0, step=0.1, value=3.0)
+    cap_temp = k2.number_input("Keep temperature at or under (°C)", min_value=0.0, step=0.5, value=60.0)
+    plan_service = k3.number_input("Service spindle every (h)", min_value=50.0, step=50.0, value=800.0)
+    now_service = machines.hours_since_service(reg, 1200.0)
+    # now and scenario as one 2-point evaluation of the same vectorized rule
+    tool_now, spindle_now = rul.estimate_rul_grid(
+        base_spindle, base_cycles, [base_temp, min(base_temp, cap_temp)], [base_vib, min(base_vib, cap_vib)],
+        [True, True], [now_service, plan_service])[:2]
+    c1, c2 = st.columns(2)
+    c1.metric("Spindle hours left", f"{spindle_now[1]:.0f}", f"{spindle_now[1] - spindle_now[0]:+.0f} vs now")
+    c2.metric("Tool hours left", f"{tool_now[1]:.1f}", f"{tool_now[1] - tool_now[0]:+.1f} vs now")
+
+
+# 10) Tool demand forecast
+def render_tool_demand():
+    st.header("Tool Demand Forecast")
+    st.caption("Replacement tools needed across all machines, by tool family: each tool's remaining life (live "
+               "counters or the Tools log) worn at the machine's recent run hours per day and condition factor.")
+    d1, d2, d3, d4 = st.columns(4)
+    horizon = d1.number_input("Horizon (days)", min_value=7, max_value=180, step=7, value=forecast.HORIZON_DAYS)
+    lead_time = d2.number_input("Supplier lead time (days)", min_value=0, max_value=90, step=1, value=7)
+    safety = d3.number_input("Safety stock (%)", min_value=0, max_value=200, step=5, value=20)
+    freq = d4.radio("Demand per", ["Week", "Day"], horizontal=True)[0]
+    life, events = storage.tool_replacements(shift_date, int(horizon))
+    if life.empty:
+        st.info("No tools logged yet.")
+        return
+    st.subheader("Expected replacements")
+    table = forecast.demand(events, freq)
+    if table.empty:
+        st.info("No tool reaches end of life within the horizon.")
+    else:
+        st.dataframe(table)
+    st.subheader("Reorder report")
+    families = sorted(forecast.family(life["tool_name"]).unique())
+    stock = st.data_editor(pd.DataFrame({"family": families, "on_hand": 0}), disabled=["family"],
+                           hide_index=True, key="tool_stock")
+    report = forecast.reorder_report(life, events, shift_date, lead_time, safety,
+                                     dict(zip(stock["family"], stock["on_hand"])))
+    st.dataframe(report)
+    st.download_button("Download reorder report (.csv)", report.to_csv(index=False),
+                       file_name=f"tool_reorder_{shift_date}.csv", mime="text/csv")
+
 
+# -----------------------------
+# Section selector
+# -----------------------------
+# Unlike st.tabs, which executes every tab body on each rerun, only the chosen
+# section's code runs, so a keystroke in one form reads no other section's data.
+SECTIONS = {
+    "1) Handover Snapshot": render_handover,
+    "2) Before Shift Checklist": render_before_shift,
+    "3) Production Log": render_production,
+    "4) Troubleshooting Assistant": render_troubleshooting,
+    "5) After Shift & Shutdown": render_after_shift,
+    "6) Tools & Life Tracking": render_tools,
+    "7) Logbook / Export": render_logbook,
+    "8) Maintenance Plan": render_maintenance_plan,
+    "9) RUL What-if": render_what_if,
+    "10) Tool Demand": render_tool_demand,
+}
+section = st.radio("Section", list(SECTIONS), horizontal=True, key="section", label_visibility="collapsed")
+SECTIONS[section]()
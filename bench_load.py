@@ -0,0 +1,175 @@
+import argparse
+import multiprocessing as mp
+import os
+import shutil
+import tempfile
+import time
+from datetime import date
+import numpy as np
+
+# -----------------------------
+# Shift-change load test
+# -----------------------------
+# Starts N operator sessions at once, each in its own process driving the real
+# app headlessly (streamlit.testing AppTest) against one shared data directory:
+# log in, save the before-shift checklist, save a production entry, diagnose two
+# issues — repeated for --rounds. Reports per-action latency percentiles and
+# throughput, then checks every table and derived file for lost or duplicated rows.
+ACTIONS = ["login", "checklist", "production", "diagnose"]
+ISSUES = "chatter on finishing pass, coolant leak at door"
+PARTS = 10
+CYCLE_MIN = 2.5
+USER, PASSWORD = "Prathamesh", "pass123"
+
+
+def _session(app_path, data_dir, worker, rounds, start_evt, out_q):
+    os.environ["VMC_DATA_DIR"] = data_dir
+    from streamlit.testing.v1 import AppTest
+    timings = {a: [] for a in ACTIONS}
+    errors = []
+
+    def by_label(elements, label):
+        return next(e for e in elements if e.label == label)
+
+    def timed(action, step):
+        t = time.perf_counter()
+        step()
+        at.run()
+        timings[action].append(time.perf_counter() - t)
+        errors.extend(f"{action}: {e.value}" for e in at.exception)
+
+    def goto(part):
+        radio = at.radio[0]
+        radio.set_value(next(o for o in radio.options if part in o))
+        at.run()
+
+    at = AppTest.from_file(app_path, default_timeout=600)
+    at.run()
+    start_evt.wait()
+    t0 = time.perf_counter()
+    by_label(at.text_input, "Username").input(USER)
+    by_label(at.text_input, "Password").input(PASSWORD)
+    timed("login", lambda: by_label(at.button, "Login").click())
+    at.run()
+    by_label(at.sidebar.text_input, "Operator Name").input(f"load{worker}")
+    machine = by_label(at.sidebar.selectbox, "Machine ID")
+    machine.set_value(machine.options[-1])  # "other machine": not in the registry yet
+    at.run()
+    by_label(at.sidebar.text_input, "New machine ID").input(f"LOAD-{100 + worker}")
+    at.run()
+    for i in range(rounds):
+        goto("Before Shift")
+        for cb in at.checkbox[:8]:
+            cb.check()
+        by_label(at.text_area, "Notes / observations (before shift)").input(f"load round {i}")
+        timed("checklist", lambda: by_label(at.button, "Save Before-Shift Checklist").click())
+
+        goto("Production")
+        by_label(at.text_input, "Job/WO ID").input(f"L{worker}-{i}")
+        by_label(at.number_input, "Parts done (this entry)").set_value(PARTS)
+        by_label(at.number_input, "Average cycle time (min)").set_value(CYCLE_MIN)
+        timed("production", lambda: by_label(at.button, "Save Production Entry").click())
+
+        goto("Troubleshooting")
+        by_label(at.text_area, "Describe issues").input(ISSUES)
+        # the spindle runs on between rounds; an unchanged diagnosis within minutes would be a double submit
+        by_label(at.number_input, "Spindle hours (lifetime)").set_value(4200.0 + i)
+        at.run()
+        timed("diagnose", lambda: by_label(at.button, "Diagnose Issues").click())
+    import diagnosis  # the module the app ran with in this process
+    out_q.put((worker, timings, errors, time.perf_counter() - t0, diagnosis.stats()))
+
+
+def _integrity(data_dir, sessions, rounds, out_q):
+    """Puts the problems found in the shared data after the run on out_q (empty list = consistent).
+
+    Runs in a fresh process (storage binds its data directory at import) and reads the derived
+    files as they are, without the startup rebuild that would hide drift.
+    """
+    os.environ["VMC_DATA_DIR"] = data_dir
+    import rollup
+    import storage
+    import time_index
+    problems = []
+    machines = [f"LOAD-{100 + w}" for w in range(sessions)]
+    issues = len(ISSUES.split(","))
+    expected = {"checklists": rounds, "production": rounds, "diagnostics": rounds * issues}
+    for table, per_machine in expected.items():
+        df = storage.read_table(table)
+        df = df[df["machine_id"].isin(machines)]
+        counts = df["machine_id"].astype(str).value_counts()
+        for m in machines:
+            if counts.get(m, 0) != per_machine:
+                problems.append(f"{table}: {m} has {counts.get(m, 0)} rows, expected {per_machine}")
+        if not time_index.fresh(storage.TIME_INDEX, table, storage.FILES[table]):
+            problems.append(f"time index {table}: out of step with the CSV")
+        for m in machines:
+            indexed = len(storage.read_range(table, m))
+            if indexed != counts.get(m, 0):
+                problems.append(f"time index {table}: {m} returns {indexed} rows, table has {counts.get(m, 0)}")
+    jobs = storage.read_table("production")["job_id"].astype(str)
+    want = {f"L{w}-{i}" for w in range(sessions) for i in range(rounds)}
+    if set(jobs[jobs.isin(want)]) != want or jobs.isin(want).sum() != len(want):
+        problems.append(f"production jobs: {jobs.isin(want).sum()} saved for {len(want)} submitted (lost or duplicated)")
+    roll = rollup.load(storage.ROLLUP)
+    roll = roll[roll["machine_id"].isin(machines)]
+    if int(roll["parts_done"].sum()) != sessions * rounds * PARTS:
+        problems.append(f"rollup parts {int(roll['parts_done'].sum())}, expected {sessions * rounds * PARTS}")
+    if int(roll["diagnostics"].sum()) != sessions * rounds * issues:
+        problems.append(f"rollup diagnostics {int(roll['diagnostics'].sum())}, expected {sessions * rounds * issues}")
+    registry = storage.machine_registry()
+    for m in machines:
+        runtime = registry[m]["runtime_h"] if m in registry else 0.0
+        if abs(runtime - rounds * PARTS * CYCLE_MIN / 60) > 0.01:
+            problems.append(f"machine registry: {m} has {runtime} run hours, expected {rounds * PARTS * CYCLE_MIN / 60:.2f}")
+    packed = storage.read_checklist_bits()
+    if (packed["machine_id"].astype(str).isin(machines)).sum() != sessions * rounds:
+        problems.append("packed checklists out of step with checklists.csv")
+    out_q.put(problems)
+
+
+def run(sessions, rounds, app_path):
+    data_dir = tempfile.mkdtemp(prefix="vmc_load_")
+    ctx = mp.get_context("spawn")
+    start_evt, out_q = ctx.Event(), ctx.Queue()
+    procs = [ctx.Process(target=_session, args=(app_path, data_dir, w, rounds, start_evt, out_q))
+             for w in range(sessions)]
+    for p in procs:
+        p.start()
+    time.sleep(5.0 + sessions)  # every session imports the app and renders the login page first
+    t0 = time.perf_counter()
+    start_evt.set()
+    results = [out_q.get() for _ in procs]
+    wall = time.perf_counter() - t0
+    for p in procs:
+        p.join()
+
+    timings = {a: np.concatenate([r[1][a] for r in results]) * 1000 for a in ACTIONS}
+    errors = [e for r in results for e in r[2]]
+    saves = sessions * rounds * 3
+    print(f"sessions={sessions} rounds={rounds} wall={wall:.1f}s "
+          f"throughput={sum(len(v) for v in timings.values()) / wall:.1f} actions/s ({saves / wall:.1f} save actions/s)")
+    for a in ACTIONS:
+        p50, p95, p99 = np.percentile(timings[a], [50, 95, 99])
+        print(f"  {a:<11} n={len(timings[a]):<4} p50={p50:7.0f} ms  p95={p95:7.0f} ms  p99={p99:7.0f} ms")
+    hits, misses = sum(r[4]["hits"] for r in results), sum(r[4]["misses"] for r in results)
+    print(f"  diagnosis cache: {hits}/{hits + misses} hits ({hits / max(1, hits + misses):.0%})")
+    check = ctx.Process(target=_integrity, args=(data_dir, sessions, rounds, out_q))
+    check.start()
+    problems = out_q.get()
+    check.join()
+    print(f"  app exceptions: {len(errors)}" + (f" (first: {errors[0]})" if errors else ""))
+    print("  integrity: OK" if not problems else "  integrity: " + "; ".join(problems))
+    shutil.rmtree(data_dir, ignore_errors=True)
+    return not errors and not problems
+
+
+if __name__ == "__main__":
+    ap = argparse.ArgumentParser(description="Simulate operator sessions saving at shift change.")
+    ap.add_argument("--sessions", type=int, nargs="+", default=[1, 4, 8])
+    ap.add_argument("--rounds", type=int, default=5, help="checklist/production/diagnose rounds per session")
+    ap.add_argument("--app", default=os.path.join(os.path.dirname(os.path.abspath(__file__)), "app.py"))
+    args = ap.parse_args()
+    print(f"date {date.today()}, {os.cpu_count()} CPU(s)")
+    ok = all([run(n, args.rounds, os.path.abspath(args.app)) for n in args.sessions])
+    raise SystemExit(0 if ok else 1)
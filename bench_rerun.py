@@ -0,0 +1,110 @@
+import argparse
+import os
+import shutil
+import statistics
+import sys
+import tempfile
+import time
+import numpy as np
+import pandas as pd
+
+# -----------------------------
+# Rerun latency benchmark
+# -----------------------------
+# Fills a data directory with a large synthetic history, then drives the app
+# headlessly (streamlit.testing AppTest) and times the reruns an operator
+# triggers: typing into the Troubleshooting box and opening the Logbook.
+# Pass --app to time another copy of app.py (e.g. an older revision).
+
+
+def make_data(data_dir, rows):
+    rng = np.random.default_rng(0)
+    days = pd.date_range("2024-01-01", periods=365).strftime("%Y-%m-%d").to_numpy()
+    machines = [f"VMC-{100 + i}" for i in range(20)]
+
+    def base(n):
+        d = np.sort(rng.choice(days, n))
+        return pd.DataFrame({"timestamp": [x + "T08:00:00" for x in d], "shift_date": d,
+                             "shift": rng.choice(list("ABC"), n), "operator": rng.choice(["Asha", "Ravi", "Omar"], n),
+                             "machine_id": rng.choice(machines, n)})
+
+    base(rows).assign(job_id=rng.choice(["J1", "J2", "J3"], rows), material="Aluminium",
+                      parts_done=rng.integers(0, 200, rows), avg_cycle_time_min=rng.uniform(1, 6, rows).round(2),
+                      scrap_count=rng.integers(0, 5, rows), notes="routine run").to_csv(
+        os.path.join(data_dir, "production.csv"), index=False)
+    n = rows // 4
+    base(n).assign(issue_text="chatter on finishing pass", matched_issue="chatter / vibration on cut",
+                   severity=rng.choice(["Low", "Medium", "High"], n), operator_can_fix=True,
+                   actions="Tighten workholding", tool_hours_left=50.0, spindle_hours_left=3000.0, notes="").to_csv(
+        os.path.join(data_dir, "diagnostics.csv"), index=False)
+    base(n).assign(tool_id=rng.choice(["T1", "T2", "T3", "T4"], n), tool_name="Endmill 10",
+                   expected_minutes=600.0, minutes_used_today=30.0, minutes_used_total=rng.uniform(0, 600, n).round(1),
+                   expected_cycles=500.0, cycles_used_today=10.0, cycles_used_total=rng.uniform(0, 500, n).round(),
+                   status="OK", notes="").to_csv(os.path.join(data_dir, "tools.csv"), index=False)
+    base(n).assign(phase="before", power_ok=True, safety_ok=True, coolant_ok=True, notes="").to_csv(
+        os.path.join(data_dir, "checklists.csv"), index=False)
+
+
+def run(app_path, data_dir, reruns):
+    from streamlit.testing.v1 import AppTest
+    at = AppTest.from_file(app_path, default_timeout=600)
+    at.session_state["logged_in"] = True
+    at.session_state["company"] = "bench"
+    t0 = time.perf_counter()
+    at.run()
+    first = time.perf_counter() - t0
+    if at.exception:
+        raise SystemExit(f"app raised: {at.exception[0].value}")
+
+    def select(section):
+        # section selector (radio) if the app has one; st.tabs renders every section anyway
+        for r in at.radio:
+            if section in r.options:
+                r.set_value(section)
+                at.run()
+
+    def timed(action):
+        t = time.perf_counter()
+        action()
+        at.run()
+        return time.perf_counter() - t
+
+    select(next((o for r in at.radio for o in r.options if "Troubleshooting" in o), ""))
+    box = lambda: next(t for t in at.text_area if t.label == "Describe issues")
+    typing = [timed(lambda i=i: box().input("spindle noise" + "!" * i)) for i in range(reruns)]
+    select(next((o for r in at.radio for o in r.options if "Logbook" in o), ""))
+    logbook = [timed(lambda: None) for _ in range(reruns)]
+    return first, typing, logbook
+
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description="Rerun latency of the app against a large data directory.")
+    ap.add_argument("--rows", type=int, default=200_000, help="production rows (other tables get a quarter)")
+    ap.add_argument("--reruns", type=int, default=5)
+    ap.add_argument("--app", default=os.path.join(os.path.dirname(os.path.abspath(__file__)), "app.py"))
+    args = ap.parse_args(argv)
+
+    work = tempfile.mkdtemp(prefix="vmc_rerun_")
+    data_dir = os.path.join(work, "data")
+    os.makedirs(data_dir)
+    make_data(data_dir, args.rows)
+    os.environ["VMC_DATA_DIR"] = data_dir
+    app_dir = os.path.dirname(os.path.abspath(args.app))
+    sys.path.insert(0, app_dir)
+    os.chdir(work)
+    import storage
+    t0 = time.perf_counter()
+    storage.init_storage()  # one-off index/rollup build, not part of a rerun
+    print(f"data: {args.rows} production rows, init {time.perf_counter() - t0:.1f}s")
+
+    first, typing, logbook = run(os.path.abspath(args.app), data_dir, args.reruns)
+    med = lambda xs: statistics.median(xs) * 1000
+    print(f"app={args.app}")
+    print(f"first render {first * 1000:.0f} ms")
+    print(f"troubleshooting keystroke rerun: median {med(typing):.0f} ms (max {max(typing) * 1000:.0f} ms)")
+    print(f"logbook rerun: median {med(logbook):.0f} ms (max {max(logbook) * 1000:.0f} ms)")
+    shutil.rmtree(work, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
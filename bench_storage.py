@@ -0,0 +1,63 @@
+import argparse
+import multiprocessing as mp
+import os
+import tempfile
+import time
+from datetime import datetime
+from pathlib import Path
+
+# -----------------------------
+# Multi-worker write benchmark
+# -----------------------------
+# Starts N processes that all save production rows into one shared data directory
+# through storage.save_row (the same path the app uses), then checks no row was lost.
+
+
+def _worker(data_dir, worker_id, rows, start_evt, out_q):
+    os.environ["VMC_DATA_DIR"] = data_dir
+    import storage
+    storage.init_storage()
+    start_evt.wait()
+    t0 = time.perf_counter()
+    for i in range(rows):
+        storage.save_row("production", {
+            "timestamp": datetime.now().isoformat(timespec="seconds"),
+            "shift_date": "2025-09-01", "shift": "A", "operator": f"w{worker_id}", "machine_id": f"VMC-{100 + worker_id}",
+            "job_id": f"J{i}", "material": "Aluminium", "parts_done": 1,
+            "avg_cycle_time_min": 2.5, "scrap_count": 0, "notes": f"bench row {i} from worker {worker_id}",
+        })
+    out_q.put(time.perf_counter() - t0)
+
+
+def run(workers: int, rows: int):
+    data_dir = tempfile.mkdtemp(prefix="vmc_bench_")
+    ctx = mp.get_context("spawn")
+    start_evt, out_q = ctx.Event(), ctx.Queue()
+    procs = [ctx.Process(target=_worker, args=(data_dir, w, rows, start_evt, out_q)) for w in range(workers)]
+    for p in procs:
+        p.start()
+    time.sleep(2.0)  # let every worker import pandas and initialise
+    t0 = time.perf_counter()
+    start_evt.set()
+    for p in procs:
+        p.join()
+    wall = time.perf_counter() - t0
+
+    os.environ["VMC_DATA_DIR"] = data_dir
+    import pandas as pd
+    import rollup
+    saved = len(pd.read_csv(os.path.join(data_dir, "production.csv")))
+    summary = rollup.load(Path(data_dir) / "shift_rollup.db")
+    expected = workers * rows
+    print(f"workers={workers} rows/worker={rows} wall={wall:.2f}s "
+          f"throughput={expected / wall:.0f} rows/s "
+          f"saved={saved}/{expected} rollup_parts={int(summary['parts_done'].sum())}/{expected}")
+
+
+if __name__ == "__main__":
+    ap = argparse.ArgumentParser(description="Concurrent write throughput of the shared ./data store.")
+    ap.add_argument("--workers", type=int, nargs="+", default=[1, 2, 4, 8])
+    ap.add_argument("--rows", type=int, default=200, help="rows saved by each worker")
+    args = ap.parse_args()
+    for n in args.workers:
+        run(n, args.rows)
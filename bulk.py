@@ -0,0 +1,105 @@
+from datetime import datetime
+import numpy as np
+import pandas as pd
+
+# -----------------------------
+# Batch validation for grid entry / CSV upload
+# -----------------------------
+# Each check is one vectorized mask over the whole batch; a row is rejected with
+# every reason that applies, and the valid rows are committed in a single write.
+MAX_CYCLE_MIN = 600.0
+TOOL_STATUSES = ["OK", "Monitor", "Replace Soon", "Replace Now"]
+SHIFTS = ["A", "B", "C"]
+
+ENTRY_COLUMNS = {
+    "production": ["machine_id", "job_id", "material", "parts_done", "avg_cycle_time_min", "scrap_count", "notes"],
+    "tools": ["machine_id", "tool_id", "tool_name", "expected_minutes", "expected_cycles",
+              "cycles_used_today", "cycles_used_total", "status", "notes"],
+}
+
+
+def blank_grid(table: str, machine_id: str, rows=5):
+    df = pd.DataFrame({c: pd.Series([None] * rows, dtype="object") for c in ENTRY_COLUMNS[table]})
+    df["machine_id"] = machine_id
+    if table == "tools":
+        df["status"] = "OK"
+    return df
+
+
+def _text(s):
+    return s.astype("string").str.strip().replace("", pd.NA)
+
+
+def _check(reasons, mask, reason):
+    mask = mask.fillna(False).to_numpy(dtype=bool)
+    reasons[mask] = reasons[mask] + reason + "; "
+
+
+def validate(table: str, batch: pd.DataFrame, known_machines, context: dict):
+    """Returns (rows ready for storage.save_rows, rejected frame with a `reason` column).
+
+    `context` supplies shift_date / shift / operator for rows that leave them blank.
+    """
+    df = batch.copy()
+    for c in ENTRY_COLUMNS[table]:
+        if c not in df:
+            df[c] = pd.NA
+    # drop grid rows the operator never filled in (machine_id / status come pre-filled)
+    data_cols = [c for c in ENTRY_COLUMNS[table] if c not in ("machine_id", "status")]
+    df = df[pd.concat([_text(df[c]) for c in data_cols], axis=1).notna().any(axis=1)]
+    reasons = np.full(len(df), "", dtype=object)
+
+    machine = _text(df["machine_id"])
+    _check(reasons, machine.isna(), "missing machine_id")
+    _check(reasons, machine.notna() & ~machine.isin(list(known_machines)), "unknown machine")
+
+    if table == "production":
+        numeric = {c: pd.to_numeric(df[c], errors="coerce") for c in ("parts_done", "avg_cycle_time_min", "scrap_count")}
+        for c, v in numeric.items():
+            _check(reasons, _text(df[c]).notna() & v.isna(), f"{c} not a number")
+        _check(reasons, numeric["parts_done"] < 0, "negative parts_done")
+        _check(reasons, numeric["scrap_count"] < 0, "negative scrap_count")
+        _check(reasons, numeric["parts_done"].isna(), "missing parts_done")
+        _check(reasons, _text(df["avg_cycle_time_min"]).isna(), "missing avg_cycle_time_min")
+        _check(reasons, (numeric["avg_cycle_time_min"] <= 0) | (numeric["avg_cycle_time_min"] > MAX_CYCLE_MIN),
+               f"avg_cycle_time_min outside 0–{MAX_CYCLE_MIN:g}")
+        _check(reasons, numeric["scrap_count"] > numeric["parts_done"], "scrap exceeds parts_done")
+        _check(reasons, _text(df["job_id"]).isna(), "missing job_id")
+    else:
+        numeric = {c: pd.to_numeric(df[c], errors="coerce")
+                   for c in ("expected_minutes", "expected_cycles", "cycles_used_today", "cycles_used_total")}
+        for c, v in numeric.items():
+            _check(reasons, _text(df[c]).notna() & v.isna(), f"{c} not a number")
+            _check(reasons, v < 0, f"negative {c}")
+        _check(reasons, numeric["cycles_used_today"] > numeric["cycles_used_total"], "cycles today exceed total")
+        _check(reasons, _text(df["tool_id"]).isna(), "missing tool_id")
+        _check(reasons, _text(df["status"]).notna() & ~_text(df["status"]).isin(TOOL_STATUSES), "unknown status")
+
+    # shift fields given in the batch win over the context, so they are checked too
+    given = {c: _text(df[c]) if c in df else pd.Series(pd.NA, index=df.index, dtype="string")
+             for c in ("shift_date", "shift", "operator")}
+    _check(reasons, given["shift"].notna() & ~given["shift"].isin(SHIFTS), "unknown shift")
+    iso = pd.to_datetime(given["shift_date"], format="%Y-%m-%d", errors="coerce").dt.strftime("%Y-%m-%d")
+    _check(reasons, given["shift_date"].notna() & (iso.isna() | (iso != given["shift_date"])),
+           "shift_date not YYYY-MM-DD")
+
+    ok = reasons == ""
+    good = df[ok].copy()
+    for c, v in numeric.items():
+        good[c] = v[ok].round().astype("Int64") if c in ("parts_done", "scrap_count") else v[ok]
+    good["machine_id"] = machine[ok]
+    for c, v in given.items():
+        good[c] = v[ok].fillna(context[c])
+    good = good.astype(object).where(good.notna(), None)
+    good["timestamp"] = datetime.now().isoformat(timespec="seconds")  # replaces any uploaded timestamp
+    rows = good[["timestamp", "shift_date", "shift", "operator"] + ENTRY_COLUMNS[table]].to_dict("records")
+    if table == "tools":
+        for r in rows:
+            r["status"] = r["status"] or "OK"
+    rejected = df[~ok].assign(reason=[r.rstrip("; ") for r in reasons[~ok]])
+    return rows, rejected
+
+
+def read_upload(file):
+    """Uploaded CSV -> text frame (validation does the typing)."""
+    return pd.read_csv(file, dtype=str, keep_default_na=False)
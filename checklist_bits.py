@@ -0,0 +1,111 @@
+from pathlib import Path
+import numpy as np
+import pandas as pd
+import schemas
+import sources
+from schemas import BEFORE_ITEMS, AFTER_ITEMS
+
+# -----------------------------
+# Bit-packed checklists + compliance analytics
+# -----------------------------
+# Each checklist row becomes one uint32: bit i is set when ITEMS[i] was ticked.
+# Which bits apply comes from the phase (before / after), so an unticked
+# applicable bit is a skipped item. Packed rows live in checklists_packed.csv.
+ITEMS = BEFORE_ITEMS + AFTER_ITEMS
+BLANK_GROUP = "(blank)"
+BITS = np.uint32(1) << np.arange(len(ITEMS), dtype=np.uint32)
+PHASE_MASK = {
+    "before": int(BITS[:len(BEFORE_ITEMS)].sum()),
+    "after": int(BITS[len(BEFORE_ITEMS):].sum()),
+}
+KEY_COLS = ["shift_date", "shift", "operator", "machine_id", "phase"]
+PACKED_DTYPES = {"shift_date": "string", "shift": "category", "operator": "category",
+                 "machine_id": "category", "phase": "category", "done_mask": "uint32"}
+
+
+def pack(df: pd.DataFrame):
+    """Checklist rows -> KEY_COLS + done_mask, in one matrix product."""
+    ticked = np.zeros((len(df), len(ITEMS)), dtype=np.uint32)
+    for i, item in enumerate(ITEMS):
+        if item in df:
+            ticked[:, i] = df[item].astype("boolean").fillna(False).to_numpy(dtype=bool)
+    out = pd.DataFrame({c: df[c].to_numpy() if c in df else None for c in KEY_COLS})
+    out["done_mask"] = ticked @ BITS
+    return out
+
+
+def _sources_path(packed_path: Path):
+    return packed_path.with_suffix(".sources.json")
+
+
+def append_packed(packed_path: Path, rows: list, csv_path: Path, before):
+    """Write path hook: pack newly saved checklist rows onto the end of the packed file.
+
+    `before` is the CSV's signature before the append; a packed file out of step with it is repacked.
+    """
+    if not packed_path.exists() or not sources.in_step(_sources_path(packed_path), "checklists", before):
+        _repack(packed_path, csv_path)
+        return
+    pack(pd.DataFrame(rows)).to_csv(packed_path, mode="a", header=False, index=False)
+    sources.record(_sources_path(packed_path), {"checklists": csv_path})
+
+
+def ensure_packed(packed_path: Path, csv_path: Path):
+    """Repack everything when the packed file is missing or out of step with checklists.csv."""
+    if packed_path.exists() and sources.fresh(_sources_path(packed_path), {"checklists": csv_path}):
+        return
+    _repack(packed_path, csv_path)
+
+
+def _repack(packed_path: Path, csv_path: Path):
+    if not csv_path.exists():
+        checklists = pd.DataFrame()
+    else:
+        try:
+            checklists = schemas.read_typed(csv_path, "checklists")
+        except (ValueError, TypeError):
+            checklists = schemas.coerce(pd.read_csv(csv_path, dtype=str, keep_default_na=False), "checklists")[0]
+    pack(checklists).to_csv(packed_path, index=False)
+    sources.record(_sources_path(packed_path), {"checklists": csv_path}, rebuilt=True)
+
+
+def load_packed(packed_path: Path):
+    if not packed_path.exists():
+        return pd.DataFrame(columns=list(PACKED_DTYPES)).astype(PACKED_DTYPES)
+    return pd.read_csv(packed_path, dtype=PACKED_DTYPES)
+
+
+def compliance(packed: pd.DataFrame, by: str, start=None, end=None):
+    """Per-group skip counts and rates for every item over an optional shift_date range.
+
+    Returns (rates, long) where rates is groups x items skip rate, and long is one
+    row per (group, item) with checks/skipped/skip_rate, most skipped first.
+    """
+    p = packed
+    if start:
+        p = p[p["shift_date"] >= str(start)]
+    if end:
+        p = p[p["shift_date"] <= str(end)]
+    p = p[p["phase"].isin(list(PHASE_MASK))]
+    if p.empty:
+        return pd.DataFrame(), pd.DataFrame()
+    done = p["done_mask"].to_numpy(dtype=np.uint32)
+    applicable = p["phase"].map(PHASE_MASK).to_numpy(dtype=np.uint32)
+    skipped = applicable & ~done
+    # a checklist saved without an operator (or shift) is its own group instead of a -1 code
+    keys = p[by].astype("string").str.strip().fillna("").replace("", BLANK_GROUP)
+    codes, groups = pd.factorize(keys)
+    groups = pd.Index(groups, dtype=str)
+    # one bincount per item bit over the group codes; no per-row Python work
+    skip = pd.DataFrame({item: np.bincount(codes, weights=(skipped & bit) != 0, minlength=len(groups))
+                         for item, bit in zip(ITEMS, BITS)}, index=groups).astype(int)
+    checks = pd.DataFrame({item: np.bincount(codes, weights=(applicable & bit) != 0, minlength=len(groups))
+                           for item, bit in zip(ITEMS, BITS)}, index=groups).astype(int)
+    rates = (skip / checks.where(checks > 0)).round(3)
+    skip.index.name = checks.index.name = rates.index.name = by
+    long = pd.DataFrame({
+        "checks": checks.stack(), "skipped": skip.stack(), "skip_rate": rates.stack(),
+    }).reset_index()
+    long.columns = [by, "item", "checks", "skipped", "skip_rate"]
+    long = long[long["checks"] > 0].sort_values(["skip_rate", "skipped"], ascending=False)
+    return rates, long.reset_index(drop=True)
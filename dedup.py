@@ -0,0 +1,214 @@
+import argparse
+import csv
+import hashlib
+import io
+import sqlite3
+from datetime import datetime
+from pathlib import Path
+import numpy as np
+import pandas as pd
+import schemas
+import sources
+
+# -----------------------------
+# Double-submit protection for logged records
+# -----------------------------
+# A record's content is a 64-bit hash over its business fields: every column
+# except the save timestamp, each in a canonical text form (numbers to 12
+# significant digits, booleans as True/False, text stripped), so a double-clicked
+# save, a batch submitted twice or a row rewritten with different number
+# formatting all hash the same. A record only counts as a duplicate when the same
+# content was saved less than WINDOW_S seconds before (or after) it: the same job
+# legitimately logging the same parts twice in a shift is saved both times. The
+# write path keeps one in-memory dict per table, content hash -> latest save time,
+# an O(1) lookup per row. It is built from the table once, then only rows appended
+# since (by this or another worker) are read; a rewritten file is read again.
+# The window only catches double submits: a CSV file imported again hours later
+# gets fresh save times. Uploads are therefore also remembered by the SHA-256 of
+# the file (imports.db), and the same file is refused for good.
+IGNORED = {"timestamp"}
+WINDOW_S = 300
+SMALL_TAIL = 64 * 1024  # new bytes up to this size are hashed row by row
+
+# table -> {"read_bytes", "header", "tail", "latest"}: content hash -> latest save time of the rows read so far
+_cache = {}
+
+
+def business_columns(table: str):
+    return [c for c in schemas.columns(table) if c not in IGNORED]
+
+
+def _text(v):
+    if v is None or v is pd.NA or (isinstance(v, float) and v != v):
+        return ""
+    return str(v).strip()
+
+
+def _number(v):
+    t = _text(v)
+    try:
+        return f"{float(t):.12g}" if t else ""
+    except ValueError:
+        return t
+
+
+def _boolean(v):
+    t = _text(v)
+    return "True" if t in schemas.TRUE_VALUES else "False" if t in schemas.FALSE_VALUES else t
+
+
+def _canonical_fns(table: str):
+    dtypes = schemas.SCHEMAS[table]["columns"]
+    kind = {"Int64": _number, "float64": _number, "boolean": _boolean}
+    return [(c, kind.get(dtypes[c], _text)) for c in business_columns(table)]
+
+
+def _hash(keys):
+    return pd.util.hash_array(np.asarray(keys, dtype=object))
+
+
+def row_hashes(rows: list, table: str):
+    """uint64 content hash per record (dicts as passed to storage.save_rows)."""
+    fns = _canonical_fns(table)
+    return _hash(["\x1f".join(fn(r.get(c)) for c, fn in fns) for r in rows]) if rows else np.empty(0, np.uint64)
+
+
+def frame_hashes(raw: pd.DataFrame, table: str):
+    """row_hashes for a table read as text (dtype=str, keep_default_na=False), column-wise."""
+    if raw.empty:
+        return np.empty(0, dtype=np.uint64)
+    cols = []
+    for c, fn in _canonical_fns(table):
+        if c not in raw:
+            cols.append(pd.Series("", index=raw.index))
+        elif fn is _text:
+            cols.append(raw[c].str.strip())
+        else:
+            # few distinct values (counts, times, flags): canonicalize each once
+            codes, uniques = pd.factorize(raw[c])
+            cols.append(pd.Series(np.array([fn(u) for u in uniques] + [""], dtype=object)[codes], index=raw.index))
+    return _hash(cols[0].str.cat(cols[1:], sep="\x1f").to_numpy())
+
+
+def save_times(stamps):
+    """Save timestamps -> seconds since the epoch (NaN where blank or unparseable)."""
+    t = pd.to_datetime(pd.Series(stamps, dtype="string"), errors="coerce", format="ISO8601", utc=True)
+    return ((t - pd.Timestamp(0, tz="UTC")).dt.total_seconds()).to_numpy()
+
+
+def _remember(latest: dict, hashes, times):
+    for h, t in zip(hashes, times):
+        old = latest.get(h)
+        if old is None or old != old or t > old:  # a missing (NaN) time never replaces a known one
+            latest[h] = t
+
+
+def latest_saves(table: str, csv_path: Path):
+    """Content hash -> latest save time of every record in the table (shared with the cache). Caller holds the write lock."""
+    size = csv_path.stat().st_size
+    hit = _cache.get(table)
+    with open(csv_path, "rb") as fh:
+        header = fh.readline()
+        if hit and (size < hit["read_bytes"] or header != hit["header"]
+                    or sources.tail(fh, hit["read_bytes"]) != hit["tail"]):
+            hit = None  # rewritten (dedup, repair, re-score, new column): read it again
+        if hit is None:
+            hit = {"read_bytes": len(header), "header": header, "tail": b"", "latest": {}}
+        fh.seek(hit["read_bytes"])
+        data = fh.read(size - hit["read_bytes"])
+        if len(data) > SMALL_TAIL:
+            raw = pd.read_csv(io.BytesIO(header + data), dtype=str, keep_default_na=False)
+            _remember(hit["latest"], frame_hashes(raw, table).tolist(), save_times(raw["timestamp"]))
+        elif data:
+            # a few rows from another worker: the csv module beats a read_csv call
+            rows = list(csv.DictReader(io.StringIO((header + data).decode("utf-8"), newline="")))
+            _remember(hit["latest"], row_hashes(rows, table).tolist(), save_times([r.get("timestamp") for r in rows]))
+        hit["read_bytes"] = size
+        hit["tail"] = sources.tail(fh, size)
+    _cache[table] = hit
+    return hit["latest"]
+
+
+def split_new(table: str, csv_path: Path, rows: list):
+    """(rows to save, duplicate rows, (hash, save time) of the rows to save).
+
+    A row is a duplicate when the same content was saved within WINDOW_S seconds of it, in the
+    table or earlier in `rows`. Caller holds the write lock.
+    """
+    latest = latest_saves(table, csv_path)
+    fresh, dupes, saved = [], [], {}
+    for row, h, t in zip(rows, row_hashes(rows, table).tolist(), save_times([r.get("timestamp") for r in rows])):
+        if any(abs(t - seen.get(h, np.nan)) < WINDOW_S for seen in (latest, saved)):
+            dupes.append(row)
+        else:
+            _remember(saved, [h], [t])
+            fresh.append(row)
+    return fresh, dupes, list(saved.items())
+
+
+def appended(table: str, csv_path: Path, before_size: int, saved: list):
+    """Write path hook: the rows with `saved` (hash, save time) pairs were appended to a file of before_size bytes."""
+    hit = _cache.get(table)
+    if not hit or hit["read_bytes"] != before_size:
+        return  # someone else wrote in between: the next latest_saves call reads the tail
+    _remember(hit["latest"], *zip(*saved))
+    with open(csv_path, "rb") as fh:
+        hit["read_bytes"] = csv_path.stat().st_size
+        hit["tail"] = sources.tail(fh, hit["read_bytes"])
+
+
+def file_digest(data: bytes):
+    return hashlib.sha256(data).hexdigest()
+
+
+def _imports(db_path: Path):
+    con = sqlite3.connect(db_path, timeout=30)
+    con.execute("CREATE TABLE IF NOT EXISTS imports (table_name TEXT, sha256 TEXT, imported_at TEXT, rows INTEGER, "
+                "PRIMARY KEY (table_name, sha256))")
+    return con
+
+
+def imported_at(db_path: Path, table: str, digest: str):
+    """When the file with this digest was imported into `table` (None if never)."""
+    if not db_path.exists():
+        return None
+    con = _imports(db_path)
+    row = con.execute("SELECT imported_at FROM imports WHERE table_name = ? AND sha256 = ?", (table, digest)).fetchone()
+    con.close()
+    return row[0] if row else None
+
+
+def record_import(db_path: Path, table: str, digest: str, rows: int):
+    """Remember an imported file. Caller holds the write lock."""
+    con = _imports(db_path)
+    with con:
+        con.execute("INSERT OR IGNORE INTO imports VALUES (?, ?, ?, ?)",
+                    (table, digest, datetime.now().isoformat(timespec="seconds"), rows))
+    con.close()
+
+
+def drop_duplicates(csv_path: Path, table: str):
+    """(kept, removed) text frames: records repeated within WINDOW_S seconds of the previous copy removed."""
+    raw = pd.read_csv(csv_path, dtype=str, keep_default_na=False)
+    keys = pd.DataFrame({"h": frame_hashes(raw, table), "t": save_times(raw["timestamp"])}, index=raw.index)
+    keys = keys.sort_values(["h", "t"], kind="stable")
+    gap = keys["t"] - keys.groupby("h")["t"].shift()
+    dup = (gap < WINDOW_S).reindex(raw.index)
+    return raw[~dup], raw[dup]
+
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description="Remove double-submitted records from the data/*.csv history "
+                                             "(first copy kept).")
+    ap.add_argument("--apply", action="store_true", help="rewrite the tables (default: report only)")
+    args = ap.parse_args(argv)
+    import storage
+    removed, report = storage.dedup_history(apply=args.apply)
+    for table, n in removed.items():
+        print(f"{table}: {n} duplicate row(s)")
+    if report:
+        print(f"removed rows kept in: {report}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,108 @@
+import os
+import re
+import threading
+import time
+from collections import OrderedDict
+import pandas as pd
+import kb
+import rul
+import severity
+
+# -----------------------------
+# Diagnosis of one reported issue, memoized
+# -----------------------------
+# The same complaints come back every shift, so a diagnosis (KB match,
+# severity/escalation, RUL) is cached per process and shared by all sessions.
+# The key is the normalized issue text, the machine context rounded to QUANTUM
+# and the KB / rules versions: the result is computed from the rounded context,
+# so a hit returns exactly what a fresh run would, and editing the KB or rules
+# changes the key (the cache is also emptied then). Entries expire after
+# CACHE_TTL_S and the least recently used go first once CACHE_SIZE is reached.
+CACHE_SIZE = int(os.environ.get("VMC_DIAG_CACHE_SIZE", 4096))
+CACHE_TTL_S = float(os.environ.get("VMC_DIAG_CACHE_TTL_S", 3600))
+
+# resolution the machine context is rounded to (finer than the inputs are read at)
+QUANTUM = {"spindle_hours": 0.1, "tool_cycles": 1.0, "avg_temp_c": 0.1, "vibration_mm_s": 0.01, "last_service_h": 0.1}
+
+_lock = threading.Lock()
+_entries = OrderedDict()  # key -> (expires_at, result)
+_versions = None
+_stats = {"hits": 0, "misses": 0, "expired": 0, "evicted": 0, "invalidations": 0}
+
+
+def split_issues(text: str):
+    """Free text -> individual issues (comma, ';', '|', '/', '\\' or ' and ' separated)."""
+    txt = text.lower()
+    for sep in [" and ", ";", "|", "/", "\\"]:
+        txt = txt.replace(sep, ",")
+    return [p.strip() for p in txt.split(",") if p.strip()]
+
+
+def normalize(issue: str):
+    """Lower case, single spaces, no trailing punctuation: 'Coolant  leak!' and 'coolant leak' are one key."""
+    return re.sub(r"\s+", " ", issue.lower()).strip().strip(".!?").strip()
+
+
+def quantize(context: dict):
+    """Machine context rounded to QUANTUM (coolant_ok as bool); diagnoses are computed from this."""
+    out = {k: round(round(float(context[k]) / q) * q, 6) for k, q in QUANTUM.items()}
+    out["coolant_ok"] = bool(context["coolant_ok"])
+    return out
+
+
+def _compute(issue: str, context: dict, rules):
+    name, causes, ops, esc_when, esc_steps = kb.match(issue)
+    sev, can_fix = severity.score(pd.DataFrame([{"issue_text": issue, "matched_issue": name, **context}]), rules)
+    tool_left_h, spindle_left_h, tf, sf = rul.estimate_rul(**{k: context[k] for k in severity.CONTEXT})
+    return {"matched_issue": name, "causes": tuple(causes), "ops": tuple(ops), "esc_steps": tuple(esc_steps),
+            "severity": sev[0], "operator_can_fix": bool(can_fix[0]), "tool_hours_left": tool_left_h,
+            "spindle_hours_left": spindle_left_h, "tool_factor": tf, "spindle_factor": sf,
+            "rules_version": rules["version"]}
+
+
+def diagnose(issue: str, context: dict):
+    """One issue + machine context -> (result dict, quantized context the result is for). Do not mutate the result."""
+    global _versions
+    issue = normalize(issue)
+    context = quantize(context)
+    rules = severity.load()
+    versions = (kb.current().digest, rules["version"])
+    key = (issue, tuple(context[k] for k in severity.CONTEXT)) + versions
+    now = time.monotonic()
+    with _lock:
+        if versions != _versions:
+            if _entries:
+                _stats["invalidations"] += 1
+            _entries.clear()
+            _versions = versions
+        hit = _entries.get(key)
+        if hit is not None:
+            if hit[0] > now:
+                _entries.move_to_end(key)
+                _stats["hits"] += 1
+                return hit[1], context
+            del _entries[key]
+            _stats["expired"] += 1
+        _stats["misses"] += 1
+    result = _compute(issue, context, rules)
+    with _lock:
+        if _versions == versions:
+            _entries[key] = (now + CACHE_TTL_S, result)
+            while len(_entries) > CACHE_SIZE:
+                _entries.popitem(last=False)
+                _stats["evicted"] += 1
+    return result, context
+
+
+def stats():
+    """Cache counters for this process plus current size and hit rate."""
+    with _lock:
+        out = dict(_stats, size=len(_entries))
+    lookups = out["hits"] + out["misses"]
+    out["hit_rate"] = out["hits"] / lookups if lookups else 0.0
+    return out
+
+
+def clear():
+    with _lock:
+        _entries.clear()
@@ -0,0 +1,147 @@
+import argparse
+import io
+import os
+import time
+import zipfile
+from pathlib import Path
+import pandas as pd
+
+# -----------------------------
+# Streaming export of the data tables (zipped CSV / Parquet / Excel)
+# -----------------------------
+# Tables are read in chunks and written chunk by chunk, so memory stays flat no
+# matter how much history there is. Values are exported as text, exactly as stored.
+# The app writes its exports under data/exports and hands them to the browser
+# through st.download_button, which holds the whole file in memory; files above
+# UI_MAX_BYTES are left to be fetched from disk / produced with the CLI instead.
+TABLES = ["checklists", "production", "tools", "diagnostics", "handover"]
+FORMATS = {"csv.zip": "application/zip", "parquet": "application/octet-stream",
+           "xlsx": "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"}
+CHUNK_ROWS = 50_000
+XLSX_MAX_ROWS = 1_048_575  # per sheet, excluding the header
+UI_MAX_BYTES = 200 * 1024 * 1024
+MAX_AGE_S = 24 * 3600  # app exports older than this are deleted at startup
+
+
+def iter_chunks(path: Path, machines=None, start=None, end=None, chunksize=CHUNK_ROWS):
+    """Yield filtered DataFrame chunks of one CSV table."""
+    if not path.exists():
+        return
+    for chunk in pd.read_csv(path, dtype=str, keep_default_na=False, chunksize=chunksize):
+        if machines:
+            chunk = chunk[chunk["machine_id"].isin(machines)]
+        if start:
+            chunk = chunk[chunk["shift_date"] >= str(start)]
+        if end:
+            chunk = chunk[chunk["shift_date"] <= str(end)]
+        if not chunk.empty:
+            yield chunk
+
+
+def _header(path: Path):
+    return list(pd.read_csv(path, nrows=0).columns) if path.exists() else []
+
+
+def _write_csv_zip(out, sources, **filters):
+    with zipfile.ZipFile(out, "w", compression=zipfile.ZIP_DEFLATED) as zf:
+        for table, path in sources.items():
+            with zf.open(f"{table}.csv", "w") as raw, io.TextIOWrapper(raw, encoding="utf-8", newline="") as fh:
+                header = True
+                for chunk in iter_chunks(path, **filters):
+                    chunk.to_csv(fh, index=False, header=header)
+                    header = False
+                if header:
+                    pd.DataFrame(columns=_header(path)).to_csv(fh, index=False)
+
+
+def _write_parquet_table(fh, path: Path, **filters):
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+    schema = pa.schema([(c, pa.string()) for c in _header(path)])
+    with pq.ParquetWriter(fh, schema, compression="snappy") as writer:
+        for chunk in iter_chunks(path, **filters):
+            writer.write_table(pa.Table.from_pandas(chunk, schema=schema, preserve_index=False))
+
+
+def _write_parquet(out, sources, **filters):
+    # a single table is a plain .parquet file; several tables go into a zip of .parquet files
+    if len(sources) == 1:
+        (path,) = sources.values()
+        _write_parquet_table(out, path, **filters)
+        return
+    with zipfile.ZipFile(out, "w", compression=zipfile.ZIP_STORED) as zf:
+        for table, path in sources.items():
+            with zf.open(f"{table}.parquet", "w") as fh:
+                _write_parquet_table(fh, path, **filters)
+
+
+def _write_xlsx(out, sources, **filters):
+    from openpyxl import Workbook
+    wb = Workbook(write_only=True)
+    for table, path in sources.items():
+        header = _header(path)
+        part, rows = 1, 0
+        ws = wb.create_sheet(table)
+        ws.append(header)
+        for chunk in iter_chunks(path, **filters):
+            for rec in chunk.itertuples(index=False, name=None):
+                if rows == XLSX_MAX_ROWS:
+                    part, rows = part + 1, 0
+                    ws = wb.create_sheet(f"{table}_{part}")
+                    ws.append(header)
+                ws.append(rec)
+                rows += 1
+    wb.save(out)
+
+
+WRITERS = {"csv.zip": _write_csv_zip, "parquet": _write_parquet, "xlsx": _write_xlsx}
+
+
+def export(out, fmt: str, data_dir: Path, tables=None, machines=None, start=None, end=None):
+    """Write the selected tables to `out` (a path or binary file object)."""
+    if fmt not in WRITERS:
+        raise ValueError(f"Unknown export format: {fmt}")
+    sources = {t: Path(data_dir) / f"{t}.csv" for t in (tables or TABLES)}
+    WRITERS[fmt](out, sources, machines=machines, start=start, end=end)
+
+
+def file_name(fmt: str, tables):
+    if fmt == "parquet" and len(tables) > 1:
+        return "vmc_export.parquet.zip"
+    stem = tables[0] if len(tables) == 1 else "vmc_export"
+    return f"{stem}.{fmt}"
+
+
+def prune(export_dir: Path, max_age_s=MAX_AGE_S):
+    """Delete exports older than max_age_s (e.g. left by sessions that ended); returns how many."""
+    if not export_dir.exists():
+        return 0
+    cutoff = time.time() - max_age_s
+    removed = 0
+    for path in export_dir.iterdir():
+        try:
+            if path.is_file() and path.stat().st_mtime < cutoff:
+                path.unlink()
+                removed += 1
+        except FileNotFoundError:
+            pass  # another worker pruned it first
+    return removed
+
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description="Export VMC logbook tables.")
+    ap.add_argument("--format", choices=list(WRITERS), default="csv.zip")
+    ap.add_argument("--data-dir", default=os.environ.get("VMC_DATA_DIR", "data"))
+    ap.add_argument("--tables", nargs="*", choices=TABLES, default=TABLES)
+    ap.add_argument("--machine", action="append", dest="machines", help="repeat for several machines")
+    ap.add_argument("--start", help="first shift_date (YYYY-MM-DD)")
+    ap.add_argument("--end", help="last shift_date (YYYY-MM-DD)")
+    ap.add_argument("-o", "--output", help="output file (default: derived from format)")
+    args = ap.parse_args(argv)
+    out = args.output or file_name(args.format, args.tables)
+    export(out, args.format, Path(args.data_dir), args.tables, args.machines, args.start, args.end)
+    print(f"Wrote {out}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,123 @@
+from datetime import date, timedelta
+import numpy as np
+import pandas as pd
+import rul
+
+# -----------------------------
+# Tool replacement demand forecast
+# -----------------------------
+# Every tool in the live registry is run forward at its machine's recent
+# production rate: minutes of cutting (run time x the tool's cut share) and
+# cycles (parts x cycles per part) per day, sped up by the machine's condition
+# (estimate_rul's tool factor from the latest diagnosis). A tool is replaced
+# when the first of its minute / cycle limits runs out, and again after each
+# full life. Replacement dates are bucketed per tool family (tool name, case and
+# spacing ignored) and day or week. Every step is a vectorized groupby / repeat
+# over the whole fleet.
+HORIZON_DAYS = 28
+USAGE_DAYS = 14  # production history used for each machine's daily rate
+MAX_EVENTS_PER_TOOL = 500
+COLUMNS = ["family", "machine_id", "tool_id", "tool_name", "due"]
+
+
+def family(names: pd.Series):
+    return names.fillna("").astype(str).str.strip().str.split().str.join(" ").str.title().replace("", "(unnamed)")
+
+
+def daily_rates(production: pd.DataFrame, today: date, days=USAGE_DAYS):
+    """machine_id -> run_min and parts per calendar day over the last `days` days logged up to today."""
+    dates = production["shift_date"].astype("string")
+    logged = dates[dates <= str(today)].max()
+    if pd.isna(logged):
+        return pd.DataFrame(columns=["run_min", "parts"], dtype=float)
+    end = min(today, date.fromisoformat(logged))
+    p = production[(dates > str(end - timedelta(days=days))) & (dates <= str(end))]
+    parts = pd.to_numeric(p["parts_done"], errors="coerce").fillna(0)
+    run_min = parts * pd.to_numeric(p["avg_cycle_time_min"], errors="coerce").fillna(0)
+    rates = pd.DataFrame({"run_min": run_min, "parts": parts}).groupby(p["machine_id"].astype(str)).sum() / days
+    return rates[(rates["run_min"] > 0) & (rates["parts"] > 0)]
+
+
+def wear_factors(diag: pd.DataFrame):
+    """machine_id -> estimate_rul tool factor from the latest diagnosis with machine context."""
+    d = diag.dropna(subset=["machine_id", "avg_temp_c", "vibration_mm_s"])
+    last = d.groupby("machine_id", observed=True).tail(1)
+    _, _, factor, _ = rul.estimate_rul_grid(0.0, 0.0, last["avg_temp_c"].to_numpy(dtype=float),
+                                            last["vibration_mm_s"].to_numpy(dtype=float),
+                                            last["coolant_ok"].fillna(True).to_numpy(dtype=bool), 0.0)
+    return pd.Series(factor, index=last["machine_id"].astype(str).to_numpy())
+
+
+def _usage(assignments: pd.DataFrame):
+    """(machine_id, tool_id) -> cut_share, cycles_per_part; the heaviest use over the jobs a tool is mounted on."""
+    a = assignments.assign(cut_share=pd.to_numeric(assignments["cut_share"], errors="coerce"),
+                           cycles_per_part=pd.to_numeric(assignments["cycles_per_part"], errors="coerce"))
+    return a.groupby(["machine_id", "tool_id"])[["cut_share", "cycles_per_part"]].max()
+
+
+def replacements(life: pd.DataFrame, assignments: pd.DataFrame, production: pd.DataFrame, diag: pd.DataFrame,
+                 today: date, horizon_days=HORIZON_DAYS):
+    """One row per forecast tool replacement inside the horizon (COLUMNS; due is a Timestamp).
+
+    Machines without recent production run at the fleet median rate.
+    """
+    if life.empty:
+        return pd.DataFrame(columns=COLUMNS)
+    num = lambda c: pd.to_numeric(life[c], errors="coerce").to_numpy(dtype=float, copy=True)
+    key = pd.MultiIndex.from_arrays([life["machine_id"].astype(str), life["tool_id"].astype(str)])
+    usage = _usage(assignments).reindex(key)
+    rates = daily_rates(production, today)
+    fleet = rates.median() if not rates.empty else pd.Series({"run_min": 0.0, "parts": 0.0})
+    rates = rates.reindex(key.get_level_values(0))
+    wear = wear_factors(diag).reindex(key.get_level_values(0)).fillna(1.0).to_numpy()
+    # minutes / cycles the tool uses per day, already sped up by the machine's condition
+    min_per_day = rates["run_min"].fillna(fleet["run_min"]).to_numpy() * usage["cut_share"].fillna(1.0).to_numpy() * wear
+    cyc_per_day = rates["parts"].fillna(fleet["parts"]).to_numpy() * usage["cycles_per_part"].fillna(1.0).to_numpy() * wear
+    exp_m, exp_c = num("expected_minutes"), num("expected_cycles")
+    exp_m[exp_m <= 0], exp_c[exp_c <= 0] = np.nan, np.nan
+    with np.errstate(divide="ignore", invalid="ignore"):
+        first = np.fmin((exp_m - num("minutes_used")) / min_per_day, (exp_c - num("cycles_used")) / cyc_per_day)
+        every = np.fmin(exp_m / min_per_day, exp_c / cyc_per_day)
+    first = np.clip(first, 0, None)
+    ok = np.isfinite(first) & np.isfinite(every) & (every > 0) & (first <= horizon_days)
+    n = np.zeros(len(life), dtype=int)
+    n[ok] = np.minimum(1 + np.floor((horizon_days - first[ok]) / every[ok]), MAX_EVENTS_PER_TOOL)
+    if n.sum() == 0:
+        return pd.DataFrame(columns=COLUMNS)
+    idx = np.repeat(np.arange(len(life)), n)
+    k = np.arange(n.sum()) - np.repeat(np.cumsum(n) - n, n)  # 0, 1, ... within each tool
+    days = np.floor(first[idx] + k * every[idx]).astype(int)
+    out = pd.DataFrame({"family": family(life["tool_name"]).to_numpy()[idx],
+                        "machine_id": key.get_level_values(0)[idx], "tool_id": key.get_level_values(1)[idx],
+                        "tool_name": life["tool_name"].to_numpy()[idx]})
+    out["due"] = pd.Timestamp(today) + pd.to_timedelta(days, unit="D")
+    return out[out["due"] <= pd.Timestamp(today) + pd.Timedelta(days=horizon_days)].reset_index(drop=True)
+
+
+def demand(events: pd.DataFrame, freq="W"):
+    """Replacements per family (rows) and day ("D") or week starting Monday ("W"), labelled by its first date."""
+    if events.empty:
+        return pd.DataFrame()
+    period = events["due"].dt.to_period("W-SUN" if freq == "W" else "D").dt.start_time.dt.strftime("%Y-%m-%d")
+    return events.groupby([events["family"], period]).size().unstack(fill_value=0)
+
+
+def reorder_report(life: pd.DataFrame, events: pd.DataFrame, today: date, lead_time_days=7,
+                   safety_pct=20, on_hand=None):
+    """Per family: tools in service, replacements due within the lead time / horizon and the quantity to order."""
+    report = pd.DataFrame({"tools_in_service": family(life["tool_name"]).value_counts()})
+    report[["due_in_lead_time", "due_in_horizon"]] = 0
+    report[["first_due", "order_by"]] = None
+    if not events.empty:
+        first = events.groupby("family")["due"].min()
+        lead_end = pd.Timestamp(today) + pd.Timedelta(days=lead_time_days)
+        report["due_in_lead_time"] = events[events["due"] <= lead_end].groupby("family").size()
+        report["due_in_horizon"] = events.groupby("family").size()
+        report["first_due"] = first.dt.date
+        report["order_by"] = (first - pd.Timedelta(days=lead_time_days)).dt.date
+    report[["due_in_lead_time", "due_in_horizon"]] = report[["due_in_lead_time", "due_in_horizon"]].fillna(0).astype(int)
+    report["on_hand"] = pd.Series(on_hand or {}, dtype=float).reindex(report.index).fillna(0).astype(int)
+    need = np.ceil(report["due_in_horizon"] * (1 + safety_pct / 100)).astype(int)
+    report["order_qty"] = (need - report["on_hand"]).clip(lower=0)
+    report.index.name = "family"
+    return report.sort_values(["order_qty", "due_in_lead_time"], ascending=False).reset_index()
@@ -0,0 +1,74 @@
+import argparse
+import numpy as np
+import pandas as pd
+
+# -----------------------------
+# Plant-wide incidents: the same fault reported by several machines at once
+# -----------------------------
+# Diagnoses of plant-wide KB entries (power, air supply) are hashed into
+# (matched_issue, time bucket) groups. A window of two adjacent buckets that
+# holds reports from MIN_MACHINES or more machines is a cluster, so a burst is
+# caught even when it straddles a bucket edge; overlapping clusters of the same
+# issue merge into one incident. Every step is a hash groupby or a sort over
+# the matching rows, so the full history is one near-linear pass.
+WINDOW_MIN = 60
+MIN_MACHINES = 3
+COLUMNS = ["matched_issue", "start", "end", "machines", "machine_ids", "reports", "shift_dates"]
+
+
+def detect(diag: pd.DataFrame, issues, window_min=WINDOW_MIN, min_machines=MIN_MACHINES):
+    """Diagnostics frame + plant-wide issue names -> one row per incident, newest first."""
+    d = diag[diag["matched_issue"].astype("string").isin(list(issues)).fillna(False)]
+    t = pd.to_datetime(d["timestamp"].astype("string"), format="ISO8601", errors="coerce")
+    d = pd.DataFrame({"issue": d["matched_issue"].astype(str), "machine": d["machine_id"].astype("string"),
+                      "shift_date": d["shift_date"].astype("string"), "t": t})
+    d = d.dropna(subset=["machine", "t"])
+    if d.empty:
+        return pd.DataFrame(columns=COLUMNS)
+    d["bucket"] = d["t"].dt.as_unit("s").astype("int64") // (int(window_min) * 60)
+
+    # window b covers buckets b and b+1: each (issue, bucket, machine) counts towards windows b-1 and b
+    seen = d[["issue", "bucket", "machine"]].drop_duplicates()
+    windows = pd.concat([seen, seen.assign(bucket=seen["bucket"] - 1)])
+    machines = windows.groupby(["issue", "bucket"]).machine.nunique()
+    flagged = machines[machines >= min_machines].reset_index()[["issue", "bucket"]]
+    if flagged.empty:
+        return pd.DataFrame(columns=COLUMNS)
+
+    # chain overlapping windows (consecutive starts) of the same issue into incidents
+    flagged = flagged.sort_values(["issue", "bucket"]).reset_index(drop=True)
+    new = (flagged["issue"] != flagged["issue"].shift()) | (flagged["bucket"] - flagged["bucket"].shift() > 1)
+    flagged["incident"] = new.cumsum()
+    span = flagged.groupby("incident").agg(issue=("issue", "first"), first=("bucket", "min"), last=("bucket", "max"))
+    span["last"] += 1
+    # (issue, bucket) -> incident for every bucket an incident covers, then one hash join with the rows
+    sizes = (span["last"] - span["first"] + 1).to_numpy()
+    covered = pd.DataFrame({
+        "issue": np.repeat(span["issue"].to_numpy(), sizes),
+        "bucket": np.repeat(span["first"].to_numpy(), sizes) + np.concatenate([np.arange(n) for n in sizes]),
+        "incident": np.repeat(span.index.to_numpy(), sizes),
+    })
+    rows = d.merge(covered, on=["issue", "bucket"])
+    out = rows.groupby("incident").agg(matched_issue=("issue", "first"), start=("t", "min"), end=("t", "max"),
+                                       machines=("machine", "nunique"), reports=("t", "size"))
+    for col, src in (("machine_ids", "machine"), ("shift_dates", "shift_date")):
+        distinct = rows[["incident", src]].dropna().drop_duplicates().sort_values(["incident", src])
+        out[col] = distinct.astype({src: str}).groupby("incident")[src].agg(", ".join)
+    return out.sort_values("start", ascending=False).reset_index(drop=True)[COLUMNS]
+
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description="List plant-wide incidents found in the diagnostics history.")
+    ap.add_argument("--window-min", type=int, default=WINDOW_MIN)
+    ap.add_argument("--min-machines", type=int, default=MIN_MACHINES)
+    args = ap.parse_args(argv)
+    import kb
+    import storage
+    found = detect(storage.read_table("diagnostics"), kb.plant_wide(), args.window_min, args.min_machines)
+    print(f"{len(found)} incident(s)")
+    if len(found):
+        print(found.to_string(index=False))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,178 @@
+import hashlib
+import json
+import logging
+import os
+import threading
+import time
+from pathlib import Path
+
+# -----------------------------
+# Knowledge base (VMC issues -> causes/steps/escalation), loaded from ./kb
+# -----------------------------
+# One JSON (or YAML, if PyYAML is installed) file per machine family:
+#   {"family": "vmc", "entries": [{"name", "keywords", "causes", "operator_steps",
+#                                  "escalate_when", "escalation_steps", "plant_wide"?}, ...]}
+# Entries are matched in file order (files by name); the first entry with a keyword
+# contained in the issue text wins. The parsed entries are cached in memory and on
+# disk as plain JSON (kb/.cache/<sha256>.json) keyed by the content hash of all KB
+# files; editing a file is picked up on the next lookup and swapped in atomically,
+# so lookups already running keep the snapshot they started with. An edit that
+# does not parse or validate is rejected and the previous snapshot stays in use.
+KB_DIR = Path(os.environ.get("VMC_KB_DIR", Path(__file__).parent / "kb"))
+CACHE_DIR = KB_DIR / ".cache"
+CHECK_EVERY_S = 1.0
+GRAM = 3
+
+GENERAL = ("general machining issue",
+           ["Unclear description; need more detail","Check basic parameters & clamping"],
+           ["Stop machine safely","Verify program, offsets, clamps, coolant","Retry at reduced feed"],
+           "If symptoms persist or safety risk present",
+           ["Escalate to maintenance","Document alarms and observed behavior"])
+
+
+class CompiledKB:
+    """Immutable snapshot: entries plus a keyword-prefix index for first-match lookup."""
+
+    def __init__(self, digest, entries):
+        self.digest = digest
+        # (name, keywords, causes, op_steps, when_escalate, esc_steps, extra)
+        self.entries = entries
+        self.by_name = {e[0]: e for e in entries}
+        self.plant_wide = frozenset(e[0] for e in entries if e[6].get("plant_wide"))
+        self.grams = {}   # first GRAM chars of a keyword -> [(keyword, entry index), ...]
+        self.short = []   # keywords shorter than GRAM, checked directly
+        for idx, e in enumerate(entries):
+            for kw in e[1]:
+                kw = kw.lower()
+                if len(kw) < GRAM:
+                    self.short.append((kw, idx))
+                else:
+                    self.grams.setdefault(kw[:GRAM], []).append((kw, idx))
+
+    def match(self, text: str):
+        """(name, causes, op_steps, when_escalate, esc_steps) of the first matching entry."""
+        t = text.lower()
+        best = len(self.entries)
+        for i in range(len(t) - GRAM + 1):
+            for kw, idx in self.grams.get(t[i:i + GRAM], ()):
+                if idx < best and t.startswith(kw, i):
+                    best = idx
+        for kw, idx in self.short:
+            if idx < best and kw in t:
+                best = idx
+        if best == len(self.entries):
+            return GENERAL
+        name, _, causes, ops, esc_when, esc_steps, _ = self.entries[best]
+        return name, causes, ops, esc_when, esc_steps
+
+
+def _read(path: Path):
+    if path.suffix in (".yaml", ".yml"):
+        import yaml
+        return yaml.safe_load(path.read_text(encoding="utf-8"))
+    return json.loads(path.read_text(encoding="utf-8"))
+
+
+def _kb_files():
+    if not KB_DIR.exists():
+        return []
+    return sorted(p for p in KB_DIR.iterdir() if p.suffix in (".json", ".yaml", ".yml") and p.is_file())
+
+
+def _strings(v):
+    return isinstance(v, list) and all(isinstance(x, str) for x in v)
+
+
+def _parse(files):
+    """KB files -> entry tuples; ValueError naming the file and entry if one is malformed."""
+    entries = []
+    for path in files:
+        doc = _read(path) or {}
+        if not isinstance(doc, dict) or not isinstance(doc.get("entries", []), list):
+            raise ValueError(f"{path.name}: expected an object with an `entries` list")
+        for i, e in enumerate(doc.get("entries", [])):
+            if not isinstance(e, dict):
+                raise ValueError(f"{path.name}: entry {i} is not an object")
+            if not isinstance(e.get("name"), str) or not e["name"].strip():
+                raise ValueError(f"{path.name}: entry {i} has no name")
+            for k in ("keywords", "causes", "operator_steps", "escalation_steps"):
+                if not _strings(e.get(k, [])):
+                    raise ValueError(f"{path.name}: {e['name']}: `{k}` must be a list of strings")
+            if not isinstance(e.get("escalate_when", ""), str):
+                raise ValueError(f"{path.name}: {e['name']}: `escalate_when` must be a string")
+            extra = {k: v for k, v in e.items() if k not in
+                     ("name", "keywords", "causes", "operator_steps", "escalate_when", "escalation_steps")}
+            entries.append((e["name"], e.get("keywords", []), e.get("causes", []), e.get("operator_steps", []),
+                            e.get("escalate_when", ""), e.get("escalation_steps", []), extra))
+    return entries
+
+
+_lock = threading.Lock()
+_memory = {}          # digest -> CompiledKB
+_current = None       # CompiledKB in use
+_fingerprint = None   # ((name, mtime_ns, size), ...) of the files behind _current
+_checked_at = 0.0
+reload_error = None   # why the last edit was rejected, while the previous KB is still served
+
+log = logging.getLogger(__name__)
+
+
+def _load(files):
+    digest = hashlib.sha256(b"".join(p.name.encode() + b"\0" + p.read_bytes() for p in files)).hexdigest()
+    if digest in _memory:
+        return _memory[digest]
+    cached = CACHE_DIR / f"{digest}.json"
+    entries = None
+    if cached.exists():
+        try:
+            entries = [tuple(e) for e in json.loads(cached.read_text(encoding="utf-8"))]
+        except (ValueError, OSError):
+            entries = None
+    if entries is None:
+        entries = _parse(files)
+        CACHE_DIR.mkdir(exist_ok=True)
+        tmp = cached.with_suffix(f".{os.getpid()}.tmp")
+        tmp.write_text(json.dumps(entries), encoding="utf-8")
+        os.replace(tmp, cached)
+    compiled = _memory[digest] = CompiledKB(digest, entries)
+    return compiled
+
+
+def current():
+    """The compiled KB, reloaded if a KB file changed (checked at most once per second)."""
+    global _current, _fingerprint, _checked_at, reload_error
+    if _current is not None and time.monotonic() - _checked_at < CHECK_EVERY_S:
+        return _current
+    with _lock:
+        files = _kb_files()
+        fp = tuple((p.name, p.stat().st_mtime_ns, p.stat().st_size) for p in files)
+        if _current is None or fp != _fingerprint:
+            try:
+                compiled = _load(files)
+            except Exception as e:  # bad JSON/YAML, malformed entries, a file removed mid-read...
+                if _current is None:
+                    raise
+                # half-saved or invalid edit: keep serving the previous snapshot until the files change again
+                reload_error = f"KB reload failed, keeping version {_current.digest[:12]}: {e}"
+                log.warning(reload_error)
+                compiled = _current
+            else:
+                reload_error = None
+            _current, _fingerprint = compiled, fp
+        _checked_at = time.monotonic()
+        return _current
+
+
+def match(text: str):
+    return current().match(text)
+
+
+def plant_wide():
+    """Names of entries flagged `"plant_wide": true` (faults that usually hit several machines at once)."""
+    return current().plant_wide
+
+
+def steps(name: str):
+    """(operator_steps, escalation_steps) of a KB entry by name (the general fallback if unknown)."""
+    e = current().by_name.get(name)
+    return (e[3], e[5]) if e else (GENERAL[2], GENERAL[4])
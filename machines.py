@@ -0,0 +1,184 @@
+import sqlite3
+from datetime import datetime
+from pathlib import Path
+import pandas as pd
+import schemas
+import sources
+
+# -----------------------------
+# Machine registry: per-machine state with live spindle-hour / service counters
+# -----------------------------
+# machines.db holds one row per machine, keyed by machine_id: model, spindle
+# hours when it was registered, run hours accrued since from production entries,
+# and the spindle hours / time of the last service. Production saves add parts x
+# cycle time to runtime_h of their own machine's row; recording a service
+# snapshots the spindle hours. The registry is cached as a dict keyed by
+# machine_id, so lookups are O(1). A machine registered on the fly by its first
+# production entry has unknown (NaN) spindle hours until they are entered, so the
+# forms keep their own defaults rather than showing the logged run time alone.
+COLUMNS = ["machine_id", "model", "installed_spindle_h", "runtime_h", "parts_total",
+           "service_at_spindle_h", "last_service_at", "services", "updated_at"]
+TEXT = {"machine_id": str, "model": str, "last_service_at": str, "updated_at": str}
+NUMERIC = ["installed_spindle_h", "runtime_h", "parts_total", "service_at_spindle_h", "services"]
+UNKNOWN = ["installed_spindle_h", "service_at_spindle_h"]  # NaN until entered (stored as NULL)
+NAN = float("nan")
+
+# path -> ((size, mtime_ns), registry dict)
+_cache = {}
+
+
+def connect(path: Path):
+    con = sqlite3.connect(path, timeout=30)
+    # rollback journal, as for tool_counters.db: commits change the .db file's signature
+    cols = ", ".join(f"{c} {'REAL' if c in NUMERIC else 'TEXT'}" for c in COLUMNS)
+    con.execute(f"CREATE TABLE IF NOT EXISTS machines ({cols}, PRIMARY KEY (machine_id))")
+    return con
+
+
+def _numbers(m: dict):
+    return {**m, **{c: schemas.number(m[c], NAN if c in UNKNOWN else 0.0) for c in NUMERIC}}
+
+
+def load(path: Path):
+    """machine_id -> registry row (numbers as floats). Callers must not mutate the dict."""
+    sig = sources.signature(path)
+    hit = _cache.get(path)
+    if hit and hit[0] == sig:
+        return hit[1]
+    registry = {}
+    if path.exists():
+        con = connect(path)
+        for r in con.execute(f"SELECT {', '.join(COLUMNS)} FROM machines"):
+            m = dict(zip(COLUMNS, r))
+            registry[m["machine_id"]] = {**_numbers(m), **{c: m[c] or "" for c in TEXT}}
+        con.close()
+    _cache[path] = (sig, registry)
+    return registry
+
+
+def _on_spindle(m: dict):
+    # run hours counted from registration when the hours before it are unknown;
+    # service_at_spindle_h is kept on the same scale
+    installed = m["installed_spindle_h"]
+    return (0.0 if pd.isna(installed) else installed) + m["runtime_h"]
+
+
+def spindle_hours(m, default=None):
+    """Lifetime spindle hours, or `default` for an unregistered machine or unknown hours at registration."""
+    if m is None or pd.isna(m["installed_spindle_h"]):
+        return default
+    return round(_on_spindle(m), 1)
+
+
+def hours_since_service(m, default=None):
+    """Spindle hours run since the last service, or `default` while that is unknown."""
+    if m is None or pd.isna(m["service_at_spindle_h"]):
+        return default
+    return round(_on_spindle(m) - m["service_at_spindle_h"], 1)
+
+
+def _put(path: Path, machines: list):
+    con = connect(path)
+    with con:
+        con.executemany(f"INSERT OR REPLACE INTO machines VALUES ({', '.join('?' * len(COLUMNS))})",
+                        [[m[c] for c in COLUMNS] for m in machines])
+    con.close()
+
+
+def _blank(machine_id, model="", installed_spindle_h=NAN):
+    return {"machine_id": machine_id, "model": model, "installed_spindle_h": float(installed_spindle_h),
+            "runtime_h": 0.0, "parts_total": 0.0, "service_at_spindle_h": NAN, "last_service_at": "",
+            "services": 0.0, "updated_at": datetime.now().isoformat(timespec="seconds")}
+
+
+def register(path: Path, machine_id, model="", installed_spindle_h=None, hours_since_service=None):
+    """Add a machine or update its model / spindle hours (None leaves the hours as they are). Caller holds the write lock."""
+    m = dict(load(path).get(machine_id) or _blank(machine_id))
+    m.update(model=model, updated_at=datetime.now().isoformat(timespec="seconds"))
+    if installed_spindle_h is not None:
+        m["installed_spindle_h"] = float(installed_spindle_h)
+    if hours_since_service is not None:
+        m["service_at_spindle_h"] = _on_spindle(m) - float(hours_since_service)
+    _put(path, [m])
+
+
+def record_service(path: Path, machine_id):
+    """Spindle serviced now: restart the since-service counter. Caller holds the write lock."""
+    m = dict(load(path).get(machine_id) or _blank(machine_id))
+    now = datetime.now().isoformat(timespec="seconds")
+    m.update(service_at_spindle_h=_on_spindle(m), last_service_at=now, services=m["services"] + 1, updated_at=now)
+    _put(path, [m])
+
+
+# add one row's run time; machines first seen in a production entry are registered on the fly
+UPSERT = (f"INSERT INTO machines ({', '.join(COLUMNS)}) VALUES ({', '.join('?' * len(COLUMNS))}) "
+          "ON CONFLICT (machine_id) DO UPDATE SET runtime_h = round(runtime_h + excluded.runtime_h, 3), "
+          "parts_total = parts_total + excluded.parts_total, updated_at = excluded.updated_at")
+
+
+def accrue(path: Path, rows: list):
+    """Write path hook for production rows: add run time to each machine. Caller holds the write lock."""
+    deltas = []
+    for row in rows:
+        machine_id = str(row.get("machine_id") or "").strip()
+        if not machine_id:
+            continue
+        m = _blank(machine_id)
+        parts = schemas.number(row.get("parts_done"))
+        m.update(runtime_h=round(parts * schemas.number(row.get("avg_cycle_time_min")) / 60, 3), parts_total=parts)
+        deltas.append([m[c] for c in COLUMNS])
+    if deltas:
+        con = connect(path)
+        with con:
+            con.executemany(UPSERT, deltas)
+        con.close()
+
+
+def seed(path: Path, tables: dict):
+    """First start: register every machine seen in the tables, with run hours from the production history."""
+    if path.exists():
+        return
+    registry = {}
+    for name, df in tables.items():
+        for machine_id in df["machine_id"].dropna().astype(str).unique():
+            registry.setdefault(machine_id, _blank(machine_id))
+    p = tables.get("production")
+    if p is not None and not p.empty:
+        parts = pd.to_numeric(p["parts_done"], errors="coerce").fillna(0)
+        hours = parts * pd.to_numeric(p["avg_cycle_time_min"], errors="coerce").fillna(0) / 60
+        per_machine = pd.DataFrame({"m": p["machine_id"].astype(str), "h": hours, "p": parts}).groupby("m").sum()
+        for machine_id, r in per_machine.iterrows():
+            if machine_id in registry:
+                registry[machine_id].update(runtime_h=round(float(r["h"]), 3), parts_total=float(r["p"]))
+    _put(path, list(registry.values()))
+
+
+def adopt_csv(path: Path, csv_path: Path):
+    """Carry a machines.csv from before the SQLite store over, once. Caller holds the write lock."""
+    if path.exists() or not csv_path.exists():
+        return
+    rows = pd.read_csv(csv_path, dtype=TEXT, keep_default_na=False).reindex(columns=COLUMNS, fill_value="")
+    _put(path, [_numbers(r) for r in rows.to_dict("records")])
+    csv_path.rename(csv_path.with_suffix(".csv.migrated"))
+
+
+def frame(path: Path):
+    """Registry as a table with the derived spindle hours / hours since service."""
+    rows = [{**m, "spindle_hours": spindle_hours(m), "hours_since_service": hours_since_service(m)}
+            for m in load(path).values()]
+    return pd.DataFrame(rows, columns=COLUMNS + ["spindle_hours", "hours_since_service"])
+
+
+def spindle_hours_left(path: Path, diag: pd.DataFrame):
+    """machine_id -> spindle hours left now: the last diagnosed estimate less the run time logged since."""
+    registry = load(path)
+    last = diag.dropna(subset=["machine_id"]).groupby("machine_id", observed=True).tail(1)
+    left = {}
+    for machine_id, est, at_h in zip(last["machine_id"].astype(str), last["spindle_hours_left"],
+                                     last.get("spindle_hours", pd.Series(index=last.index, dtype=float))):
+        if pd.isna(est):
+            continue
+        now = spindle_hours(registry.get(machine_id))
+        run_since = now - at_h if now is not None and pd.notna(at_h) else 0.0
+        left[machine_id] = max(0.0, float(est) - max(0.0, run_since))
+    return pd.Series(left, dtype=float)
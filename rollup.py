@@ -0,0 +1,201 @@
+import sqlite3
+from pathlib import Path
+import pandas as pd
+import schemas
+import sources
+
+# -----------------------------
+# Shift rollup: one summary row per (machine_id, shift_date, shift)
+# -----------------------------
+# Rows live in a SQLite table keyed by (machine_id, shift_date, shift): a save
+# reads and rewrites only the summary rows of its own shift, so the cost per
+# record does not grow with the history.
+KEY = ["machine_id", "shift_date", "shift"]
+COLUMNS = KEY + [
+    "production_entries", "parts_done", "scrap_count", "cycle_min_total", "avg_cycle_time_min", "jobs",
+    "diagnostics", "high_severity", "last_issue",
+    "tool_updates", "tools_replace",
+    "before_checklist", "after_checklist",
+]
+COUNTS = ["production_entries", "parts_done", "scrap_count", "diagnostics", "high_severity",
+          "tool_updates", "tools_replace"]
+SHIFT_ORDER = {"A": 0, "B": 1, "C": 2}
+SOURCES = ("production", "diagnostics", "tools", "checklists")
+
+
+def _sources_path(rollup_path: Path):
+    return rollup_path.with_suffix(".sources.json")
+
+
+def connect(rollup_path: Path):
+    con = sqlite3.connect(rollup_path, timeout=30)
+    con.execute("PRAGMA journal_mode=WAL")  # readers in other workers don't block the writer
+    con.execute(f"CREATE TABLE IF NOT EXISTS rollup ({', '.join(COLUMNS)}, PRIMARY KEY ({', '.join(KEY)}))")
+    return con
+
+
+def _row(summary: dict):
+    values = {**summary, **{c: int(summary[c] or 0) for c in COUNTS}}
+    values.update(before_checklist=int(bool(values["before_checklist"])),
+                  after_checklist=int(bool(values["after_checklist"])))
+    return [values[c] for c in COLUMNS]
+
+
+def _summary(row):
+    summary = dict(zip(COLUMNS, row))
+    summary.update(before_checklist=bool(summary["before_checklist"]), after_checklist=bool(summary["after_checklist"]),
+                   jobs=summary["jobs"] or "", last_issue=summary["last_issue"] or "")
+    return summary
+
+
+def load(rollup_path: Path):
+    """Every shift summary as a frame."""
+    if not rollup_path.exists():
+        return pd.DataFrame(columns=COLUMNS)
+    con = connect(rollup_path)
+    rows = con.execute(f"SELECT {', '.join(COLUMNS)} FROM rollup").fetchall()
+    con.close()
+    return pd.DataFrame([_summary(r) for r in rows], columns=COLUMNS)
+
+
+def _add_job(jobs, job):
+    have = [j for j in str(jobs or "").split(";") if j and j != "nan"]
+    job = str(job or "").strip()
+    if job and job != "nan" and job not in have:
+        have.append(job)
+    return ";".join(have)
+
+
+def _apply(summary: dict, table: str, row: dict):
+    if table == "production":
+        parts = schemas.number(row.get("parts_done"))
+        summary["production_entries"] += 1
+        summary["parts_done"] += parts
+        summary["scrap_count"] += schemas.number(row.get("scrap_count"))
+        summary["cycle_min_total"] += parts * schemas.number(row.get("avg_cycle_time_min"))
+        summary["jobs"] = _add_job(summary["jobs"], row.get("job_id"))
+    elif table == "diagnostics":
+        summary["diagnostics"] += 1
+        summary["high_severity"] += int(row.get("severity") == "High")
+        summary["last_issue"] = row.get("matched_issue")
+    elif table == "tools":
+        summary["tool_updates"] += 1
+        summary["tools_replace"] += int(str(row.get("status", "")).startswith("Replace"))
+    elif table == "checklists":
+        if row.get("phase") == "before":
+            summary["before_checklist"] = True
+        elif row.get("phase") == "after":
+            summary["after_checklist"] = True
+    parts = summary["parts_done"]
+    summary["avg_cycle_time_min"] = round(summary["cycle_min_total"] / parts, 2) if parts else 0.0
+
+
+def _blank(key):
+    summary = dict.fromkeys(COLUMNS, 0)
+    summary.update(dict(zip(KEY, key)), jobs="", last_issue="", before_checklist=False, after_checklist=False)
+    summary["cycle_min_total"] = summary["avg_cycle_time_min"] = 0.0
+    return summary
+
+
+def _text(s: pd.Series):
+    # blanks as "": an all-blank column reads as float, and pandas 3 keeps NaN through astype(str)
+    return s.astype("string").fillna("").str.strip()
+
+
+def apply_records(rollup_path: Path, table: str, rows: list, files: dict, before):
+    """Fold newly saved records into their shift summary rows (`before`: the CSV's signature before the append)."""
+    if table not in SOURCES:
+        return
+    if not rollup_path.exists() or not sources.in_step(_sources_path(rollup_path), table, before):
+        rebuild(rollup_path, files)  # drifted from the CSVs: the rebuild includes the new rows
+        return
+    con = connect(rollup_path)
+    where = " AND ".join(f"{k} = ?" for k in KEY)
+    with con:
+        for row in rows:
+            key = tuple(str(row.get(k, "")) for k in KEY)
+            hit = con.execute(f"SELECT {', '.join(COLUMNS)} FROM rollup WHERE {where}", key).fetchone()
+            summary = _summary(hit) if hit else _blank(key)
+            _apply(summary, table, row)
+            con.execute(f"INSERT OR REPLACE INTO rollup VALUES ({', '.join('?' * len(COLUMNS))})", _row(summary))
+    con.close()
+    sources.record(_sources_path(rollup_path), {table: files[table]})
+
+
+def rebuild(rollup_path: Path, files: dict):
+    """Recompute every shift summary from the raw tables in one groupby pass each."""
+    frames = {}
+    for table in SOURCES:
+        path = files[table]
+        df = pd.read_csv(path, dtype={"shift_date": str, "shift": str, "machine_id": str}) if path.exists() else pd.DataFrame()
+        frames[table] = df.dropna(subset=KEY) if not df.empty else df
+
+    parts = []
+    p = frames["production"]
+    if not p.empty:
+        p = p.assign(
+            parts_done=pd.to_numeric(p["parts_done"], errors="coerce").fillna(0),
+            scrap_count=pd.to_numeric(p["scrap_count"], errors="coerce").fillna(0),
+            avg=pd.to_numeric(p["avg_cycle_time_min"], errors="coerce").fillna(0),
+            job=_text(p["job_id"]),
+        )
+        p["cycle_min_total"] = p["parts_done"] * p["avg"]
+        parts.append(p.groupby(KEY).agg(
+            production_entries=("parts_done", "size"), parts_done=("parts_done", "sum"),
+            scrap_count=("scrap_count", "sum"), cycle_min_total=("cycle_min_total", "sum"),
+            jobs=("job", lambda s: ";".join(dict.fromkeys(j for j in s if j))),
+        ))
+    d = frames["diagnostics"]
+    if not d.empty:
+        # last_issue is the latest row's match, blank included, as _apply sets it
+        d = d.assign(high=(d["severity"] == "High").astype(int), issue=_text(d["matched_issue"]))
+        parts.append(d.groupby(KEY).agg(
+            diagnostics=("high", "size"), high_severity=("high", "sum"), last_issue=("issue", "last")))
+    t = frames["tools"]
+    if not t.empty:
+        t = t.assign(repl=t["status"].astype(str).str.startswith("Replace").astype(int))
+        parts.append(t.groupby(KEY).agg(tool_updates=("repl", "size"), tools_replace=("repl", "sum")))
+    c = frames["checklists"]
+    if not c.empty:
+        c = c.assign(before=c["phase"] == "before", after=c["phase"] == "after")
+        parts.append(c.groupby(KEY).agg(before_checklist=("before", "any"), after_checklist=("after", "any")))
+
+    if parts:
+        df = pd.concat(parts, axis=1).reset_index()
+        for col in COLUMNS:
+            if col not in df:
+                df[col] = None
+        df[COUNTS + ["cycle_min_total"]] = df[COUNTS + ["cycle_min_total"]].fillna(0)
+        df[["before_checklist", "after_checklist"]] = df[["before_checklist", "after_checklist"]].fillna(False)
+        df[["jobs", "last_issue"]] = df[["jobs", "last_issue"]].fillna("")
+        df["avg_cycle_time_min"] = (df["cycle_min_total"] / df["parts_done"].where(df["parts_done"] > 0)).fillna(0).round(2)
+    else:
+        df = pd.DataFrame(columns=COLUMNS)
+    con = connect(rollup_path)
+    with con:
+        con.execute("DELETE FROM rollup")
+        con.executemany(f"INSERT INTO rollup VALUES ({', '.join('?' * len(COLUMNS))})",
+                        [_row(r) for r in df[COLUMNS].to_dict("records")])
+    con.close()
+    sources.record(_sources_path(rollup_path), {t: files[t] for t in SOURCES}, rebuilt=True)
+
+
+def ensure_rollup(rollup_path: Path, files: dict):
+    """Rebuild when missing or when a source CSV changed behind the app's back."""
+    if rollup_path.exists() and sources.fresh(_sources_path(rollup_path), {t: files[t] for t in SOURCES}):
+        return
+    rebuild(rollup_path, files)
+
+
+def previous_shift(rollup_path: Path, machine_id: str, shift_date, shift: str):
+    """Latest summary for this machine strictly before (shift_date, shift), or None."""
+    if not rollup_path.exists():
+        return None
+    order = "CASE shift " + " ".join(f"WHEN '{s}' THEN {i}" for s, i in SHIFT_ORDER.items()) + " ELSE 9 END"
+    con = connect(rollup_path)
+    hit = con.execute(
+        f"SELECT {', '.join(COLUMNS)} FROM rollup WHERE machine_id = ? AND shift_date || ({order}) < ? "
+        f"ORDER BY shift_date DESC, {order} DESC LIMIT 1",
+        (str(machine_id), f"{shift_date}{SHIFT_ORDER.get(shift, 9)}")).fetchone()
+    con.close()
+    return _summary(hit) if hit else None
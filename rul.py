@@ -0,0 +1,45 @@
+import numpy as np
+
+# -----------------------------
+# RUL (Remaining Useful Life) estimation
+# -----------------------------
+# The rule is written once, with NumPy broadcasting (estimate_rul_grid), so the
+# what-if explorer can evaluate millions of (temperature, vibration, coolant,
+# service interval) combinations in one pass; estimate_rul is the same call for
+# one machine context, rounded for display.
+BASE_TOOL_LIFE_CYCLES = 500.0
+BASE_SPINDLE_LIFE_H = 8000.0
+TOOL_MIN_PER_CYCLE = 0.25  # assume avg 0.25 min per cycle
+
+
+def estimate_rul_grid(spindle_hours, tool_cycles, avg_temp_c, vibration_mm_s, coolant_ok, last_service_h):
+    """estimate_rul over broadcastable arrays -> (tool h left, spindle h left, tool factor, spindle factor), unrounded."""
+    avg_temp_c = np.asarray(avg_temp_c, dtype=float)
+    vibration_mm_s = np.asarray(vibration_mm_s, dtype=float)
+    hot, shaky = avg_temp_c > 60, vibration_mm_s > 3
+    tool_factor = 1.0 + 0.2 * hot + 0.15 * shaky + 0.25 * ~np.asarray(coolant_ok, dtype=bool)
+    spindle_factor = 1.0 + 0.15 * hot + 0.2 * shaky + 0.1 * (np.asarray(last_service_h, dtype=float) > 1000)
+    tool_left_hours = np.maximum(0.0, BASE_TOOL_LIFE_CYCLES - np.asarray(tool_cycles, dtype=float) * tool_factor) * TOOL_MIN_PER_CYCLE
+    spindle_left_hours = np.maximum(0.0, BASE_SPINDLE_LIFE_H - np.asarray(spindle_hours, dtype=float) * spindle_factor)
+    return tool_left_hours, spindle_left_hours, tool_factor, spindle_factor
+
+
+def estimate_rul(spindle_hours, tool_cycles, avg_temp_c, vibration_mm_s, coolant_ok, last_service_h):
+    """One machine context -> (tool h left, spindle h left, tool factor, spindle factor), rounded."""
+    tool_h, spindle_h, tool_factor, spindle_factor = estimate_rul_grid(
+        spindle_hours, tool_cycles, avg_temp_c, vibration_mm_s, bool(coolant_ok), last_service_h)
+    return round(float(tool_h), 1), round(float(spindle_h), 1), round(float(tool_factor), 2), round(float(spindle_factor), 2)
+
+
+def what_if(spindle_hours, tool_cycles, temps, vibrations, service_hours, coolant=(True, False)):
+    """RUL for every combination of the axes, as arrays broadcastable to (temps, vibrations, coolant, service_hours).
+
+    Tool life does not depend on the service interval, so the tool array keeps a length-1
+    last axis; np.broadcast_to gives the full shape without copying.
+    """
+    t = np.asarray(temps, dtype=float)[:, None, None, None]
+    v = np.asarray(vibrations, dtype=float)[None, :, None, None]
+    c = np.asarray(coolant, dtype=bool)[None, None, :, None]
+    s = np.asarray(service_hours, dtype=float)[None, None, None, :]
+    tool_h, spindle_h, _, _ = estimate_rul_grid(spindle_hours, tool_cycles, t, v, c, s)
+    return tool_h, spindle_h
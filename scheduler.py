@@ -0,0 +1,95 @@
+import heapq
+from datetime import date, timedelta
+import pandas as pd
+import rul
+import tool_accrual
+
+# -----------------------------
+# Fleet maintenance planner
+# -----------------------------
+# Turns remaining life (tools + spindles, in machine run-hours) into a plan of
+# tool changes and spindle services over the shift calendar. Greedy, earliest
+# deadline first (heap): each task goes to the latest shift before its tool or
+# spindle runs out that still has crew capacity, joining a stoppage already
+# planned on that machine when one is close enough, so tasks share downtime.
+SHIFTS = ["A", "B", "C"]
+TOOL_MIN_PER_CYCLE = rul.TOOL_MIN_PER_CYCLE  # same assumption as estimate_rul
+
+
+def tool_tasks(life: pd.DataFrame):
+    """Live tool registry (tool_accrual.live_registry) -> hours of run time left per tool."""
+    if life.empty:
+        return pd.DataFrame(columns=["machine_id", "task", "hours_left"])
+    hours = tool_accrual.hours_left(life, TOOL_MIN_PER_CYCLE)
+    out = pd.DataFrame({
+        "machine_id": life["machine_id"].astype(str),
+        "task": "Tool change " + life["tool_id"].astype(str) + " (" + life["tool_name"].fillna("").astype(str) + ")",
+        "hours_left": hours,
+    })
+    return out[hours.notna()]
+
+
+def spindle_tasks(spindle_left: pd.Series):
+    """machine_id -> spindle hours left (e.g. last diagnosis per machine)."""
+    return pd.DataFrame({"machine_id": spindle_left.index.astype(str), "task": "Spindle service",
+                         "hours_left": pd.to_numeric(spindle_left, errors="coerce").to_numpy()}).dropna()
+
+
+def plan(tasks: pd.DataFrame, start: date, days=7, run_hours_per_shift=7.5, crew_minutes_per_shift=480,
+         tool_change_min=15, spindle_service_min=240, stoppage_overhead_min=20, merge_window=2, shifts=SHIFTS):
+    """Schedule every task due inside the horizon. Returns (plan rows, summary dict)."""
+    slots = [(start + timedelta(days=d), s) for d in range(days) for s in shifts]
+    n = len(slots)
+    capacity = [float(crew_minutes_per_shift)] * n
+    stoppages = {}  # (machine_id, slot) -> stoppage number
+    heap = []
+    for i, t in enumerate(tasks.itertuples(index=False)):
+        due = int(max(0.0, t.hours_left) // run_hours_per_shift)
+        if due >= n:
+            continue  # lasts beyond the horizon
+        minutes = spindle_service_min if t.task == "Spindle service" else tool_change_min
+        heapq.heappush(heap, (due, t.hours_left, i, t.machine_id, t.task, minutes))
+
+    rows = []
+    while heap:
+        due, hours_left, _, machine, task, minutes = heapq.heappop(heap)
+        slot = None
+        # 1) join an existing stoppage on this machine within the merge window (no extra overhead)
+        for k in range(due, max(-1, due - merge_window - 1), -1):
+            if (machine, k) in stoppages and capacity[k] >= minutes:
+                slot, cost = k, minutes
+                break
+        # 2) otherwise the latest shift on or before the deadline with room, then the earliest after it;
+        #    the overhead is paid only where this machine has no stoppage yet
+        if slot is None:
+            for k in list(range(due, -1, -1)) + list(range(due + 1, n)):
+                cost = minutes if (machine, k) in stoppages else minutes + stoppage_overhead_min
+                if capacity[k] >= cost:
+                    slot = k
+                    break
+        if slot is None:
+            rows.append({"date": None, "shift": None, "machine_id": machine, "task": task,
+                         "work_min": minutes, "hours_left": round(hours_left, 1),
+                         "due": f"{slots[due][0]} {slots[due][1]}", "status": "Unscheduled (no crew capacity)"})
+            continue
+        stoppages.setdefault((machine, slot), len(stoppages) + 1)
+        capacity[slot] -= cost
+        rows.append({"date": slots[slot][0], "shift": slots[slot][1], "machine_id": machine, "task": task,
+                     "work_min": minutes, "hours_left": round(hours_left, 1),
+                     "due": f"{slots[due][0]} {slots[due][1]}",
+                     "status": "Late" if slot > due else ("Overdue now" if hours_left <= 0 else "Planned"),
+                     "stoppage": stoppages[(machine, slot)]})
+
+    df = pd.DataFrame(rows, columns=["date", "shift", "machine_id", "task", "work_min", "hours_left",
+                                     "due", "status", "stoppage"])
+    if not df.empty:
+        df = df.sort_values(["date", "shift", "machine_id", "task"], na_position="last").reset_index(drop=True)
+    planned = df[df["stoppage"].notna()]
+    summary = {
+        "tasks": len(df),
+        "stoppages": int(planned["stoppage"].nunique()),
+        "downtime_min": float(planned["work_min"].sum() + planned["stoppage"].nunique() * stoppage_overhead_min),
+        "late": int((df["status"] == "Late").sum()),
+        "unscheduled": int(df["stoppage"].isna().sum()),
+    }
+    return df, summary
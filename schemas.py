@@ -0,0 +1,195 @@
+import json
+from pathlib import Path
+import pandas as pd
+
+# -----------------------------
+# Table schemas (dtypes) + versioned migrations
+# -----------------------------
+# Declared dtypes let read_csv skip type inference, store repeated labels as
+# categoricals and keep checklist booleans / counters as nullable types instead
+# of object columns full of NaN. Rows that cannot be parsed are moved to
+# data/quarantine/<table>.csv rather than being loaded.
+SHIFT = {"timestamp": "string", "shift_date": "string", "shift": "category",
+         "operator": "category", "machine_id": "category"}
+
+BEFORE_ITEMS = ["power_ok","tooling_setup_ok","workpiece_setup_ok",
+                "coolant_ok","lubrication_ok","cleanliness_ok","safety_ok",
+                "home_positions_ok","program_ok","spindle_ok","air_ok"]
+AFTER_ITEMS = ["tool_wear_check","dimension_check","coolant_topup","chip_cleaning",
+               "machine_condition","program_logs","shutdown_ok","faults_reported"]
+
+SCHEMAS = {
+    "checklists": {
+        "version": 2,
+        "columns": {**SHIFT, "phase": "category",
+                    **dict.fromkeys(BEFORE_ITEMS, "boolean"),
+                    **dict.fromkeys(AFTER_ITEMS, "boolean"),
+                    "notes": "string"},
+    },
+    "production": {
+        "version": 2,
+        "columns": {**SHIFT, "job_id": "string", "material": "category", "parts_done": "Int64",
+                    "avg_cycle_time_min": "float64", "scrap_count": "Int64", "notes": "string"},
+    },
+    "tools": {
+        "version": 2,
+        "columns": {**SHIFT, "tool_id": "string", "tool_name": "string",
+                    "expected_minutes": "float64", "minutes_used_today": "float64", "minutes_used_total": "float64",
+                    "expected_cycles": "float64", "cycles_used_today": "float64", "cycles_used_total": "float64",
+                    "status": "category", "notes": "string"},
+    },
+    "diagnostics": {
+        # v3: machine context the severity rules read, so history can be re-scored
+        "version": 3,
+        "columns": {**SHIFT, "issue_text": "string", "matched_issue": "category", "severity": "category",
+                    "operator_can_fix": "boolean", "actions": "category",
+                    "tool_hours_left": "float64", "spindle_hours_left": "float64", "notes": "string",
+                    "spindle_hours": "float64", "tool_cycles": "float64", "avg_temp_c": "float64",
+                    "vibration_mm_s": "float64", "coolant_ok": "boolean", "last_service_h": "float64",
+                    "rules_version": "category"},
+    },
+    "handover": {
+        "version": 2,
+        "columns": {**SHIFT, "prev_parts_done": "Int64", "prev_avg_cycle": "float64",
+                    "prev_notes": "string", "incoming_notes": "string"},
+    },
+}
+REQUIRED = ["timestamp", "machine_id"]
+TRUE_VALUES = ["True", "true", "1", "1.0"]
+FALSE_VALUES = ["False", "false", "0", "0.0"]
+
+
+def columns(table: str):
+    return list(SCHEMAS[table]["columns"])
+
+
+def number(v, default=0.0):
+    """float(v), or `default` for a blank, NaN or non-numeric value."""
+    try:
+        v = float(v)
+    except (TypeError, ValueError):
+        return default
+    return default if v != v else v
+
+
+def read_typed(path: Path, table: str):
+    """Fast path: let the C parser apply the declared dtypes. Raises ValueError/TypeError on a malformed value."""
+    dtypes = SCHEMAS[table]["columns"]
+    header = pd.read_csv(path, nrows=0).columns
+    if hasattr(path, "seek"):
+        path.seek(0)
+    df = pd.read_csv(path, dtype={c: t for c, t in dtypes.items() if c in header},
+                     true_values=TRUE_VALUES, false_values=FALSE_VALUES)
+    if df[[c for c in REQUIRED if c in df]].isna().any(axis=None):
+        raise ValueError(f"{table}: rows missing {REQUIRED}")
+    return df
+
+
+def coerce(raw: pd.DataFrame, table: str):
+    """Slow path over an all-text frame: returns (typed rows, rejected rows with a reason column)."""
+    dtypes = SCHEMAS[table]["columns"]
+    raw = raw.copy()
+    for c in dtypes:
+        if c not in raw:
+            raw[c] = pd.NA
+    text = raw.astype("string").apply(lambda s: s.str.strip()).replace("", pd.NA)
+    reason = pd.Series("", index=raw.index, dtype="string")
+    out = {}
+    for c, t in dtypes.items():
+        s = text[c]
+        if t == "boolean":
+            typed = pd.Series(pd.NA, index=s.index, dtype="boolean")
+            typed[s.isin(TRUE_VALUES)] = True
+            typed[s.isin(FALSE_VALUES)] = False
+        elif t in ("Int64", "float64"):
+            num = pd.to_numeric(s, errors="coerce")
+            typed = num.round().astype("Int64") if t == "Int64" else num.astype("float64")
+        else:
+            typed = s
+        bad = s.notna() & typed.isna()
+        reason[bad] = reason[bad] + f"bad {c}; "
+        out[c] = typed
+    for c in REQUIRED:
+        reason[text[c].isna()] = reason[text[c].isna()] + f"missing {c}; "
+    df = pd.DataFrame(out, index=raw.index)
+    extras = [c for c in raw.columns if c not in dtypes]
+    df[extras] = text[extras]
+    ok = reason == ""
+    good = df[ok].astype({c: t for c, t in dtypes.items() if t == "category"})
+    rejected = raw[~ok].assign(quarantine_reason=reason[~ok].str.rstrip("; "))
+    return good.reset_index(drop=True), rejected
+
+
+# -----------------------------
+# Migrations: MIGRATIONS[table][v] turns a version-v text frame into version v+1
+# -----------------------------
+def _tools_1_to_2(df):
+    # Rows written by the old tool form put the machine in tool_id and left machine_id empty.
+    shifted = df["machine_id"].isna() & df["tool_id"].fillna("").str.match(r"^VMC-")
+    df.loc[shifted, "quarantine_reason"] = "machine_id in tool_id field"
+    # usage_hours / max_hours came from the same old form; fold them into the minute counters.
+    for hours, minutes in (("usage_hours", "minutes_used_total"), ("max_hours", "expected_minutes")):
+        if hours in df:
+            h = pd.to_numeric(df[hours], errors="coerce") * 60
+            fill = df[minutes].isna() & h.notna()
+            df.loc[fill, minutes] = h[fill].astype(str)
+            df = df.drop(columns=[hours])
+    return df
+
+
+MIGRATIONS = {
+    "tools": {1: _tools_1_to_2},
+}
+
+
+def _versions_path(data_dir: Path):
+    return Path(data_dir) / "schema_versions.json"
+
+
+def _quarantine(data_dir: Path, table: str, rejected: pd.DataFrame):
+    if rejected.empty:
+        return
+    qdir = Path(data_dir) / "quarantine"
+    qdir.mkdir(exist_ok=True)
+    qpath = qdir / f"{table}.csv"
+    rejected.to_csv(qpath, mode="a", header=not qpath.exists(), index=False)
+
+
+def repair(data_dir: Path, table: str, path: Path):
+    """Quarantine malformed rows and rewrite the table with canonical values. Caller holds the write lock."""
+    raw = pd.read_csv(path, dtype=str, keep_default_na=False)
+    good, rejected = coerce(raw, table)
+    _quarantine(data_dir, table, rejected)
+    good.to_csv(path, index=False)
+    return len(rejected)
+
+
+def migrate(data_dir: Path, files: dict):
+    """Bring every table up to its schema version; returns the tables rewritten. Caller holds the write lock."""
+    vpath = _versions_path(data_dir)
+    versions = json.loads(vpath.read_text()) if vpath.exists() else {}
+    migrated = []
+    for table, schema in SCHEMAS.items():
+        path = files[table]
+        if not path.exists():
+            versions[table] = schema["version"]
+            continue
+        v = versions.get(table, 1)
+        if v >= schema["version"]:
+            continue
+        raw = pd.read_csv(path, dtype=str, keep_default_na=False).replace("", pd.NA)
+        raw["quarantine_reason"] = pd.NA
+        while v < schema["version"]:
+            step = MIGRATIONS.get(table, {}).get(v)
+            if step:
+                raw = step(raw)
+            v += 1
+        flagged = raw["quarantine_reason"].notna()
+        _quarantine(data_dir, table, raw[flagged])
+        good, rejected = coerce(raw[~flagged].drop(columns=["quarantine_reason"]), table)
+        _quarantine(data_dir, table, rejected)
+        good.to_csv(path, index=False)
+        versions[table] = schema["version"]
+        migrated.append(table)
+    vpath.write_text(json.dumps(versions, indent=2))
+    return migrated
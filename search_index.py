@@ -0,0 +1,125 @@
+import sqlite3
+import re
+from pathlib import Path
+import pandas as pd
+import sources
+
+# -----------------------------
+# Full-text index over free-text fields (SQLite FTS5)
+# -----------------------------
+# table -> free-text columns that get indexed
+TEXT_FIELDS = {
+    "handover": ["prev_notes", "incoming_notes"],
+    "checklists": ["notes"],
+    "diagnostics": ["issue_text", "notes"],
+    "production": ["notes"],
+    "tools": ["notes"],
+}
+
+META_COLS = ["timestamp", "shift_date", "shift", "operator", "machine_id"]
+
+
+def connect(db_path: Path):
+    con = sqlite3.connect(db_path, timeout=30)
+    con.execute("PRAGMA journal_mode=WAL")  # readers in other workers don't block the writer
+    con.execute(
+        "CREATE VIRTUAL TABLE IF NOT EXISTS docs USING fts5("
+        "body, tbl UNINDEXED, field UNINDEXED, timestamp UNINDEXED, shift_date UNINDEXED, "
+        "shift UNINDEXED, operator UNINDEXED, machine_id UNINDEXED, tokenize='unicode61')"
+    )
+    return con
+
+
+def _sources_path(db_path: Path):
+    return db_path.with_suffix(".sources.json")
+
+
+def _clean(v):
+    if v is None or (isinstance(v, float) and pd.isna(v)):
+        return ""
+    return str(v).strip()
+
+
+def _docs_for(table: str, row: dict):
+    meta = [_clean(row.get(c)) for c in META_COLS]
+    for field in TEXT_FIELDS.get(table, []):
+        body = _clean(row.get(field))
+        if body:
+            yield (body, table, field, *meta)
+
+
+def _insert(con, docs):
+    con.executemany(
+        "INSERT INTO docs (body, tbl, field, timestamp, shift_date, shift, operator, machine_id) "
+        "VALUES (?,?,?,?,?,?,?,?)", docs)
+
+
+def index_records(db_path: Path, table: str, rows: list, csv_path: Path, before):
+    """Add newly saved rows to the index (write path; `before` is the CSV's signature before the append)."""
+    if table not in TEXT_FIELDS:
+        return
+    con = connect(db_path)
+    if sources.in_step(_sources_path(db_path), table, before):
+        with con:
+            _insert(con, [doc for row in rows for doc in _docs_for(table, row)])
+        sources.record(_sources_path(db_path), {table: csv_path})
+    else:
+        rebuild_table(con, db_path, table, csv_path)
+    con.close()
+
+
+def rebuild_table(con, db_path: Path, table: str, csv_path: Path):
+    with con:
+        con.execute("DELETE FROM docs WHERE tbl = ?", (table,))
+        if csv_path.exists():
+            cols = META_COLS + TEXT_FIELDS[table]
+            df = pd.read_csv(csv_path, usecols=lambda c: c in cols, dtype=str)
+            docs = []
+            for row in df.to_dict("records"):
+                docs.extend(_docs_for(table, row))
+            _insert(con, docs)
+    sources.record(_sources_path(db_path), {table: csv_path}, rebuilt=True)
+
+
+def ensure_index(db_path: Path, files: dict):
+    """Re-index any table whose CSV changed since it was last indexed."""
+    con = connect(db_path)
+    for table, path in files.items():
+        if table in TEXT_FIELDS and not sources.fresh(_sources_path(db_path), {table: path}):
+            rebuild_table(con, db_path, table, path)
+    con.close()
+
+
+def _fts_query(text: str):
+    # quote every token so user input can't break FTS syntax; prefix-match the last one
+    tokens = re.findall(r"\w+", text.lower())
+    if not tokens:
+        return None
+    parts = [f'"{t}"' for t in tokens]
+    parts[-1] += "*"
+    return " ".join(parts)
+
+
+def search(db_path: Path, text: str, machine_id=None, start=None, end=None, limit=50):
+    q = _fts_query(text)
+    if q is None:
+        return pd.DataFrame()
+    sql = ("SELECT tbl AS table_name, timestamp, shift_date, shift, operator, machine_id, field, "
+           "snippet(docs, 0, '', '', ' … ', 12) AS snippet, bm25(docs) AS rank "
+           "FROM docs WHERE docs MATCH ?")
+    args = [q]
+    if machine_id:
+        sql += " AND machine_id = ?"
+        args.append(machine_id)
+    if start:
+        sql += " AND shift_date >= ?"
+        args.append(str(start))
+    if end:
+        sql += " AND shift_date <= ?"
+        args.append(str(end))
+    sql += " ORDER BY rank LIMIT ?"
+    args.append(int(limit))
+    con = connect(db_path)
+    df = pd.read_sql_query(sql, con, params=args)
+    con.close()
+    return df
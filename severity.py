@@ -0,0 +1,179 @@
+import argparse
+import hashlib
+import json
+import logging
+import os
+import re
+from pathlib import Path
+import numpy as np
+import pandas as pd
+import sources
+
+# -----------------------------
+# Declarative severity / escalation rules
+# -----------------------------
+# rules/severity.json holds ordered rules; each rule is a list of conditions
+# [column, op, value] combined with "all" (AND) and/or "any" (OR):
+#   severity: first matching rule gives the level, else default_severity
+#   escalate: any matching rule means the operator should not fix it alone
+# Rules are evaluated as boolean masks over a whole frame, so one diagnosis and
+# the full diagnostics history go through the same code path. A half-saved or
+# invalid edit is rejected (reload_error says why) and the last good rules stay in use.
+RULES_PATH = Path(os.environ.get("VMC_RULES_PATH", Path(__file__).parent / "rules" / "severity.json"))
+
+# machine context captured with every diagnosis (the inputs rules may use besides the text)
+CONTEXT = ["spindle_hours", "tool_cycles", "avg_temp_c", "vibration_mm_s", "coolant_ok", "last_service_h"]
+OPS = {">", ">=", "<", "<=", "==", "!=", "in", "not in", "contains"}
+
+# path -> ((size, mtime_ns), rules)
+_cache = {}
+reload_error = None   # why the last edit was rejected, while the previous rules are still used
+
+log = logging.getLogger(__name__)
+
+
+def _parse(raw: bytes, name: str):
+    rules = json.loads(raw)
+    if not isinstance(rules, dict):
+        raise ValueError(f"{name}: expected an object")
+    for kind in ("severity", "escalate"):
+        if not isinstance(rules.get(kind, []), list):
+            raise ValueError(f"{name}: `{kind}` must be a list of rules")
+        for i, r in enumerate(rules.get(kind, [])):
+            if not isinstance(r, dict):
+                raise ValueError(f"{name}: {kind} rule {i} is not an object")
+            if kind == "severity" and not isinstance(r.get("level"), str):
+                raise ValueError(f"{name}: severity rule {i} has no level")
+            for cond in r.get("all", []) + r.get("any", []):
+                if not isinstance(cond, list) or len(cond) != 3:
+                    raise ValueError(f"{name}: {kind} rule {i}: conditions are [column, op, value]")
+                if cond[1] not in OPS:
+                    raise ValueError(f"{name}: unknown operator {cond[1]!r} on {cond[0]}")
+    rules["version"] = hashlib.sha256(raw).hexdigest()[:12]
+    return rules
+
+
+def load(path: Path = RULES_PATH):
+    """Parsed rules plus a `version` (short content hash); re-read when the file changes."""
+    global reload_error
+    sig = sources.signature(path)
+    hit = _cache.get(path)
+    if hit and hit[0] == sig:
+        return hit[1]
+    try:
+        rules = _parse(path.read_bytes(), path.name)
+    except Exception as e:  # bad JSON, a rule without a level, the file removed mid-save...
+        if hit is None:
+            raise
+        # keep the last good rules until the file changes again
+        rules = hit[1]
+        reload_error = f"Severity rules reload failed, keeping version {rules['version']}: {e}"
+        log.warning(reload_error)
+    else:
+        reload_error = None
+    _cache[path] = (sig, rules)
+    return rules
+
+
+def _condition(df: pd.DataFrame, field, op, value):
+    n = len(df)
+    if field not in df:
+        return np.zeros(n, dtype=bool)
+    s = df[field]
+    if op == "contains":
+        terms = value if isinstance(value, list) else [value]
+        pattern = "|".join(re.escape(str(t).lower()) for t in terms)
+        m = s.astype("string").str.lower().str.contains(pattern, regex=True)
+    elif op in ("in", "not in"):
+        m = s.astype("string").isin([str(v) for v in value])
+        m = ~m if op == "not in" else m
+        m = m.where(s.notna(), False)
+    elif isinstance(value, bool):
+        b = s.astype("string").str.lower().map({"true": True, "false": False})
+        m = (b == value) if op == "==" else (b != value)
+        m = m.where(b.notna(), False)
+    elif isinstance(value, (int, float)):
+        v = pd.to_numeric(s, errors="coerce")
+        m = {">": v > value, ">=": v >= value, "<": v < value, "<=": v <= value,
+             "==": v == value, "!=": v != value}[op]
+    else:
+        t = s.astype("string")
+        m = (t == str(value)) if op == "==" else (t != str(value))
+    return pd.Series(m).fillna(False).to_numpy(dtype=bool)
+
+
+def _matches(df: pd.DataFrame, rule: dict):
+    m = np.ones(len(df), dtype=bool)
+    for cond in rule.get("all", []):
+        m &= _condition(df, *cond)
+    if rule.get("any"):
+        m &= np.logical_or.reduce([_condition(df, *cond) for cond in rule["any"]])
+    return m
+
+
+def score(df: pd.DataFrame, rules=None):
+    """Frame with issue_text / matched_issue / context columns -> (severity array, operator_can_fix array)."""
+    rules = rules or load()
+    sev = rules.get("severity", [])
+    severity = np.select([_matches(df, r) for r in sev], [r["level"] for r in sev],
+                         default=rules.get("default_severity", "Low")).astype(object)
+    scored = df.assign(severity=severity)
+    escalate = np.zeros(len(df), dtype=bool)
+    for r in rules.get("escalate", []):
+        escalate |= _matches(scored, r)
+    return severity, ~escalate
+
+
+def rescore(diag: pd.DataFrame, rules=None, steps=None):
+    """Re-apply the rules to a diagnostics frame.
+
+    Rows saved before context was recorded are left as they are. `steps(matched_issue)`
+    returns (operator_steps, escalation_steps) so actions follow a changed escalation
+    decision. Returns (updated frame, diff frame of changed rows, rows skipped).
+    """
+    rules = rules or load()
+    out = diag.copy()
+    ctx = [c for c in CONTEXT if c in out]
+    scorable = out[ctx].notna().any(axis=1).to_numpy() if ctx else np.zeros(len(out), dtype=bool)
+    sub = out[scorable]
+    severity, can_fix = score(sub, rules)
+    old_sev = sub["severity"].astype("string").to_numpy(dtype=object, na_value=None)
+    old_fix = sub["operator_can_fix"].astype("boolean").to_numpy(dtype=object, na_value=None)
+    changed = (old_sev != severity) | (old_fix != can_fix)
+    idx = sub.index[changed]
+
+    diff = pd.DataFrame({
+        "timestamp": sub["timestamp"].to_numpy()[changed], "machine_id": sub["machine_id"].to_numpy()[changed],
+        "issue_text": sub["issue_text"].to_numpy()[changed], "matched_issue": sub["matched_issue"].to_numpy()[changed],
+        "severity_old": old_sev[changed], "severity_new": severity[changed],
+        "operator_can_fix_old": old_fix[changed], "operator_can_fix_new": can_fix[changed],
+    })
+    if len(idx):
+        for c in ("severity", "actions", "rules_version"):
+            out[c] = out[c].astype(object) if c in out else None
+        out.loc[idx, "severity"] = severity[changed]
+        out.loc[idx, "operator_can_fix"] = can_fix[changed]
+        if steps is not None:
+            flipped = idx[old_fix[changed] != can_fix[changed]]
+            for i in flipped:
+                ops, esc = steps(out.at[i, "matched_issue"])
+                out.at[i, "actions"] = "; ".join(ops if out.at[i, "operator_can_fix"] else esc)
+        out.loc[idx, "rules_version"] = rules["version"]
+    return out, diff, int((~scorable).sum())
+
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description="Re-score the diagnostics history with the current severity rules.")
+    ap.add_argument("--apply", action="store_true", help="rewrite diagnostics.csv (default: report only)")
+    args = ap.parse_args(argv)
+    import storage
+    diff, skipped, report = storage.rescore_diagnostics(apply=args.apply)
+    print(f"rules {load()['version']}: {len(diff)} row(s) change, {skipped} without context skipped")
+    if report:
+        print(f"diff report: {report}")
+    if not args.apply and len(diff):
+        print(diff.to_string(index=False, max_rows=50))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,178 @@
+import base64
+import io
+import json
+import os
+import threading
+import time
+from pathlib import Path
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.feather as feather
+import schemas
+import sources
+
+# -----------------------------
+# In-memory table state: snapshot + journal
+# -----------------------------
+# Each process keeps every table it has read as a typed (categorical / nullable)
+# DataFrame plus the CSV byte offset it covers. The CSV itself is the journal:
+# rows appended after that offset are parsed on their own and concatenated, so
+# a rerun never re-parses the history. This worker's saves hand their bytes over
+# directly (no re-read); they are parsed in one batch at the next read, together
+# with anything other workers appended. The in-memory state is checkpointed to
+# data/snapshots/<table>.feather (Arrow, so dtypes survive and loading runs no
+# code; the covered offset etc. ride in the schema metadata) every
+# CHECKPOINT_ROWS new rows or CHECKPOINT_S seconds, by the reader that crossed the
+# threshold and outside the lock; a fresh process loads the snapshot and replays
+# only the CSV tail after it. Rewrites made by the app
+# (repair, re-score, dedup, new column) bump the table's generation file so every
+# worker parses the file in full again; a hand edit is caught when the size or
+# the bytes just before the covered offset changed.
+CHECKPOINT_ROWS = 5000
+CHECKPOINT_S = 600
+META_KEY = b"vmc_snapshot"
+
+# table -> {"df", "journal", "read_bytes", "header", "tail", "generation", "pending", "saved_at"}
+# journal: bytes this process appended that are not parsed into df yet (read_bytes covers them)
+_state = {}
+_lock = threading.Lock()  # sessions of one process share _state
+
+
+def _snapshot_path(snap_dir: Path, table: str):
+    return snap_dir / f"{table}.feather"
+
+
+def _generation(snap_dir: Path, table: str):
+    try:
+        return (snap_dir / f"{table}.gen").read_text()
+    except FileNotFoundError:
+        return ""
+
+
+def _schema_key(table: str):
+    return [schemas.SCHEMAS[table]["version"], [list(c) for c in schemas.SCHEMAS[table]["columns"].items()]]
+
+
+def _complete(data: bytes):
+    """Length of the whole records at the start of `data` (a concurrent append may be half written)."""
+    a = np.frombuffer(data, dtype=np.uint8)
+    newlines = np.flatnonzero(a == ord("\n"))
+    quotes = np.flatnonzero(a == ord('"'))
+    # as in time_index.record_lengths: a record ends at a newline preceded by an even number of quotes
+    ends = newlines[np.searchsorted(quotes, newlines) % 2 == 0]
+    return int(ends[-1]) + 1 if len(ends) else 0
+
+
+def _concat(old: pd.DataFrame, new: pd.DataFrame):
+    """Append rows keeping categoricals categorical (plain concat turns differing categories to object)."""
+    if new.empty:
+        return old
+    if list(new.columns) != list(old.columns):
+        return pd.concat([old, new], ignore_index=True)
+    recoded = {}
+    for c in old.columns:
+        if not (isinstance(old[c].dtype, pd.CategoricalDtype) and isinstance(new[c].dtype, pd.CategoricalDtype)):
+            continue
+        cats, more = old[c].cat.categories, new[c].cat.categories
+        if not more.isin(cats).all():
+            # a new machine / shift / job: widen the categories, kept sorted as read_csv makes them
+            cats = more if cats.empty else cats.union(more)
+            recoded[c] = old[c].cat.set_categories(cats)
+        new[c] = new[c].cat.set_categories(cats)
+    return pd.concat([old.assign(**recoded) if recoded else old, new], ignore_index=True)
+
+
+def _restore(snap_dir: Path, table: str):
+    """State from the snapshot file, or None if it is missing, unreadable or for another schema."""
+    try:
+        saved = feather.read_table(_snapshot_path(snap_dir, table), memory_map=False)
+        meta = json.loads((saved.schema.metadata or {})[META_KEY])
+    except (OSError, pa.ArrowException, KeyError, ValueError):
+        return None
+    if meta.get("schema") != _schema_key(table):
+        return None
+    return {"df": saved.to_pandas(), "journal": b"", "read_bytes": meta["read_bytes"],
+            "header": base64.b64decode(meta["header"]), "tail": base64.b64decode(meta["tail"]),
+            "generation": meta["generation"], "pending": 0, "saved_at": time.monotonic()}
+
+
+def _checkpoint(snap_dir: Path, table: str, state: dict):
+    """Write a state of a table (df covering exactly read_bytes) to its snapshot file (atomic replace)."""
+    meta = {"schema": _schema_key(table), "read_bytes": state["read_bytes"], "generation": state["generation"],
+            "header": base64.b64encode(state["header"]).decode(), "tail": base64.b64encode(state["tail"]).decode()}
+    saved = pa.Table.from_pandas(state["df"], preserve_index=False)
+    saved = saved.replace_schema_metadata({**(saved.schema.metadata or {}), META_KEY: json.dumps(meta).encode()})
+    snap_dir.mkdir(exist_ok=True)
+    path = _snapshot_path(snap_dir, table)
+    tmp = path.with_suffix(f".{os.getpid()}.{threading.get_ident()}.tmp")
+    feather.write_feather(saved, tmp)
+    os.replace(tmp, path)
+    path.with_suffix(".pkl").unlink(missing_ok=True)  # pickled snapshot of an older version
+
+
+def load(snap_dir: Path, table: str, csv_path: Path):
+    """Typed contents of a table, parsing only bytes not yet in memory (or in the snapshot).
+
+    Raises ValueError/TypeError like schemas.read_typed on a malformed row.
+    """
+    with _lock:
+        state = _load(snap_dir, table, csv_path)
+        due = state["pending"] >= CHECKPOINT_ROWS or (
+            state["pending"] and time.monotonic() - state["saved_at"] > CHECKPOINT_S)
+        if due:
+            # claimed here so other sessions don't write the same checkpoint; the copy is taken
+            # while the journal is empty, so df covers read_bytes exactly
+            saved = {k: state[k] for k in ("df", "read_bytes", "header", "tail", "generation")}
+            state.update(pending=0, saved_at=time.monotonic())
+    if due:
+        _checkpoint(snap_dir, table, saved)
+    return state["df"]
+
+
+def _load(snap_dir: Path, table: str, csv_path: Path):
+    state = _state.get(table) or _restore(snap_dir, table)
+    generation = _generation(snap_dir, table)
+    size = csv_path.stat().st_size
+    with open(csv_path, "rb") as fh:
+        header = fh.readline()
+        if state and (state["generation"] != generation or size < state["read_bytes"] or header != state["header"]
+                      or sources.tail(fh, state["read_bytes"]) != state["tail"]):
+            state = None
+        if state is None:
+            fh.seek(0)
+            data = fh.read(size)
+            data = data[:_complete(data)]
+            df = schemas.read_typed(io.BytesIO(data), table)
+            state = {"df": df, "journal": b"", "read_bytes": len(data), "header": header, "generation": generation,
+                     "pending": CHECKPOINT_ROWS, "saved_at": time.monotonic()}
+        else:
+            fh.seek(state["read_bytes"])
+            data = fh.read(size - state["read_bytes"])
+            data = data[:_complete(data)]
+            if state["journal"] or data:
+                new = schemas.read_typed(io.BytesIO(state["header"] + state["journal"] + data), table)
+                state = dict(state, df=_concat(state["df"], new), journal=b"", read_bytes=state["read_bytes"] + len(data),
+                             pending=state["pending"] + len(new))
+        state["tail"] = sources.tail(fh, state["read_bytes"])
+    _state[table] = state
+    return state
+
+
+def appended(table: str, before_size: int, data: bytes):
+    """Write path hook: this process appended `data` at before_size; it is parsed with the next load."""
+    with _lock:
+        state = _state.get(table)
+        if not state or state["read_bytes"] != before_size:
+            return  # not loaded here yet, or behind: the next load reads the tail from the file
+        state.update(journal=state["journal"] + data, read_bytes=before_size + len(data),
+                     tail=(state["tail"] + data)[-sources.TAIL_CHECK:])
+
+
+def rewritten(snap_dir: Path, table: str):
+    """The table's CSV was rewritten in place: drop this process's state and its snapshot, tell the other workers."""
+    with _lock:
+        _state.pop(table, None)
+    snap_dir.mkdir(exist_ok=True)
+    _snapshot_path(snap_dir, table).unlink(missing_ok=True)
+    (snap_dir / f"{table}.gen").write_text(str(time.time_ns()))
@@ -0,0 +1,83 @@
+import json
+from pathlib import Path
+
+# -----------------------------
+# Source tracking for derived files
+# -----------------------------
+# Every derived store (time index, shift rollup, packed checklists, search index)
+# keeps a sidecar JSON with, per source table, the (size, mtime_ns) signature of
+# the CSV it reflects and a generation counter bumped on every full rebuild.
+# A write-path append is only folded in when the recorded signature is the one
+# the CSV had just before that append; anything else (a hand edit, a repair, a
+# crash between the CSV append and the derived update) means the store drifted
+# and it is rebuilt instead. Startup checks compare against the current CSV.
+
+
+TAIL_CHECK = 64  # bytes before a read position compared to spot a file rewritten in place
+
+
+def tail(fh, end: int):
+    """The TAIL_CHECK bytes before offset `end` of an open binary file."""
+    fh.seek(max(0, end - TAIL_CHECK))
+    return fh.read(end - max(0, end - TAIL_CHECK))
+
+
+def signature(path: Path):
+    """(size, mtime_ns) of a file, or None if it does not exist."""
+    try:
+        st = path.stat()
+    except FileNotFoundError:
+        return None
+    return (st.st_size, st.st_mtime_ns)
+
+
+def _load(sources_path: Path):
+    try:
+        return json.loads(sources_path.read_text())
+    except (FileNotFoundError, ValueError):
+        return {}
+
+
+def _entry(sources: dict, table: str):
+    entry = sources.get(table)
+    return entry if isinstance(entry, dict) and "signature" in entry else None  # older sidecars held sizes only
+
+
+def recorded(sources_path: Path, table: str):
+    """{"signature": [size, mtime_ns], "generation": n} last recorded for a table, or None."""
+    return _entry(_load(sources_path), table)
+
+
+def generation(sources_path: Path, table: str):
+    entry = recorded(sources_path, table)
+    return entry["generation"] if entry else None
+
+
+def record(sources_path: Path, csv_paths: dict, rebuilt=False):
+    """The derived store now reflects these CSVs ({table: path}). Caller holds the write lock."""
+    sources = _load(sources_path)
+    for table, csv_path in csv_paths.items():
+        entry = _entry(sources, table) or {"generation": 0}
+        entry["signature"] = list(signature(csv_path) or (0, 0))
+        if rebuilt:
+            entry["generation"] += 1
+        sources[table] = entry
+    tmp = sources_path.with_name(sources_path.name + ".tmp")
+    tmp.write_text(json.dumps(sources))
+    tmp.replace(sources_path)
+
+
+def fresh(sources_path: Path, csv_paths: dict):
+    """True if every CSV is exactly as recorded (a missing CSV counts as empty)."""
+    sources = _load(sources_path)
+    for table, csv_path in csv_paths.items():
+        entry = _entry(sources, table)
+        if entry is None or tuple(entry["signature"]) != (signature(csv_path) or (0, 0)):
+            return False
+    return True
+
+
+def in_step(sources_path: Path, table: str, before):
+    """True if the store reflects the CSV as it was just before an append (`before` = its signature then)."""
+    entry = recorded(sources_path, table)
+    return entry is not None and tuple(entry["signature"]) == tuple(before or (0, 0))
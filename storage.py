@@ -0,0 +1,392 @@
+import io
+import os
+import threading
+import time
+from datetime import datetime
+from contextlib import contextmanager
+from pathlib import Path
+import pandas as pd
+import search_index
+import rollup
+import schemas
+import checklist_bits
+import dedup
+import tool_accrual
+import machines
+import alerts
+import time_index
+import snapshot
+import sources
+import forecast
+import severity
+import kb
+
+if os.name == "nt":
+    import msvcrt
+else:
+    import fcntl
+
+# -----------------------------
+# Storage: CSV tables shared safely between server processes
+# -----------------------------
+# Every write takes an exclusive OS file lock on data/.write.lock, appends to the
+# CSV and updates the derived files (search index, shift rollup, packed
+# checklists, tool counters, machine registry) before releasing it, so several Streamlit workers
+# can serve the same ./data directory.
+# Readers never lock: whenever a table's (mtime, size) changed they parse only
+# the bytes appended since their last read (see snapshot), which is how a write
+# in one worker reaches the caches in all others.
+DATA_DIR = Path(os.environ.get("VMC_DATA_DIR", "data"))
+DATA_DIR.mkdir(parents=True, exist_ok=True)
+
+FILES = {
+    "checklists": DATA_DIR / "checklists.csv",
+    "production": DATA_DIR / "production.csv",
+    "tools": DATA_DIR / "tools.csv",
+    "diagnostics": DATA_DIR / "diagnostics.csv",
+    "handover": DATA_DIR / "handover.csv"
+}
+SEARCH_DB = DATA_DIR / "search.db"
+ROLLUP = DATA_DIR / "shift_rollup.db"
+CHECKLIST_BITS = DATA_DIR / "checklists_packed.csv"
+TOOL_ASSIGNMENTS = DATA_DIR / "tool_assignments.csv"
+TOOL_COUNTERS = DATA_DIR / "tool_counters.db"
+MACHINES = DATA_DIR / "machines.db"
+OUTBOX = DATA_DIR / "outbox.db"
+IMPORTS = DATA_DIR / "imports.db"
+RESCORE_DIR = DATA_DIR / "rescore"
+DEDUP_DIR = DATA_DIR / "dedup"
+TIME_INDEX = DATA_DIR / "time_index"
+SNAPSHOTS = DATA_DIR / "snapshots"
+LOCK_FILE = DATA_DIR / ".write.lock"
+
+COLUMNS = {table: schemas.columns(table) for table in schemas.SCHEMAS}
+
+
+_held = threading.local()
+
+
+@contextmanager
+def write_lock():
+    """Exclusive cross-process lock around every write to ./data (re-entrant within a thread)."""
+    if getattr(_held, "depth", 0):
+        _held.depth += 1
+        try:
+            yield
+        finally:
+            _held.depth -= 1
+        return
+    with open(LOCK_FILE, "a+b") as fh:
+        if os.name == "nt":
+            fh.seek(0)
+            while True:
+                try:
+                    msvcrt.locking(fh.fileno(), msvcrt.LK_LOCK, 1)
+                    break
+                except OSError:  # LK_LOCK gives up after ~10 s; keep waiting
+                    time.sleep(0.05)
+        else:
+            fcntl.flock(fh, fcntl.LOCK_EX)
+        _held.depth = 1
+        try:
+            yield
+        finally:
+            _held.depth = 0
+            if os.name == "nt":
+                fh.seek(0)
+                msvcrt.locking(fh.fileno(), msvcrt.LK_UNLCK, 1)
+            else:
+                fcntl.flock(fh, fcntl.LOCK_UN)
+
+
+def init_csv(path: Path, cols: list):
+    if not path.exists():
+        pd.DataFrame(columns=cols).to_csv(path, index=False)
+
+
+_initialized = False
+
+
+def init_storage():
+    """Create missing tables and catch derived files up with edits made outside the app."""
+    global _initialized
+    if _initialized:
+        return
+    _initialized = True
+    with write_lock():
+        for table in schemas.migrate(DATA_DIR, FILES):
+            snapshot.rewritten(SNAPSHOTS, table)
+        for table, cols in COLUMNS.items():
+            init_csv(FILES[table], cols)
+        search_index.ensure_index(SEARCH_DB, FILES)
+        rollup.ensure_rollup(ROLLUP, FILES)
+        checklist_bits.ensure_packed(CHECKLIST_BITS, FILES["checklists"])
+        time_index.ensure(TIME_INDEX, FILES)
+        tool_accrual.adopt_csv(TOOL_COUNTERS, DATA_DIR / "tool_counters.csv")
+        machines.adopt_csv(MACHINES, DATA_DIR / "machines.csv")
+        if not MACHINES.exists():
+            machines.seed(MACHINES, {t: read_table(t) for t in FILES})
+
+
+def _append(path: Path, rows: list):
+    """Append rows; returns the bytes written (None if the file had to be rewritten)."""
+    header = list(pd.read_csv(path, nrows=0).columns)
+    if any(k not in header for row in rows for k in row):
+        # new column: rewrite the file once so the header gains it
+        df = pd.concat([pd.read_csv(path), pd.DataFrame(rows)], ignore_index=True)
+        df.to_csv(path, index=False)
+        return None
+    data = pd.DataFrame(rows, columns=header).to_csv(header=False, index=False).encode("utf-8")
+    with open(path, "ab") as fh:
+        fh.write(data)
+    return data
+
+
+def save_rows(table: str, rows: list):
+    """Append rows and update the derived files; returns the rows skipped as duplicates (see dedup)."""
+    if not rows:
+        return []
+    path = FILES[table]
+    with write_lock():
+        init_csv(path, COLUMNS[table])
+        rows, dupes, hashes = dedup.split_new(table, path, rows)
+        if not rows:
+            return dupes
+        before = sources.signature(path)
+        data = _append(path, rows)
+        if data is None:
+            snapshot.rewritten(SNAPSHOTS, table)
+            time_index.rebuild(TIME_INDEX, table, path)
+        else:
+            time_index.append(TIME_INDEX, table, path, rows, before, data)
+            dedup.appended(table, path, before[0], hashes)
+            snapshot.appended(table, before[0], data)
+        search_index.index_records(SEARCH_DB, table, rows, path, before)
+        rollup.apply_records(ROLLUP, table, rows, FILES, before)
+        if table == "checklists":
+            checklist_bits.append_packed(CHECKLIST_BITS, rows, path, before)
+        elif table == "production":
+            tool_accrual.accrue(TOOL_ASSIGNMENTS, TOOL_COUNTERS, rows)
+            machines.accrue(MACHINES, rows)
+        alerts.evaluate(OUTBOX, table, rows, {
+            "assignments": tool_accrual.assignment_index(TOOL_ASSIGNMENTS),
+            "counter": lambda key: tool_accrual.counter(TOOL_COUNTERS, *key),
+            "limits": tool_life_limits,
+            "plant_wide": kb.plant_wide,
+        })
+    return dupes
+
+
+def save_row(table: str, row: dict):
+    """False if an identical record was already saved."""
+    return not save_rows(table, [row])
+
+
+def import_rows(table: str, rows: list, digest: str):
+    """save_rows for the rows of one uploaded file (digest: dedup.file_digest of its bytes).
+
+    Returns (rows skipped as duplicates, when the same file was imported before or None);
+    a file already imported saves nothing.
+    """
+    with write_lock():
+        earlier = dedup.imported_at(IMPORTS, table, digest)
+        if earlier:
+            return [], earlier
+        dupes = save_rows(table, rows)
+        if len(rows) > len(dupes):
+            dedup.record_import(IMPORTS, table, digest, len(rows) - len(dupes))
+        return dupes, None
+
+
+
+def _rewritten(tables):
+    """Tables were rewritten in place: rebuild every derived file that reads them. Caller holds the write lock."""
+    for table in tables:
+        snapshot.rewritten(SNAPSHOTS, table)
+        time_index.rebuild(TIME_INDEX, table, FILES[table])
+    rollup.rebuild(ROLLUP, FILES)
+    search_index.ensure_index(SEARCH_DB, {t: FILES[t] for t in tables})
+    if "checklists" in tables:
+        checklist_bits.ensure_packed(CHECKLIST_BITS, FILES["checklists"])
+
+
+def assign_tool(machine_id, job_id, tool_id, tool_name, cycles_per_part=1.0, cut_share=1.0):
+    with write_lock():
+        tool_accrual.assign(TOOL_ASSIGNMENTS, machine_id, job_id, tool_id, tool_name, cycles_per_part, cut_share)
+
+
+def unassign_tool(machine_id, job_id, tool_id):
+    with write_lock():
+        tool_accrual.unassign(TOOL_ASSIGNMENTS, machine_id, job_id, tool_id)
+
+
+def reset_tool_counters(machine_id, tool_id):
+    with write_lock():
+        tool_accrual.reset(TOOL_COUNTERS, machine_id, tool_id)
+
+
+def register_machine(machine_id, model="", installed_spindle_h=None, hours_since_service=None):
+    with write_lock():
+        machines.register(MACHINES, machine_id, model, installed_spindle_h, hours_since_service)
+
+
+def record_service(machine_id):
+    with write_lock():
+        machines.record_service(MACHINES, machine_id)
+
+
+def machine_registry():
+    """machine_id -> registry row (see machines); cached, O(1) per lookup."""
+    return machines.load(MACHINES)
+
+
+def rescore_diagnostics(apply=False):
+    """Re-score the diagnostics history with the current severity rules.
+
+    Returns (diff of changed rows, rows skipped for lack of context, report path or None).
+    With apply=True the table is rewritten, the shift rollup rebuilt and the diff kept
+    under data/rescore/. Alerts already queued are not re-evaluated.
+    """
+    with write_lock():
+        rules = severity.load()
+        diag = read_table("diagnostics")
+        out, diff, skipped = severity.rescore(diag, rules, steps=kb.steps)
+        if not apply or diff.empty:
+            return diff, skipped, None
+        out.to_csv(FILES["diagnostics"], index=False)
+        _rewritten(["diagnostics"])
+        RESCORE_DIR.mkdir(exist_ok=True)
+        report = RESCORE_DIR / f"diagnostics_{datetime.now():%Y%m%d_%H%M%S}_{rules['version']}.csv"
+        diff.to_csv(report, index=False)
+        return diff, skipped, report
+
+
+def dedup_history(apply=False):
+    """Find records saved more than once in the history (first copy kept).
+
+    Returns ({table: duplicate rows}, report directory or None). With apply=True each affected
+    table is rewritten, its derived files rebuilt and the removed rows kept under data/dedup/.
+    Tool counters and the machine registry already accrued from removed production rows are not rewound.
+    """
+    with write_lock():
+        removed, changed = {}, {}
+        for table, path in FILES.items():
+            if not path.exists():
+                continue
+            kept, dupes = dedup.drop_duplicates(path, table)
+            removed[table] = len(dupes)
+            if len(dupes):
+                changed[table] = (kept, dupes)
+        if not apply or not changed:
+            return removed, None
+        report = DEDUP_DIR / f"{datetime.now():%Y%m%d_%H%M%S}"
+        report.mkdir(parents=True)
+        for table, (kept, dupes) in changed.items():
+            dupes.to_csv(report / f"{table}.csv", index=False)
+            kept.to_csv(FILES[table], index=False)
+        _rewritten(list(changed))
+        return removed, report
+
+
+# per-process read cache: table -> ((size, mtime_ns), DataFrame)
+_cache = {}
+
+
+def _empty(table: str):
+    return pd.DataFrame(columns=COLUMNS[table]).astype(schemas.SCHEMAS[table]["columns"])
+
+
+def read_table(table: str):
+    """Current typed contents of a table; only rows appended since the last read are parsed.
+
+    The returned frame is shared between reruns and sessions, so callers must not mutate it.
+    """
+    path = FILES[table]
+    sig = sources.signature(path)
+    hit = _cache.get(table)
+    if hit and hit[0] == sig:
+        return hit[1]
+    if sig is None:
+        df = _empty(table)
+    else:
+        try:
+            df = snapshot.load(SNAPSHOTS, table, path)
+        except (ValueError, TypeError):
+            # a malformed row slipped in (hand edit, old client): quarantine it and reload
+            with write_lock():
+                schemas.repair(DATA_DIR, table, path)
+                _rewritten([table])
+            sig = sources.signature(path)
+            df = snapshot.load(SNAPSHOTS, table, path)
+    _cache[table] = (sig, df)
+    return df
+
+
+def read_range(table: str, machine_id=None, start=None, end=None, shifts=None):
+    """Rows of a table for a shift_date range (inclusive) and optional machine / shifts, read via the time index.
+
+    Only the matching rows are read from disk; falls back to filtering the whole table if the index is unusable.
+    """
+    path = FILES[table]
+    if not path.exists():
+        return _empty(table)
+    if not time_index.fresh(TIME_INDEX, table, path):
+        with write_lock():
+            time_index.ensure(TIME_INDEX, {table: path})
+    data = time_index.read_range(TIME_INDEX, table, path, machine_id, start, end, shifts)
+    if data is None:
+        df = read_table(table)
+        dates = df["shift_date"].astype("string")
+        keep = pd.Series(True, index=df.index)
+        if start is not None:
+            keep &= dates >= str(start)
+        if end is not None:
+            keep &= dates <= str(end)
+        if machine_id:
+            keep &= df["machine_id"].astype("string") == str(machine_id)
+        if shifts:
+            keep &= df["shift"].astype("string").isin([str(s) for s in shifts])
+        return df[keep.fillna(False)]
+    try:
+        return schemas.read_typed(io.BytesIO(data), table)
+    except (ValueError, TypeError):
+        return schemas.coerce(pd.read_csv(io.BytesIO(data), dtype=str, keep_default_na=False), table)[0]
+
+
+def read_checklist_bits():
+    """Packed checklist records (see checklist_bits), cached like read_table."""
+    sig = sources.signature(CHECKLIST_BITS)
+    hit = _cache.get("checklist_bits")
+    if hit and hit[0] == sig:
+        return hit[1]
+    df = checklist_bits.load_packed(CHECKLIST_BITS)
+    _cache["checklist_bits"] = (sig, df)
+    return df
+
+
+def tool_replacements(today, horizon_days=forecast.HORIZON_DAYS):
+    """(live tool registry, forecast replacements); recomputed only when the tool data, production or diagnostics change."""
+    tools, production, diag = read_table("tools"), read_table("production"), read_table("diagnostics")
+    key = (sources.signature(TOOL_COUNTERS), sources.signature(TOOL_ASSIGNMENTS), str(today), horizon_days)
+    hit = _cache.get("tool_replacements")
+    if hit and hit[0][0] is tools and hit[0][1] is production and hit[0][2] is diag and hit[0][3] == key:
+        return hit[1]
+    life = tool_accrual.live_registry(tools, TOOL_COUNTERS)
+    assignments = tool_accrual.load_assignments(TOOL_ASSIGNMENTS)
+    value = (life, forecast.replacements(life, assignments, production, diag, today, horizon_days))
+    _cache["tool_replacements"] = ((tools, production, diag, key), value)
+    return value
+
+
+def tool_life_limits():
+    """(machine_id, tool_id) -> (expected_minutes, expected_cycles) from the latest Tools entry."""
+    tools = read_table("tools")
+    hit = _cache.get("tool_limits")
+    if hit and hit[0] is tools:
+        return hit[1]
+    latest = tools.dropna(subset=["machine_id", "tool_id"]).groupby(["machine_id", "tool_id"], observed=True).tail(1)
+    latest = latest[["machine_id", "tool_id", "expected_minutes", "expected_cycles"]].astype(
+        {"expected_minutes": object, "expected_cycles": object}).where(latest.notna(), None)
+    limits = {(str(m), str(t)): (em, ec) for m, t, em, ec in latest.itertuples(index=False)}
+    _cache["tool_limits"] = (tools, limits)
+    return limits
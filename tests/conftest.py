@@ -0,0 +1,20 @@
+import importlib
+import sys
+from pathlib import Path
+import pytest
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+
+@pytest.fixture
+def storage(tmp_path, monkeypatch):
+    """storage bound to an empty data directory, with every per-process cache emptied."""
+    monkeypatch.setenv("VMC_DATA_DIR", str(tmp_path / "data"))
+    import storage
+    storage = importlib.reload(storage)
+    for name in ("dedup", "machines", "snapshot", "time_index", "tool_accrual"):
+        module = sys.modules.get(name)
+        if module is not None:
+            getattr(module, "_state", getattr(module, "_cache", {})).clear()
+    storage.init_storage()
+    return storage
@@ -0,0 +1,77 @@
+import alerts
+
+
+def _ctx(counters=None, limits=None, plant_wide=(), calls=None):
+    def limits_fn():
+        if calls is not None:
+            calls.append("limits")
+        return limits or {}
+    return {"assignments": {("VMC-1", "J1"): [("T1", "Drill", 1.0, 1.0)]},
+            "counter": (counters or {}).get, "limits": limits_fn, "plant_wide": lambda: set(plant_wide)}
+
+
+def _row(machine="VMC-1", date="2026-10-19", time="08:00:00", **values):
+    return {"timestamp": f"{date}T{time}", "shift_date": date, "shift": "A", "operator": "ana",
+            "machine_id": machine, **values}
+
+
+def _rules(db):
+    return [a["rule"] for a in alerts.pending(db, limit=100)]
+
+
+def test_tool_entry_near_end_of_life(tmp_path):
+    db = tmp_path / "outbox.db"
+    alerts.evaluate(db, "tools", [_row(tool_id="T1", minutes_used_total=95, expected_minutes=100),
+                                  _row(tool_id="T2", cycles_used_total=10, expected_cycles=100)], _ctx())
+    assert [a["message"].split()[1] for a in alerts.pending(db)] == ["T1"]
+
+
+def test_production_accrual_runs_each_rule_once(tmp_path):
+    db, calls = tmp_path / "outbox.db", []
+    ctx = _ctx(counters={("VMC-1", "T1"): {"minutes_total": 10, "cycles_total": 460}},
+               limits={("VMC-1", "T1"): (1000, 500)}, calls=calls)
+    assert alerts.evaluate(db, "production", [_row(job_id="J1", parts_done=5)], ctx) == 1
+    assert calls == ["limits"]
+    alerts.evaluate(db, "production", [_row(job_id="J2", parts_done=5)], ctx)  # nothing mounted on J2
+    assert _rules(db) == ["tool_life"] and calls == ["limits"]
+
+
+def test_low_spindle_life(tmp_path):
+    db = tmp_path / "outbox.db"
+    alerts.evaluate(db, "diagnostics", [_row(severity="Low", spindle_hours_left=120),
+                                        _row(machine="VMC-2", severity="Low", spindle_hours_left=900)], _ctx())
+    assert [(a["rule"], a["machine_id"]) for a in alerts.pending(db)] == [("spindle_rul", "VMC-1")]
+
+
+def test_repeated_high_severity_within_the_window(tmp_path):
+    db = tmp_path / "outbox.db"
+    rows = [_row(date="2026-10-17", severity="High")] + [_row(time=f"0{h}:00:00", severity="High") for h in (6, 7)]
+    alerts.evaluate(db, "diagnostics", rows, _ctx())
+    assert _rules(db) == []  # the first is more than 24 h before the others
+    alerts.evaluate(db, "diagnostics", [_row(time="09:00:00", severity="High")], _ctx())
+    assert _rules(db) == ["repeated_high"]
+
+
+def test_plant_wide_fault_on_three_machines(tmp_path):
+    db, ctx = tmp_path / "outbox.db", _ctx(plant_wide=["Air pressure low"])
+    for i, machine in enumerate(["VMC-1", "VMC-2", "VMC-1", "VMC-3"]):
+        alerts.evaluate(db, "diagnostics", [_row(machine, time=f"08:{10 * i:02d}:00", severity="Low",
+                                                 matched_issue="Air pressure low")], ctx)
+    assert [(a["rule"], a["machine_id"]) for a in alerts.pending(db)] == [("plant_wide", alerts.PLANT)]
+
+
+def test_checklist_rules_by_phase(tmp_path):
+    db = tmp_path / "outbox.db"
+    alerts.evaluate(db, "checklists", [_row(phase="before", safety_ok=False), _row(phase="after", safety_ok=False),
+                                       _row(phase="after", machine_condition="False")], _ctx())
+    assert sorted(_rules(db)) == ["machine_condition", "safety_checklist"]
+
+
+def test_outbox_keeps_one_alert_per_rule_machine_subject_and_day(tmp_path):
+    db = tmp_path / "outbox.db"
+    low = dict(severity="Low", spindle_hours_left=100)
+    assert alerts.evaluate(db, "diagnostics", [_row(**low), _row(time="15:00:00", **low)], _ctx()) == 1
+    assert alerts.evaluate(db, "diagnostics", [_row(machine="VMC-2", **low)], _ctx()) == 1
+    assert alerts.evaluate(db, "diagnostics", [_row(date="2026-10-20", **low)], _ctx()) == 1
+    assert alerts.drain(db, lambda a: None) == 3 and alerts.pending(db) == []
+    assert alerts.evaluate(db, "diagnostics", [_row(**low)], _ctx()) == 0  # sent alerts still dedup
@@ -0,0 +1,24 @@
+import pandas as pd
+import bulk
+
+CONTEXT = {"shift_date": "2026-10-19", "shift": "A", "operator": "ana"}
+
+
+def test_production_rows_need_parts_and_a_cycle_time():
+    batch = pd.DataFrame({"machine_id": ["VMC-1"] * 4, "job_id": ["J1", "J2", "J3", "J4"],
+                          "parts_done": ["10", "", "10", "10"], "avg_cycle_time_min": ["2.5", "2.5", "", "abc"]})
+    rows, rejected = bulk.validate("production", batch, ["VMC-1"], CONTEXT)
+    assert [r["job_id"] for r in rows] == ["J1"] and rows[0]["operator"] == "ana"
+    assert list(rejected["reason"]) == ["missing parts_done", "missing avg_cycle_time_min",
+                                        "avg_cycle_time_min not a number"]
+
+
+def test_upload_with_its_own_timestamp_and_shift_columns():
+    batch = pd.DataFrame({"timestamp": ["2020-01-01T00:00:00"] * 4, "machine_id": ["VMC-1"] * 4,
+                          "tool_id": ["T1", "T2", "T3", "T4"], "shift": ["B", "D", "", "C"],
+                          "shift_date": ["2026-10-18", "2026-10-18", "18/10/2026", ""]})
+    rows, rejected = bulk.validate("tools", batch, ["VMC-1"], CONTEXT)
+    assert [(r["tool_id"], r["shift"], r["shift_date"]) for r in rows] == [("T1", "B", "2026-10-18"),
+                                                                           ("T4", "C", "2026-10-19")]
+    assert all(r["timestamp"] > "2026" for r in rows)
+    assert list(rejected["reason"]) == ["unknown shift", "shift_date not YYYY-MM-DD"]
@@ -0,0 +1,26 @@
+import checklist_bits
+from schemas import BEFORE_ITEMS
+
+
+def _checklist(operator, ticked):
+    row = {"shift_date": "2026-10-19", "shift": "A", "operator": operator, "machine_id": "VMC-1", "phase": "before"}
+    return dict(row, **{item: item in ticked for item in BEFORE_ITEMS})
+
+
+def test_compliance_counts_skips_per_group(storage):
+    first, second = BEFORE_ITEMS[:2]
+    storage.save_rows("checklists", [_checklist("ana", BEFORE_ITEMS), _checklist("ana", [second]),
+                                     _checklist("raj", [second])])
+    _, long = checklist_bits.compliance(storage.read_checklist_bits(), "operator")
+    skipped = long.set_index(["operator", "item"])
+    assert skipped.loc[("ana", first), "skipped"] == 1 and skipped.loc[("ana", first), "checks"] == 2
+    assert skipped.loc[("raj", first), "skip_rate"] == 1.0
+    assert skipped.loc[("ana", second), "skipped"] == 0
+
+
+def test_compliance_groups_blank_values_instead_of_failing(storage):
+    storage.save_rows("checklists", [_checklist("", []), _checklist(None, BEFORE_ITEMS[:1]), _checklist("ana", [])])
+    rates, long = checklist_bits.compliance(storage.read_checklist_bits(), "operator")
+    assert set(rates.index) == {"ana", checklist_bits.BLANK_GROUP}
+    blank = long[long["operator"] == checklist_bits.BLANK_GROUP].set_index("item")
+    assert blank.loc[BEFORE_ITEMS[0], "checks"] == 2 and blank.loc[BEFORE_ITEMS[0], "skipped"] == 1
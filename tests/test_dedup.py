@@ -0,0 +1,51 @@
+import pandas as pd
+import dedup
+
+
+def _production(time, parts=10, job="J1"):
+    return {"timestamp": f"2026-10-19T{time}", "shift_date": "2026-10-19", "shift": "A", "machine_id": "VMC-1",
+            "job_id": job, "parts_done": parts, "avg_cycle_time_min": 2.0}
+
+
+def test_a_double_submit_is_skipped_but_a_later_repeat_is_saved(storage):
+    assert storage.save_row("production", _production("08:00:00"))
+    assert not storage.save_row("production", _production("08:00:02"))
+    assert storage.save_row("production", _production("08:00:03", parts=11))
+    # the same job logging the same parts again later in the shift is a real record
+    assert storage.save_row("production", _production("11:30:00"))
+    assert not storage.save_row("production", _production("11:29:00"))
+    assert len(storage.read_table("production")) == 3
+
+
+def test_repeats_inside_a_batch_and_rows_from_other_workers_are_caught(storage):
+    dupes = storage.save_rows("production", [_production("08:00:00"), _production("08:00:00", job="J2"),
+                                             _production("08:00:00")])
+    assert [d["job_id"] for d in dupes] == ["J1"]
+    # another worker appends a row this process has not read yet
+    row = pd.DataFrame([_production("09:00:00", job="J3")], columns=storage.COLUMNS["production"])
+    with open(storage.FILES["production"], "a", newline="") as fh:
+        fh.write(row.to_csv(header=False, index=False))
+    assert not storage.save_row("production", _production("09:01:00", job="J3"))
+
+
+def test_history_cleanup_only_drops_copies_inside_the_window(storage, tmp_path):
+    rows = [_production("08:00:00"), _production("08:00:01"), _production("08:04:00"),
+            _production("13:00:00"), _production("08:00:01", job="J2")]
+    path = tmp_path / "production.csv"
+    pd.DataFrame(rows, columns=storage.COLUMNS["production"]).to_csv(path, index=False)
+    kept, removed = dedup.drop_duplicates(path, "production")
+    assert list(removed["timestamp"]) == ["2026-10-19T08:00:01", "2026-10-19T08:04:00"]
+    assert list(kept["timestamp"]) == ["2026-10-19T08:00:00", "2026-10-19T13:00:00", "2026-10-19T08:00:01"]
+
+
+def test_a_reimported_file_is_refused_after_the_window(storage):
+    data = b"machine_id,job_id,parts_done,avg_cycle_time_min\nVMC-1,J1,10,2.0\n"
+    digest = dedup.file_digest(data)
+    assert storage.import_rows("production", [_production("08:00:00")], digest) == ([], None)
+    # hours later, the same file's rows get a fresh save time the window would accept
+    dupes, earlier = storage.import_rows("production", [_production("14:00:00")], digest)
+    assert dupes == [] and earlier is not None
+    edited = dedup.file_digest(data + b"VMC-1,J2,5,2.0\n")
+    assert storage.import_rows("production", [_production("14:00:00")], edited)[1] is None
+    assert storage.import_rows("tools", [], digest)[1] is None  # remembered per table
+    assert len(storage.read_table("production")) == 2
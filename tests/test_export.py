@@ -0,0 +1,28 @@
+import os
+import zipfile
+import alerts
+import export
+
+
+def test_clis_default_to_vmc_data_dir(storage, tmp_path, monkeypatch, capsys):
+    row = {"timestamp": "2026-10-19T08:00:00", "shift_date": "2026-10-19", "shift": "A", "machine_id": "VMC-1"}
+    storage.save_row("production", dict(row, job_id="J1", parts_done=3))
+    storage.save_row("diagnostics", dict(row, issue_text="spindle noise", spindle_hours_left=100))
+    cwd = tmp_path / "elsewhere"
+    cwd.mkdir()
+    monkeypatch.chdir(cwd)  # no ./data here: only VMC_DATA_DIR points at the tables
+    export.main(["--tables", "production", "-o", "out.csv.zip"])
+    with zipfile.ZipFile(cwd / "out.csv.zip") as z:
+        assert z.read("production.csv").decode().count("VMC-1") == 1
+    alerts.main(["list"])
+    assert "VMC-1" in capsys.readouterr().out
+
+
+def test_prune_deletes_only_old_exports(tmp_path):
+    old, new = tmp_path / "vmc_export_a.csv.zip", tmp_path / "vmc_export_b.csv.zip"
+    old.write_bytes(b"x")
+    new.write_bytes(b"y")
+    os.utime(old, (0, 0))
+    assert export.prune(tmp_path) == 1
+    assert not old.exists() and new.exists()
+    assert export.prune(tmp_path / "missing") == 0
@@ -0,0 +1,58 @@
+import importlib
+import json
+import os
+import shutil
+import pytest
+import kb
+
+
+@pytest.fixture
+def fresh(tmp_path, monkeypatch):
+    """kb reloaded against a copy of the shipped KB in tmp_path/kb."""
+    kb_dir = tmp_path / "kb"
+    kb_dir.mkdir()
+    shutil.copy(kb.KB_DIR / "vmc.json", kb_dir / "vmc.json")
+    monkeypatch.setenv("VMC_KB_DIR", str(kb_dir))
+    yield importlib.reload(kb)
+    monkeypatch.undo()
+    importlib.reload(kb)
+
+
+def _edit(fresh, monkeypatch, name, text):
+    path = fresh.KB_DIR / name
+    path.write_text(text)
+    os.utime(path, ns=(0, 0))
+    monkeypatch.setattr(fresh, "_checked_at", 0.0)
+
+
+def test_a_broken_edit_keeps_the_previous_kb_and_reports_why(fresh, monkeypatch, caplog):
+    good = fresh.current()
+    _edit(fresh, monkeypatch, "vmc.json", "{ half saved")
+    assert fresh.current() is good
+    assert good.digest[:12] in fresh.reload_error
+    assert "KB reload failed" in caplog.text
+
+
+@pytest.mark.parametrize("name, text", [
+    ("extra.yaml", "entries: [name: {unclosed"),
+    ("extra.json", json.dumps({"entries": ["not an entry"]})),
+    ("extra.json", json.dumps({"entries": [{"name": "Coolant low", "keywords": "coolant"}]})),
+    ("extra.json", json.dumps({"entries": [{"keywords": ["coolant"]}]})),
+])
+def test_invalid_files_and_entries_are_rejected(fresh, monkeypatch, name, text):
+    good = fresh.current()
+    _edit(fresh, monkeypatch, name, text)
+    assert fresh.current() is good and fresh.reload_error
+    (fresh.KB_DIR / name).unlink()  # fixing the edit clears the error
+    monkeypatch.setattr(fresh, "_checked_at", 0.0)
+    assert fresh.current().digest == good.digest and fresh.reload_error is None
+
+
+def test_compiled_entries_are_cached_as_json(fresh):
+    compiled = fresh.current()
+    (cached,) = fresh.CACHE_DIR.glob("*.json")
+    assert cached.stem == compiled.digest
+    fresh._memory.clear()
+    reread = fresh._load(fresh._kb_files())
+    assert reread.entries == compiled.entries and reread.plant_wide == compiled.plant_wide
+    assert fresh.match("spindle making grinding noise")[0] == compiled.match("spindle making grinding noise")[0]
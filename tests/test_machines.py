@@ -0,0 +1,53 @@
+import machines
+
+
+def _production(machine_id, parts, cycle=3.0):
+    return {"timestamp": "2026-10-19T08:00:00", "shift_date": "2026-10-19", "shift": "A", "machine_id": machine_id,
+            "job_id": "J1", "parts_done": parts, "avg_cycle_time_min": cycle}
+
+
+def test_production_saves_accrue_run_hours_per_machine(storage):
+    storage.register_machine("VMC-1", "DMU 50", installed_spindle_h=1000.0, hours_since_service=100.0)
+    storage.save_rows("production", [_production("VMC-1", 20), _production("VMC-2", 10)])
+    storage.save_row("production", _production("VMC-1", 40))
+    registry = storage.machine_registry()
+    assert registry["VMC-1"]["runtime_h"] == 3.0 and registry["VMC-1"]["parts_total"] == 60
+    assert machines.spindle_hours(registry["VMC-1"]) == 1003.0
+    assert machines.hours_since_service(registry["VMC-1"]) == 103.0
+    assert registry["VMC-2"]["runtime_h"] == 0.5 and registry["VMC-2"]["model"] == ""
+    storage.record_service("VMC-1")
+    assert machines.hours_since_service(storage.machine_registry()["VMC-1"]) == 0.0
+
+
+def test_registry_from_the_old_csv_is_imported_once(tmp_path):
+    csv, db = tmp_path / "machines.csv", tmp_path / "machines.db"
+    csv.write_text(",".join(machines.COLUMNS) + "\nVMC-1,DMU 50,1000,12.5,300,900,,0,2026-10-18T20:00:00\n")
+    machines.adopt_csv(db, csv)
+    m = machines.load(db)["VMC-1"]
+    assert (m["model"], m["runtime_h"], m["last_service_at"]) == ("DMU 50", 12.5, "")
+    assert machines.hours_since_service(m) == 112.5 and not csv.exists()
+
+
+def test_machines_registered_by_production_have_unknown_spindle_hours(storage):
+    storage.save_row("production", _production("VMC-7", 100))
+    m = storage.machine_registry()["VMC-7"]
+    assert m["runtime_h"] == 5.0
+    # the Troubleshooting / What-if forms keep their defaults instead of pre-filling 5 h
+    assert machines.spindle_hours(m, 4200.0) == 4200.0 and machines.hours_since_service(m, 1200.0) == 1200.0
+    storage.record_service("VMC-7")
+    storage.save_row("production", _production("VMC-7", 20))
+    m = storage.machine_registry()["VMC-7"]
+    assert machines.hours_since_service(m) == 1.0 and machines.spindle_hours(m) is None
+    storage.register_machine("VMC-7", installed_spindle_h=3000.0, hours_since_service=50.0)
+    m = storage.machine_registry()["VMC-7"]
+    assert machines.spindle_hours(m) == 3006.0 and machines.hours_since_service(m) == 50.0
+
+
+def test_saving_only_a_model_keeps_the_spindle_hours(storage):
+    storage.register_machine("VMC-1", "DMU 50", installed_spindle_h=1000.0, hours_since_service=100.0)
+    storage.register_machine("VMC-1", "DMU 50 eVo")
+    m = storage.machine_registry()["VMC-1"]
+    assert m["model"] == "DMU 50 eVo"
+    assert machines.spindle_hours(m) == 1000.0 and machines.hours_since_service(m) == 100.0
+    storage.register_machine("VMC-2", "Haas VF-2")  # a new machine stays unknown rather than 0 h
+    assert machines.spindle_hours(storage.machine_registry()["VMC-2"]) is None
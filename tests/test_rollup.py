@@ -0,0 +1,43 @@
+import pandas as pd
+import rollup
+
+
+def _row(table, shift="A", date="2026-10-19", machine="VMC-1", **values):
+    return {"timestamp": f"{date}T08:00:00", "shift_date": date, "shift": shift, "machine_id": machine, **values}
+
+
+def test_rebuild_with_blank_job_id_and_no_matched_issue(storage):
+    storage.save_rows("production", [_row("production", job_id="", parts_done=4, avg_cycle_time_min=2.0),
+                                     _row("production", job_id="J7", parts_done=6, avg_cycle_time_min=3.0)])
+    storage.save_row("diagnostics", _row("diagnostics", issue_text="odd noise"))
+    rollup.rebuild(storage.ROLLUP, storage.FILES)
+    summary = rollup.load(storage.ROLLUP).iloc[0]
+    assert summary["jobs"] == "J7" and summary["parts_done"] == 10
+    assert summary["avg_cycle_time_min"] == 2.6
+    assert summary["last_issue"] == "" and summary["diagnostics"] == 1
+
+
+def test_incremental_updates_match_a_rebuild(storage):
+    rows = [_row("production", shift=s, machine=m, job_id=f"J{i}", parts_done=i + 1, avg_cycle_time_min=1.5)
+            for i, (s, m) in enumerate([("A", "VMC-1"), ("B", "VMC-1"), ("A", "VMC-2"), ("A", "VMC-1")])]
+    for r in rows:
+        storage.save_row("production", r)
+    storage.save_row("tools", _row("tools", tool_id="T1", status="Replace soon"))
+    storage.save_row("diagnostics", _row("diagnostics", issue_text="chatter", matched_issue="Chatter"))
+    storage.save_row("diagnostics", _row("diagnostics", issue_text="odd noise"))  # no KB match: last_issue blank
+    storage.save_row("checklists", _row("checklists", phase="before"))
+    incremental = rollup.load(storage.ROLLUP).sort_values(rollup.KEY).reset_index(drop=True)
+    rollup.rebuild(storage.ROLLUP, storage.FILES)
+    rebuilt = rollup.load(storage.ROLLUP).sort_values(rollup.KEY).reset_index(drop=True)
+    pd.testing.assert_frame_equal(incremental, rebuilt, check_dtype=False)
+    first = incremental.iloc[0]
+    assert first["jobs"] == "J0;J3" and first["tools_replace"] == 1 and first["before_checklist"]
+
+
+def test_previous_shift_is_the_latest_strictly_before(storage):
+    for date, shift in [("2026-10-18", "C"), ("2026-10-19", "A"), ("2026-10-19", "B")]:
+        storage.save_row("production", _row("production", shift=shift, date=date, job_id="J", parts_done=1))
+    assert rollup.previous_shift(storage.ROLLUP, "VMC-1", "2026-10-19", "B")["shift"] == "A"
+    assert rollup.previous_shift(storage.ROLLUP, "VMC-1", "2026-10-19", "A")["shift_date"] == "2026-10-18"
+    assert rollup.previous_shift(storage.ROLLUP, "VMC-1", "2026-10-18", "C") is None
+    assert rollup.previous_shift(storage.ROLLUP, "VMC-9", "2026-10-19", "A") is None
@@ -0,0 +1,16 @@
+import itertools
+import numpy as np
+import rul
+
+
+def test_estimate_rul_thresholds_and_rounding():
+    assert rul.estimate_rul(4200, 1450, 58, 2.0, True, 900) == (0.0, 3800.0, 1.0, 1.0)
+    assert rul.estimate_rul(4200, 100, 61, 4.3, False, 1200) == (85.0, 1910.0, 1.6, 1.45)
+
+
+def test_what_if_grid_matches_estimate_rul_point_by_point():
+    temps, vibs, services, coolant = [40.0, 60.0, 75.0], [1.0, 3.0, 6.5], [800.0, 1000.0, 1500.0], [True, False]
+    tool_h, spindle_h = (np.broadcast_to(a, (3, 3, 2, 3)) for a in rul.what_if(5000, 300, temps, vibs, services, coolant))
+    for (i, t), (j, v), (k, c), (m, s) in itertools.product(*map(enumerate, (temps, vibs, coolant, services))):
+        tool_left, spindle_left, _, _ = rul.estimate_rul(5000, 300, t, v, c, s)
+        assert (round(tool_h[i, j, k, m], 1), round(spindle_h[i, j, k, m], 1)) == (tool_left, spindle_left)
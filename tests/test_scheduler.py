@@ -0,0 +1,26 @@
+from datetime import date
+import pandas as pd
+import scheduler
+
+
+def _tasks(*rows):
+    return pd.DataFrame(rows, columns=["machine_id", "task", "hours_left"])
+
+
+def test_tasks_share_a_stoppage_and_its_overhead():
+    tasks = _tasks(("VMC-1", "Tool change T1", 1.0), ("VMC-1", "Tool change T2", 2.0), ("VMC-2", "Tool change T3", 1.0))
+    df, summary = scheduler.plan(tasks, date(2026, 10, 19), days=1)
+    assert summary["stoppages"] == 2 and summary["downtime_min"] == 3 * 15 + 2 * 20
+    assert df.groupby("machine_id")["stoppage"].nunique().to_dict() == {"VMC-1": 1, "VMC-2": 1}
+
+
+def test_crew_capacity_is_charged_the_overhead_once_per_stoppage():
+    # each shift has 280 min: a spindle service (240 + 20 overhead) leaves 20. The VMC-1 tool change due in B finds
+    # no room there and joins the VMC-1 stoppage in A, which has room for 15 min but not for another 15 + 20
+    tasks = _tasks(("VMC-1", "Spindle service", 0.0), ("VMC-2", "Spindle service", 7.5),
+                   ("VMC-1", "Tool change T1", 8.0))
+    df, summary = scheduler.plan(tasks, date(2026, 10, 19), days=1, shifts=["A", "B"], crew_minutes_per_shift=280,
+                                 merge_window=0)
+    vmc1 = df[df["machine_id"] == "VMC-1"]
+    assert summary["unscheduled"] == 0 and set(vmc1["shift"]) == {"A"} and vmc1["stoppage"].nunique() == 1
+    assert summary["downtime_min"] == 240 + 240 + 15 + 2 * 20
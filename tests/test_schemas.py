@@ -0,0 +1,11 @@
+import math
+import pandas as pd
+import schemas
+
+
+def test_number_falls_back_for_blank_and_non_numeric_values():
+    assert schemas.number("2.5") == 2.5 and schemas.number(3) == 3.0
+    for blank in ("", " ", None, float("nan"), pd.NA, "n/a"):
+        assert schemas.number(blank) == 0.0
+        assert schemas.number(blank, None) is None
+    assert math.isinf(schemas.number("inf"))
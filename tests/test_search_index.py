@@ -0,0 +1,9 @@
+import search_index
+
+
+def test_snippet_has_no_markup(storage):
+    storage.save_row("diagnostics", {"timestamp": "2026-10-19T08:00:00", "shift_date": "2026-10-19", "shift": "A",
+                                     "machine_id": "VMC-1", "issue_text": "spindle chatter at high rpm"})
+    hits = search_index.search(storage.SEARCH_DB, "chatter")
+    assert len(hits) == 1
+    assert "chatter" in hits.loc[0, "snippet"] and "*" not in hits.loc[0, "snippet"]
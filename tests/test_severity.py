@@ -0,0 +1,52 @@
+import json
+import os
+import pandas as pd
+import severity
+
+RULES = {"severity": [{"level": "High", "any": [["vibration_mm_s", ">", 4], ["issue_text", "contains", "overheat"]]},
+                      {"level": "Medium", "all": [["coolant_ok", "==", False]]}],
+         "default_severity": "Low",
+         "escalate": [{"all": [["matched_issue", "in", ["electrical trip / breaker"]], ["severity", "!=", "Low"]]}]}
+
+
+def test_first_matching_rule_sets_the_level_and_escalation_reads_it():
+    df = pd.DataFrame({"issue_text": ["spindle overheat", "coolant leak", "breaker trips", "breaker trips"],
+                       "matched_issue": ["spindle", "coolant", "electrical trip / breaker", "electrical trip / breaker"],
+                       "vibration_mm_s": [1.0, 5.0, 6.0, None], "coolant_ok": ["True", "False", "False", "True"]})
+    level, can_fix = severity.score(df, RULES)
+    assert list(level) == ["High", "High", "High", "Low"]
+    assert list(can_fix) == [True, True, False, True]
+
+
+def test_a_broken_edit_keeps_the_last_good_rules(tmp_path, caplog):
+    path = tmp_path / "severity.json"
+    path.write_text(json.dumps(RULES))
+    good = severity.load(path)
+    for broken in ("{ half saved", json.dumps({"severity": [{"any": [["avg_temp_c", ">", 50]]}]})):
+        path.write_text(broken)
+        os.utime(path, ns=(len(broken), len(broken)))
+        assert severity.load(path) is good
+        assert good["version"] in severity.reload_error and "reload failed" in caplog.text
+    path.write_text(json.dumps({**RULES, "default_severity": "Medium"}))
+    assert severity.load(path)["default_severity"] == "Medium" and severity.reload_error is None
+
+
+def _diagnosis(**values):
+    return {"timestamp": "2026-10-19T08:00:00", "shift_date": "2026-10-19", "shift": "A", "operator": "ana",
+            "machine_id": "VMC-1", "issue_text": "chatter", "matched_issue": "chatter / vibration",
+            "severity": "Low", "operator_can_fix": True, "actions": "Reduce feed", **values}
+
+
+def test_rescore_apply_rewrites_the_history(storage, capsys):
+    storage.save_rows("diagnostics", [_diagnosis(vibration_mm_s=6.0), _diagnosis(vibration_mm_s=1.0),
+                                      _diagnosis(issue_text="overheat")])  # the last has no context: skipped
+    severity.main([])
+    assert "1 row(s) change, 1 without context skipped" in capsys.readouterr().out
+    assert list(storage.read_table("diagnostics")["severity"]) == ["Low"] * 3
+    severity.main(["--apply"])
+    assert "diff report:" in capsys.readouterr().out
+    diag = storage.read_table("diagnostics")
+    assert list(diag["severity"]) == ["High", "Low", "Low"]
+    assert diag["rules_version"].iloc[0] == severity.load()["version"]
+    (report,) = storage.RESCORE_DIR.glob("diagnostics_*.csv")
+    assert pd.read_csv(report)["severity_new"].tolist() == ["High"]
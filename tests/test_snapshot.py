@@ -0,0 +1,47 @@
+import pandas as pd
+import schemas
+import snapshot
+
+
+def _production(i):
+    return {"timestamp": f"2026-10-19T08:{i % 60:02d}:00", "shift_date": "2026-10-19", "shift": "A",
+            "machine_id": f"VMC-{i % 3}", "job_id": f"J{i}", "parts_done": i, "avg_cycle_time_min": 1.5,
+            "notes": "line one\nline two" if i == 2 else ""}
+
+
+def _restart():
+    snapshot._state.clear()  # a fresh worker process
+
+
+def test_a_restarted_worker_restores_the_snapshot_and_replays_the_tail(storage, monkeypatch):
+    monkeypatch.setattr(snapshot, "CHECKPOINT_ROWS", 5)
+    storage.save_rows("production", [_production(i) for i in range(5)])
+    storage.read_table("production")  # 5 new rows: checkpoint
+    path = storage.SNAPSHOTS / "production.feather"
+    assert path.exists() and not list(storage.SNAPSHOTS.glob("*.pkl"))
+    storage.save_rows("production", [_production(i) for i in range(5, 8)])
+    _restart()
+    restored = snapshot._restore(storage.SNAPSHOTS, "production")
+    assert len(restored["df"]) == 5
+    df = snapshot.load(storage.SNAPSHOTS, "production", storage.FILES["production"])
+    pd.testing.assert_frame_equal(df, schemas.read_typed(storage.FILES["production"], "production"))
+
+
+def test_a_snapshot_of_a_rewritten_file_is_not_used(storage):
+    storage.save_rows("production", [_production(i) for i in range(5)])
+    storage.read_table("production")
+    raw = pd.read_csv(storage.FILES["production"], dtype=str, keep_default_na=False)
+    raw.drop(index=3).to_csv(storage.FILES["production"], index=False)  # hand edit behind the app's back
+    _restart()
+    df = snapshot.load(storage.SNAPSHOTS, "production", storage.FILES["production"])
+    assert list(df["job_id"]) == ["J0", "J1", "J2", "J4"]
+
+
+def test_checkpoints_are_written_outside_the_lock(storage, monkeypatch):
+    held = []
+    write = snapshot._checkpoint
+    monkeypatch.setattr(snapshot, "_checkpoint", lambda *a: (held.append(snapshot._lock.locked()), write(*a)))
+    monkeypatch.setattr(snapshot, "CHECKPOINT_ROWS", 3)
+    storage.save_rows("production", [_production(i) for i in range(3)])
+    storage.read_table("production")
+    assert held == [False]
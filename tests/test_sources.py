@@ -0,0 +1,53 @@
+import pandas as pd
+import checklist_bits
+import rollup
+import search_index
+import sources
+
+
+def _production(job, parts, notes=""):
+    return {"timestamp": f"2026-10-19T08:0{parts % 10}:00", "shift_date": "2026-10-19", "shift": "A",
+            "machine_id": "VMC-1", "job_id": job, "parts_done": parts, "avg_cycle_time_min": 2.0, "notes": notes}
+
+
+def test_in_step_tracks_the_signature_before_an_append(tmp_path):
+    csv, sidecar = tmp_path / "t.csv", tmp_path / "d.sources.json"
+    csv.write_text("a\n1\n")
+    assert not sources.fresh(sidecar, {"t": csv})
+    sources.record(sidecar, {"t": csv}, rebuilt=True)
+    before = sources.signature(csv)
+    assert sources.fresh(sidecar, {"t": csv}) and sources.in_step(sidecar, "t", before)
+    with open(csv, "a") as fh:
+        fh.write("2\n")
+    assert not sources.fresh(sidecar, {"t": csv})
+    assert sources.generation(sidecar, "t") == 1
+
+
+def test_old_size_only_sidecar_counts_as_stale(tmp_path):
+    csv, sidecar = tmp_path / "t.csv", tmp_path / "d.sources.json"
+    csv.write_text("a\n1\n")
+    sidecar.write_text('{"t": 4}')
+    assert not sources.fresh(sidecar, {"t": csv})
+
+
+def test_rows_added_outside_the_write_path_reach_the_derived_files(storage):
+    storage.save_row("production", _production("J1", 10))
+    # a hand edit appends a row behind the app's back
+    row = pd.DataFrame([_production("J2", 5, "hand edit")], columns=storage.COLUMNS["production"])
+    with open(storage.FILES["production"], "a", newline="") as fh:
+        fh.write(row.to_csv(header=False, index=False))
+    storage.save_row("production", _production("J3", 1))
+    summary = rollup.previous_shift(storage.ROLLUP, "VMC-1", "2026-10-20", "A")
+    assert summary["production_entries"] == 3 and summary["parts_done"] == 16
+    assert len(search_index.search(storage.SEARCH_DB, "hand edit")) == 1
+
+
+def test_checklists_added_outside_the_write_path_are_repacked(storage):
+    item = checklist_bits.ITEMS[0]
+    row = {"timestamp": "2026-10-19T07:00:00", "shift_date": "2026-10-19", "shift": "A", "operator": "Asha",
+           "machine_id": "VMC-1", "phase": "before", item: True}
+    storage.save_row("checklists", row)
+    with open(storage.FILES["checklists"], "a", newline="") as fh:
+        fh.write(pd.DataFrame([dict(row, shift="B")], columns=storage.COLUMNS["checklists"]).to_csv(header=False, index=False))
+    storage.save_row("checklists", dict(row, shift="C"))
+    assert sorted(storage.read_checklist_bits()["shift"].astype(str)) == ["A", "B", "C"]
@@ -0,0 +1,21 @@
+import rollup
+import search_index
+import time_index
+
+
+def _production(job, parts, notes=""):
+    return {"timestamp": "2026-10-19T08:00:00", "shift_date": "2026-10-19", "shift": "A",
+            "machine_id": "VMC-1", "job_id": job, "parts_done": parts, "avg_cycle_time_min": 2.0, "notes": notes}
+
+
+def test_repair_rewrite_rebuilds_the_derived_files(storage):
+    storage.save_row("production", _production("J1", 10, "coolant low"))
+    storage.save_row("production", _production("J2", "lots", "gearbox whine"))  # not a number: quarantined on read
+    assert len(search_index.search(storage.SEARCH_DB, "whine")) == 1
+    df = storage.read_table("production")
+    assert list(df["job_id"]) == ["J1"]
+    assert (storage.DATA_DIR / "quarantine" / "production.csv").exists()
+    assert search_index.search(storage.SEARCH_DB, "whine").empty
+    summary = rollup.load(storage.ROLLUP).iloc[0]
+    assert summary["production_entries"] == 1 and summary["jobs"] == "J1"
+    assert time_index.fresh(storage.TIME_INDEX, "production", storage.FILES["production"])
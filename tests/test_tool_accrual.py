@@ -0,0 +1,29 @@
+import tool_accrual
+
+
+def _production(day, parts, job="J1"):
+    return {"timestamp": f"{day}T08:00:00", "shift_date": day, "shift": "A", "machine_id": "VMC-1",
+            "job_id": job, "parts_done": parts, "avg_cycle_time_min": 2.0}
+
+
+def test_production_saves_accrue_into_the_mounted_tools(storage):
+    storage.assign_tool("VMC-1", "J1", "T1", "Endmill", cycles_per_part=2.0, cut_share=0.5)
+    storage.save_row("production", _production("2026-10-19", 10))
+    storage.save_row("production", _production("2026-10-19", 5))
+    storage.save_row("production", _production("2026-10-19", 7, job="J2"))  # nothing mounted on J2
+    c = tool_accrual.load_counters(storage.TOOL_COUNTERS)[("VMC-1", "T1")]
+    assert (c["cycles_total"], c["minutes_total"], c["cycles_today"]) == (30.0, 15.0, 30.0)
+    storage.save_row("production", _production("2026-10-20", 1))
+    c = tool_accrual.load_counters(storage.TOOL_COUNTERS)[("VMC-1", "T1")]
+    assert (c["cycles_total"], c["cycles_today"], c["minutes_today"], c["day"]) == (32.0, 2.0, 1.0, "2026-10-20")
+    storage.reset_tool_counters("VMC-1", "T1")
+    assert tool_accrual.load_counters(storage.TOOL_COUNTERS)[("VMC-1", "T1")]["cycles_total"] == 0
+
+
+def test_counters_from_the_old_csv_are_imported_once(tmp_path):
+    csv, db = tmp_path / "tool_counters.csv", tmp_path / "tool_counters.db"
+    csv.write_text("machine_id,tool_id,tool_name,cycles_total,minutes_total,day,cycles_today,minutes_today,updated_at\n"
+                   "VMC-1,T1,Drill,120,60.5,2026-10-18,4,2,2026-10-18T20:00:00\n")
+    tool_accrual.adopt_csv(db, csv)
+    assert tool_accrual.load_counters(db)[("VMC-1", "T1")]["minutes_total"] == 60.5
+    assert not csv.exists()
@@ -0,0 +1,168 @@
+import io
+from pathlib import Path
+import numpy as np
+import pandas as pd
+import sources
+
+# -----------------------------
+# Time-range index: (shift_date, shift, machine_id) -> byte range of each CSV row
+# -----------------------------
+# Tables only ever grow at the end, so a row's byte offset never changes until
+# the file is rewritten (new column, repair, migration, re-score). The write
+# path appends one index entry per saved row to data/time_index/<table>.csv;
+# a query binary-searches the date range in the index (kept sorted by
+# shift_date), then seeks to just those rows, so the cost follows the rows
+# returned rather than the table size. Each table's CSV signature is kept in
+# sources.json (see sources); a rewrite behind the index's back triggers a full
+# rebuild.
+KEY = ["shift_date", "shift", "machine_id"]
+COLUMNS = KEY + ["offset", "length"]
+
+# table -> {"generation", "read_bytes", "index"}: index file parsed so far, sorted by shift_date
+_cache = {}
+
+
+def _index_path(index_dir: Path, table: str):
+    return index_dir / f"{table}.csv"
+
+
+def _sources_path(index_dir: Path):
+    return index_dir / "sources.json"
+
+
+def record_lengths(data: bytes):
+    """Byte length of each CSV record in `data` (a newline inside a quoted field does not end a record)."""
+    a = np.frombuffer(data, dtype=np.uint8)
+    newlines = np.flatnonzero(a == ord("\n"))
+    quotes = np.flatnonzero(a == ord('"'))
+    # a record ends at a newline preceded by an even number of quotes
+    ends = newlines[np.searchsorted(quotes, newlines) % 2 == 0] + 1
+    if len(ends) == 0 or ends[-1] != len(data):
+        ends = np.append(ends, len(data)) if len(data) else ends
+    return np.diff(ends, prepend=0)
+
+
+def _keys(rows: list):
+    return [[str(r.get(k) if r.get(k) is not None else "") for k in KEY] for r in rows]
+
+
+def append(index_dir: Path, table: str, csv_path: Path, rows: list, before, data: bytes):
+    """Write path hook: `data` is exactly what was appended to a CSV whose signature was `before`.
+
+    Caller holds the write lock.
+    """
+    index_dir.mkdir(exist_ok=True)
+    if not sources.in_step(_sources_path(index_dir), table, before):
+        # index was already behind (or missing): rebuild covers the new rows too
+        rebuild(index_dir, table, csv_path)
+        return
+    lengths = record_lengths(data)
+    if len(lengths) != len(rows):
+        rebuild(index_dir, table, csv_path)
+        return
+    starts = before[0] + np.concatenate([[0], np.cumsum(lengths)[:-1]])
+    entries = pd.DataFrame(_keys(rows), columns=KEY).assign(offset=starts, length=lengths)
+    entries.to_csv(_index_path(index_dir, table), mode="a", header=False, index=False)
+    sources.record(_sources_path(index_dir), {table: csv_path})
+
+
+def rebuild(index_dir: Path, table: str, csv_path: Path):
+    """Re-index a whole table from its CSV. Caller holds the write lock."""
+    index_dir.mkdir(exist_ok=True)
+    path = _index_path(index_dir, table)
+    data = csv_path.read_bytes() if csv_path.exists() else b""
+    lengths = record_lengths(data)
+    entries = pd.DataFrame(columns=COLUMNS)
+    if len(lengths) > 1:
+        keys = pd.read_csv(io.BytesIO(data), usecols=lambda c: c in KEY, dtype=str, keep_default_na=False)
+        if len(keys) == len(lengths) - 1:
+            for k in KEY:
+                if k not in keys:
+                    keys[k] = ""
+            offsets = np.cumsum(lengths)
+            entries = keys[KEY].assign(offset=offsets[:-1], length=lengths[1:])
+        else:
+            # blank lines or a malformed tail: leave the index empty; queries fall back to a scan
+            entries = None
+    if entries is None:
+        path.unlink(missing_ok=True)
+    else:
+        entries.to_csv(path, index=False)
+    sources.record(_sources_path(index_dir), {table: csv_path}, rebuilt=True)
+
+
+def fresh(index_dir: Path, table: str, csv_path: Path):
+    return (csv_path.exists() and _index_path(index_dir, table).exists()
+            and sources.fresh(_sources_path(index_dir), {table: csv_path}))
+
+
+def ensure(index_dir: Path, files: dict):
+    """Rebuild the index of any table changed outside the write path. Caller holds the write lock."""
+    for table, csv_path in files.items():
+        if csv_path.exists() and not fresh(index_dir, table, csv_path):
+            rebuild(index_dir, table, csv_path)
+
+
+def load(index_dir: Path, table: str):
+    """(index entries sorted by shift_date, their dates as an array); only bytes appended since the last call are parsed."""
+    generation = sources.generation(_sources_path(index_dir), table)
+    path = _index_path(index_dir, table)
+    hit = _cache.get(table)
+    if not hit or hit["generation"] != generation:
+        hit = {"generation": generation, "read_bytes": 0, "index": None, "dates": None}
+    with open(path, "rb") as fh:
+        fh.seek(hit["read_bytes"])
+        tail = fh.read()
+    # only whole lines: a writer may be mid-append
+    tail = tail[:tail.rfind(b"\n") + 1]
+    if tail or hit["index"] is None:
+        new = pd.read_csv(io.BytesIO(tail), names=COLUMNS, header=0 if hit["read_bytes"] == 0 else None,
+                          dtype={k: str for k in KEY}, keep_default_na=False) if tail else pd.DataFrame(columns=COLUMNS)
+        new = new.sort_values("shift_date", kind="stable")
+        index = hit["index"]
+        if index is None or index.empty:
+            index = new
+        elif new.empty or new["shift_date"].iloc[0] >= index["shift_date"].iloc[-1]:
+            index = pd.concat([index, new], ignore_index=True)  # usual case: new rows are the latest dates
+        else:
+            index = pd.concat([index, new], ignore_index=True).sort_values("shift_date", kind="stable")
+        index = index.reset_index(drop=True)
+        hit = {"generation": generation, "read_bytes": hit["read_bytes"] + len(tail),
+               "index": index, "dates": index["shift_date"].to_numpy(dtype=object)}
+    _cache[table] = hit
+    return hit["index"], hit["dates"]
+
+
+def byte_ranges(index: pd.DataFrame, dates, machine_id=None, start=None, end=None, shifts=None):
+    """Contiguous (offset, length) runs holding the matching rows, in file order."""
+    lo = np.searchsorted(dates, str(start)) if start is not None else 0
+    hi = np.searchsorted(dates, str(end), side="right") if end is not None else len(dates)
+    hit = index.iloc[lo:hi]
+    if machine_id:
+        hit = hit[hit["machine_id"] == str(machine_id)]
+    if shifts:
+        hit = hit[hit["shift"].isin([str(s) for s in shifts])]
+    if hit.empty:
+        return []
+    hit = hit.sort_values("offset")
+    offsets = hit["offset"].to_numpy(dtype=np.int64)
+    ends = offsets + hit["length"].to_numpy(dtype=np.int64)
+    # merge rows that sit next to each other in the file into one read
+    breaks = np.flatnonzero(offsets[1:] != ends[:-1]) + 1
+    run_starts = np.concatenate([[0], breaks])
+    run_ends = np.concatenate([breaks, [len(offsets)]]) - 1
+    return list(zip(offsets[run_starts].tolist(), (ends[run_ends] - offsets[run_starts]).tolist()))
+
+
+def read_range(index_dir: Path, table: str, csv_path: Path, machine_id=None, start=None, end=None, shifts=None):
+    """Header plus the matching rows of a table as CSV bytes, or None when the index is unusable."""
+    if not _index_path(index_dir, table).exists():
+        return None
+    ranges = byte_ranges(*load(index_dir, table), machine_id, start, end, shifts)
+    with open(csv_path, "rb") as fh:
+        header = fh.readline()
+        parts = [header]
+        for offset, length in ranges:
+            fh.seek(offset)
+            parts.append(fh.read(length))
+    return b"".join(parts)
@@ -0,0 +1,210 @@
+import sqlite3
+from datetime import datetime
+from pathlib import Path
+import pandas as pd
+import rul
+import schemas
+import sources
+
+# -----------------------------
+# Tool-life accrual from production entries
+# -----------------------------
+# tool_assignments.csv says which tools are mounted for a (machine, job) and how
+# much each is used per part; tool_counters.db holds the running totals in a
+# SQLite table keyed by (machine, tool). Every saved production row upserts
+# parts x usage into the tools on its job only, so the cost per row is O(tools on
+# that job) however many tools are tracked.
+ASSIGN_COLS = ["machine_id", "job_id", "tool_id", "tool_name", "cycles_per_part", "cut_share"]
+COUNTER_COLS = ["machine_id", "tool_id", "tool_name", "cycles_total", "minutes_total",
+                "day", "cycles_today", "minutes_today", "updated_at"]
+TEXT = {"machine_id": str, "job_id": str, "tool_id": str, "tool_name": str, "day": str}
+COUNTER_TYPES = {"cycles_total": "REAL", "minutes_total": "REAL", "cycles_today": "REAL", "minutes_today": "REAL"}
+
+# path -> ((size, mtime_ns), value)
+_cache = {}
+
+
+def _cached(path: Path, build):
+    sig = sources.signature(path)
+    hit = _cache.get(path)
+    if hit and hit[0] == sig:
+        return hit[1]
+    value = build()
+    _cache[path] = (sig, value)
+    return value
+
+
+def _assignments(path: Path):
+    def build():
+        df = pd.read_csv(path, dtype=TEXT, keep_default_na=False) if path.exists() else pd.DataFrame(columns=ASSIGN_COLS)
+        index = {}
+        for r in df.itertuples(index=False):
+            index.setdefault((r.machine_id, r.job_id), []).append(
+                (r.tool_id, r.tool_name, schemas.number(r.cycles_per_part) or 1.0, schemas.number(r.cut_share) or 1.0))
+        return df, index
+    return _cached(path, build)
+
+
+def load_assignments(path: Path):
+    return _assignments(path)[0]
+
+
+def assignment_index(path: Path):
+    """(machine_id, job_id) -> [(tool_id, tool_name, cycles_per_part, cut_share), ...]"""
+    return _assignments(path)[1]
+
+
+def connect(path: Path):
+    con = sqlite3.connect(path, timeout=30)
+    # rollback journal rather than WAL: every commit touches the .db file itself,
+    # so the (size, mtime) caches in other workers notice it
+    cols = ", ".join(f"{c} {COUNTER_TYPES.get(c, 'TEXT')}" for c in COUNTER_COLS)
+    con.execute(f"CREATE TABLE IF NOT EXISTS counters ({cols}, PRIMARY KEY (machine_id, tool_id))")
+    return con
+
+
+def load_counters(path: Path):
+    """Running counters keyed by (machine_id, tool_id). Callers must not mutate the dict."""
+    def build():
+        if not path.exists():
+            return {}
+        con = connect(path)
+        rows = con.execute(f"SELECT {', '.join(COUNTER_COLS)} FROM counters").fetchall()
+        con.close()
+        return {(r[0], r[1]): dict(zip(COUNTER_COLS, r)) for r in rows}
+    return _cached(path, build)
+
+
+def adopt_csv(path: Path, csv_path: Path):
+    """Carry the counters of a tool_counters.csv from before the SQLite store over, once. Caller holds the write lock."""
+    if path.exists() or not csv_path.exists():
+        return
+    df = pd.read_csv(csv_path, dtype=TEXT, keep_default_na=False).reindex(columns=COUNTER_COLS, fill_value="")
+    for c in COUNTER_TYPES:
+        df[c] = [schemas.number(v) for v in df[c]]
+    con = connect(path)
+    with con:
+        con.executemany(f"INSERT OR REPLACE INTO counters VALUES ({', '.join('?' * len(COUNTER_COLS))})",
+                        df[COUNTER_COLS].itertuples(index=False, name=None))
+    con.close()
+    csv_path.rename(csv_path.with_suffix(".csv.migrated"))
+
+
+def counter(path: Path, machine_id, tool_id):
+    """One tool's running counters (None if it has none), read without loading the whole table."""
+    if not path.exists():
+        return None
+    con = connect(path)
+    row = con.execute(f"SELECT {', '.join(COUNTER_COLS)} FROM counters WHERE machine_id = ? AND tool_id = ?",
+                      (str(machine_id), str(tool_id))).fetchone()
+    con.close()
+    return dict(zip(COUNTER_COLS, row)) if row else None
+
+
+def counters_frame(path: Path, machine_id=None):
+    rows = list(load_counters(path).values())
+    df = pd.DataFrame(rows, columns=COUNTER_COLS)
+    return df[df["machine_id"] == machine_id] if machine_id is not None else df
+
+
+def assign(path: Path, machine_id, job_id, tool_id, tool_name, cycles_per_part=1.0, cut_share=1.0):
+    """Mount a tool on a job (replaces an existing assignment of the same tool). Caller holds the write lock."""
+    df = load_assignments(path)
+    same = (df["machine_id"] == machine_id) & (df["job_id"] == job_id) & (df["tool_id"] == tool_id)
+    row = {"machine_id": machine_id, "job_id": job_id, "tool_id": tool_id, "tool_name": tool_name,
+           "cycles_per_part": cycles_per_part, "cut_share": cut_share}
+    pd.concat([df[~same], pd.DataFrame([row])], ignore_index=True)[ASSIGN_COLS].to_csv(path, index=False)
+
+
+def unassign(path: Path, machine_id, job_id, tool_id):
+    """Caller holds the write lock."""
+    df = load_assignments(path)
+    keep = ~((df["machine_id"] == machine_id) & (df["job_id"] == job_id) & (df["tool_id"] == tool_id))
+    df[keep].to_csv(path, index=False)
+
+
+# add one usage delta; the day's counters restart when the shift date moves on
+# (SET expressions see the stored row, `excluded` is the delta)
+UPSERT = (f"INSERT INTO counters ({', '.join(COUNTER_COLS)}) VALUES ({', '.join('?' * len(COUNTER_COLS))}) "
+          "ON CONFLICT (machine_id, tool_id) DO UPDATE SET "
+          "cycles_total = round(cycles_total + excluded.cycles_total, 2), "
+          "minutes_total = round(minutes_total + excluded.minutes_total, 2), "
+          "cycles_today = round(CASE WHEN day = excluded.day THEN cycles_today ELSE 0 END + excluded.cycles_today, 2), "
+          "minutes_today = round(CASE WHEN day = excluded.day THEN minutes_today ELSE 0 END + excluded.minutes_today, 2), "
+          "day = excluded.day, updated_at = excluded.updated_at")
+
+
+def accrue(assign_path: Path, counter_path: Path, rows: list):
+    """Write path hook for production rows. Caller holds the write lock."""
+    index = assignment_index(assign_path)
+    deltas = []
+    now = datetime.now().isoformat(timespec="seconds")
+    for row in rows:
+        tools = index.get((str(row.get("machine_id", "")), str(row.get("job_id", ""))))
+        if not tools:
+            continue
+        parts = schemas.number(row.get("parts_done"))
+        cycle = schemas.number(row.get("avg_cycle_time_min"))
+        day = str(row.get("shift_date", ""))
+        for tool_id, tool_name, per_part, share in tools:
+            cycles, minutes = round(parts * per_part, 2), round(parts * cycle * share, 2)
+            deltas.append((str(row["machine_id"]), tool_id, tool_name, cycles, minutes, day, cycles, minutes, now))
+    if deltas:
+        con = connect(counter_path)
+        with con:
+            con.executemany(UPSERT, deltas)
+        con.close()
+
+
+def reset(counter_path: Path, machine_id, tool_id):
+    """Tool replaced: start its counters from zero. Caller holds the write lock."""
+    con = connect(counter_path)
+    with con:
+        con.execute("UPDATE counters SET cycles_total = 0, minutes_total = 0, cycles_today = 0, minutes_today = 0, "
+                    "updated_at = ? WHERE machine_id = ? AND tool_id = ?",
+                    (datetime.now().isoformat(timespec="seconds"), machine_id, tool_id))
+    con.close()
+
+
+def max_cycles(counter_path: Path, machine_id):
+    """Cycles on the most-used mounted tool of a machine (None if nothing is tracked)."""
+    df = counters_frame(counter_path, machine_id)
+    if df.empty:
+        return None
+    return float(pd.to_numeric(df["cycles_total"], errors="coerce").max())
+
+
+def live_registry(tools: pd.DataFrame, counter_path: Path, machine_id=None):
+    """One row per (machine, tool): expected life from the latest Tools entry, usage from live counters.
+
+    Tools without live counters fall back to the last hand-logged totals.
+    """
+    t = tools if machine_id is None else tools[tools["machine_id"] == machine_id]
+    t = t.dropna(subset=["machine_id", "tool_id"])
+    latest = t.groupby(["machine_id", "tool_id"], observed=True).tail(1)[[
+        "machine_id", "tool_id", "tool_name", "expected_minutes", "expected_cycles",
+        "minutes_used_total", "cycles_used_total", "status"]]
+    latest = latest.astype({"machine_id": str, "tool_id": str, "tool_name": str})
+    live = counters_frame(counter_path, machine_id)[
+        ["machine_id", "tool_id", "tool_name", "minutes_total", "cycles_total", "updated_at"]]
+    df = latest.merge(live, on=["machine_id", "tool_id"], how="outer", suffixes=("", "_live"))
+    df["tool_name"] = df["tool_name"].fillna(df["tool_name_live"])
+    num = lambda c: pd.to_numeric(df[c], errors="coerce")
+    has_live = num("cycles_total").notna()
+    df["minutes_used"] = num("minutes_total").where(has_live, num("minutes_used_total"))
+    df["cycles_used"] = num("cycles_total").where(has_live, num("cycles_used_total"))
+    exp_m = num("expected_minutes").where(num("expected_minutes") > 0)
+    exp_c = num("expected_cycles").where(num("expected_cycles") > 0)
+    df["life_used"] = pd.concat([df["minutes_used"] / exp_m, df["cycles_used"] / exp_c], axis=1).max(axis=1).round(3)
+    df["source"] = has_live.map({True: "live", False: "logged"})
+    return df[["machine_id", "tool_id", "tool_name", "expected_minutes", "minutes_used", "expected_cycles",
+               "cycles_used", "life_used", "status", "source", "updated_at"]].reset_index(drop=True)
+
+
+def hours_left(life: pd.DataFrame, min_per_cycle=rul.TOOL_MIN_PER_CYCLE):
+    """Run hours left per row of live_registry: the sooner of the minute and cycle limits (NaN if neither is set)."""
+    num = lambda c: pd.to_numeric(life[c], errors="coerce")
+    by_minutes = (num("expected_minutes") - num("minutes_used")) / 60
+    by_cycles = (num("expected_cycles") - num("cycles_used")) * min_per_cycle / 60
+    return pd.concat([by_minutes, by_cycles], axis=1).min(axis=1).clip(lower=0)
+